@@ -0,0 +1,147 @@
+"""
+Vectorized material + positional evaluation for large position sets (analysis and training data).
+Boards are (N, 64) int8 arrays in the backend's layout (board[row * 8 + col], a8 = 0, positive
+for white). The scores are the ones scanAndUpdate leaves in GameState.info.eval, from white's point
+of view, including 0 for dead positions (insufficient material). Checkmate and stalemate are only
+found by move generation, so they are scored like any other position here.
+
+    python -m Chess.BatchEval positions.txt            # prints "score fen" per line
+    python -m Chess.BatchEval positions.txt --validate # compares against the scalar path
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+import ChessBackend
+from PieceTables import PieceTables
+
+CHUNK_SIZE = 1 << 16 # boards scored per step, bounds the (chunk, 64) temporaries
+
+def buildScoreTable() -> np.ndarray:
+    """
+    (13, 64) int32 table indexed by piece + 6 and square: the piece value plus its positional score
+    in tenths of a pawn, negative for black. Kings only have a positional score of 0.
+    Tenths keep the sums exact; scanAndUpdate adds the same terms as floats (value + 0.1 * positional).
+    """
+    table = np.zeros((13, 64), dtype=np.int32)
+    for piece in range(-6, 7):
+        if piece == 0:
+            continue
+        positional = np.zeros(64, dtype=np.int32)
+        if abs(piece) != 6:
+            positional = np.array(PieceTables.positionalScores[piece], dtype=np.int32).reshape(64)
+        table[piece + 6] = (PieceTables.VALUES[abs(piece)] * 10 + positional) * (1 if piece > 0 else -1)
+    return table
+
+SCORE_TABLE = buildScoreTable()
+SQUARES = np.arange(64)
+LIGHT_SQUARES = (SQUARES // 8 + SQUARES % 8) % 2 == 0
+# FEN placement character -> piece code; digits are expanded to '.' and ranks joined first
+FEN_CODES = np.zeros(256, dtype=np.int8)
+for _code, _ch in enumerate(PieceTables.PIECES[1:], 1):
+    FEN_CODES[ord(_ch)] = _code if _code <= 6 else _code - 13
+EXPAND_PLACEMENT = str.maketrans({**{str(n): '.' * n for n in range(1, 9)}, '/': None})
+VALID_PLACEMENT = frozenset("./PNBRQKpnbrqk")
+
+def encodeFens(fens: list[str]) -> np.ndarray:
+    """
+    (N, 64) int8 boards from FEN strings (only the placement field is read).
+    """
+    expanded = [fen.split(maxsplit=1)[0].translate(EXPAND_PLACEMENT) if fen.strip() else '' for fen in fens]
+    for fen, placement in zip(fens, expanded):
+        if len(placement) != 64 or not VALID_PLACEMENT.issuperset(placement):
+            raise ValueError(f"Invalid FEN placement: {fen}")
+    data = np.frombuffer(''.join(expanded).encode("ascii"), dtype=np.uint8)
+    return FEN_CODES[data].reshape(len(fens), 64)
+
+def encodeStates(gameStates: list[ChessBackend.GameState]) -> np.ndarray:
+    """
+    (N, 64) int8 boards from GameStates.
+    """
+    return np.array([gs.board for gs in gameStates], dtype=np.int8).reshape(len(gameStates), 64)
+
+def insufficientMaterial(boards: np.ndarray) -> np.ndarray:
+    """
+    Boolean mask of the dead positions scanAndUpdate scores as draws: K vs K, K vs K + minor piece,
+    and K + B vs K + B with both bishops on the same square colour.
+    """
+    pieceCount = np.count_nonzero(boards, axis=1)
+    types = np.abs(boards)
+    heavy = ((types == 1) | (types == 4) | (types == 5)).any(axis=1) # pawns, rooks, queens
+    whiteBishops = boards == 3
+    blackBishops = boards == -3
+    sameColourBishops = ((whiteBishops.sum(axis=1) == 1) & (blackBishops.sum(axis=1) == 1)
+                         & ((whiteBishops & LIGHT_SQUARES).any(axis=1) == (blackBishops & LIGHT_SQUARES).any(axis=1)))
+    return ~heavy & ((pieceCount <= 3) | ((pieceCount == 4) & sameColourBishops))
+
+def evaluateBoards(boards: np.ndarray) -> np.ndarray:
+    """
+    float64 scores (pawns, white's point of view) for an (N, 64) board array.
+    """
+    boards = np.asarray(boards, dtype=np.int8).reshape(-1, 64)
+    scores = np.empty(len(boards), dtype=np.float64)
+    for start in range(0, len(boards), CHUNK_SIZE):
+        chunk = boards[start:start + CHUNK_SIZE]
+        tenths = SCORE_TABLE[chunk + 6, SQUARES].sum(axis=1)
+        tenths[insufficientMaterial(chunk)] = 0
+        scores[start:start + len(chunk)] = tenths / 10
+    return scores
+
+def evaluateFens(fens: list[str]) -> np.ndarray:
+    return evaluateBoards(encodeFens(fens))
+
+def validate(fens: list[str], tolerance: float = 1e-9) -> tuple[int, int, list[str]]:
+    """
+    Compare evaluateFens with info.eval of GameState.fromFen for every FEN.
+    Return (positions compared, positions skipped, FENs that differ). Checkmates and stalemates are
+    skipped because their scalar score comes from move generation.
+    """
+    scores = evaluateFens(fens)
+    dead = insufficientMaterial(encodeFens(fens))
+    compared = skipped = 0
+    mismatches = []
+    for fen, score, isDead in zip(fens, scores, dead):
+        info = ChessBackend.GameState.fromFen(fen).info
+        if info.winner is not None and not isDead:
+            skipped += 1
+            continue
+        compared += 1
+        if abs(info.eval - score) > tolerance:
+            mismatches.append(fen)
+    return compared, skipped, mismatches
+
+def readFens(path: str) -> list[str]:
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fens", help="File with one FEN per line.")
+    parser.add_argument("--validate", action="store_true", help="Compare with the scalar evaluation and time both.")
+    args = parser.parse_args()
+
+    fens = readFens(args.fens)
+    startTime = time.perf_counter()
+    scores = evaluateFens(fens)
+    batchTime = time.perf_counter() - startTime
+    if not args.validate:
+        for fen, score in zip(fens, scores):
+            print(f"{score:.1f} {fen}")
+        return
+    startTime = time.perf_counter()
+    compared, skipped, mismatches = validate(fens)
+    scalarTime = time.perf_counter() - startTime
+    print(f"Positions: {len(fens)} ({compared} compared, {skipped} checkmates/stalemates skipped)")
+    print(f"Batch: {batchTime:.3f}s, {len(fens) / max(batchTime, 1e-9):.0f} positions/s")
+    print(f"Scalar (fromFen): {scalarTime:.3f}s, {len(fens) / max(scalarTime, 1e-9):.0f} positions/s")
+    for fen in mismatches[:10]:
+        print(f"Mismatch: {fen}")
+    if mismatches:
+        print(f"{len(mismatches)} mismatches")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
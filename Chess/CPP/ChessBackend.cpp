@@ -3,6 +3,55 @@
 #include <algorithm>
 #include <cctype>
 #include <sstream>
+#include <stdexcept>
+
+namespace {
+    // Zobrist keys from a fixed-seed splitmix64 stream, so keys are the same on every run.
+    struct ZobristKeys {
+        uint64_t pieces[13][64]; // [piece + 6][row * 8 + col]
+        uint64_t castling[16];   // [castling rights mask]
+        uint64_t enPassant[8];   // [file]
+        uint64_t blackToMove;
+    };
+
+    constexpr uint64_t splitMix64(uint64_t& state) {
+        uint64_t z = (state += 0x9E3779B97F4A7C15ULL);
+        z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+        z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+        return z ^ (z >> 31);
+    }
+
+    constexpr ZobristKeys makeZobristKeys() {
+        ZobristKeys keys{};
+        uint64_t state = 0x2545F4914F6CDD1DULL;
+        for (auto& piece : keys.pieces) {
+            for (auto& square : piece) square = splitMix64(state);
+        }
+        // Each castling right gets a key; a mask's key is the xor of its rights.
+        uint64_t rights[4] = {};
+        for (auto& right : rights) right = splitMix64(state);
+        for (int mask = 0; mask < 16; ++mask) {
+            for (int i = 0; i < 4; ++i) {
+                if (mask & (1 << i)) keys.castling[mask] ^= rights[i];
+            }
+        }
+        for (auto& file : keys.enPassant) file = splitMix64(state);
+        keys.blackToMove = splitMix64(state);
+        return keys;
+    }
+
+    constexpr ZobristKeys ZOBRIST = makeZobristKeys();
+
+    inline uint64_t pieceKey(int piece, int r, int c) {
+        return ZOBRIST.pieces[piece + 6][r * 8 + c];
+    }
+
+    // Castling rights as a mask: 1 = white king side, 2 = white queen side, 4 = black king side, 8 = black queen side
+    inline int castlingMask(const std::array<std::pair<bool,bool>, 3>& rights) {
+        return (rights[1].first ? 1 : 0) | (rights[1].second ? 2 : 0)
+             | (rights[2].first ? 4 : 0) | (rights[2].second ? 8 : 0);
+    }
+}
 
 static inline uint64_t squareMask(int r, int c) {
     return 1ULL << static_cast<unsigned>(r * 8 + c);
@@ -16,6 +65,11 @@ static inline bool hasSquare(uint64_t mask, int r, int c) {
     return (mask & squareMask(r, c)) != 0ULL;
 }
 
+static inline int sideIndex(int player) {
+    // Map +1 -> 1 (white), -1 -> 2 (black)
+    return (player == 1) ? 1 : 2;
+}
+
 std::string Move::getChessNotation() const {
     auto fileChar = [](int col) -> char {
         return static_cast<char>('a' + col);
@@ -81,6 +135,18 @@ std::string Move::getChessNotation() const {
     return s;
 }
 
+std::string Move::getUciNotation() const {
+    std::string s;
+    s.push_back(static_cast<char>('a' + startCol));
+    s.push_back(static_cast<char>('0' + (8 - startRow)));
+    s.push_back(static_cast<char>('a' + endCol));
+    s.push_back(static_cast<char>('0' + (8 - endRow)));
+    if (pawnPromotion != 0) {
+        s.push_back(PieceTables::BLACK_PIECES[std::abs(pawnPromotion)]);
+    }
+    return s;
+}
+
 std::ostream& operator<<(std::ostream& os, const Move& m) {
     os << m.getChessNotation();
     return os;
@@ -100,39 +166,117 @@ GameState::GameState(){
         {{ 4, 2, 3, 5, 6, 3, 2, 4}}
     }};
     moveLog_.reserve(256);
-    boardHistory_.reserve(256);
-    infoLog_.reserve(256);
-    boardHistory_.push_back(this->scanAndUpdate());
-    boardCounter_[boardHistory_.back()] = 1;
+    undoLog_.reserve(256);
+    keyHistory_.reserve(256);
+    moveLists_.emplace_back();
+    this->scanAndUpdate();
+    key_ = computeKey();
+    keyHistory_.push_back(key_);
+}
+
+GameState GameState::fromFen(const std::string& fen) {
+    GameState gs;
+    gs.loadFen(fen);
+    return gs;
+}
+
+// Set up the position from a FEN string. The half-move clock is used for the 75-move rule;
+// the full-move number is ignored. Missing trailing fields default to "w - - 0".
+void GameState::loadFen(const std::string& fen) {
+    std::istringstream fields(fen);
+    std::string placement, stm = "w", castling = "-", ep = "-";
+    int halfMoves = 0;
+    fields >> placement >> stm >> castling >> ep >> halfMoves;
+    Board board{};
+    int r = 0, c = 0;
+    for (const char ch : placement) {
+        if (ch == '/') {
+            if (c != 8) break;
+            ++r;
+            c = 0;
+        } else if (std::isdigit(static_cast<unsigned char>(ch))) {
+            c += ch - '0';
+        } else {
+            const auto* it = std::find(PieceTables::PIECES.begin(), PieceTables::PIECES.end(), ch);
+            if (it == PieceTables::PIECES.end() || r > 7 || c > 7) {
+                throw std::invalid_argument("Invalid FEN placement: " + placement);
+            }
+            const int index = static_cast<int>(it - PieceTables::PIECES.begin());
+            board[r][c++] = std::isupper(static_cast<unsigned char>(ch)) ? index : index - 13;
+        }
+    }
+    if (r != 7 || c != 8) {
+        throw std::invalid_argument("Invalid FEN placement: " + placement);
+    }
+    board_ = board;
+    player_ = (stm == "b") ? -1 : 1;
+    moveLog_.clear();
+    undoLog_.clear();
+    keyHistory_.clear();
+    info_ = Info();
+    info_.castlingRights[1] = {castling.find('K') != std::string::npos, castling.find('Q') != std::string::npos};
+    info_.castlingRights[2] = {castling.find('k') != std::string::npos, castling.find('q') != std::string::npos};
+    for (int row = 0; row < 8; ++row) {
+        for (int col = 0; col < 8; ++col) {
+            if (std::abs(board_[row][col]) == 6) {
+                info_.kingLocations[board_[row][col] > 0 ? 1 : 2] = {row, col};
+            }
+        }
+    }
+    if (ep.size() == 2) {
+        info_.enPassantPossible = {8 - (ep[1] - '0'), ep[0] - 'a'};
+    }
+    info_.seventyFiveMoveRuleCounter = halfMoves;
+    const auto [kingRow, kingCol] = info_.kingLocations[sideIndex(player_)];
+    const auto [inCheck, attackingPiece, attackingSquare] = findAttackers(kingRow, kingCol);
+    setCheckState(inCheck, attackingPiece, attackingSquare.first, attackingSquare.second);
+    scanAndUpdate();
+    key_ = computeKey();
+    keyHistory_.push_back(key_);
 }
-std::string GameState::scanAndUpdate() {
-    std::vector<std::string> ranks_str;
-    ranks_str.reserve(8);
-    validMoves_.clear();
+
+uint64_t GameState::computeKey() const {
+    uint64_t key = 0ULL;
+    for (int r = 0; r < 8; ++r) {
+        for (int c = 0; c < 8; ++c) {
+            if (board_[r][c] != 0) key ^= pieceKey(board_[r][c], r, c);
+        }
+    }
+    if (player_ == -1) key ^= ZOBRIST.blackToMove;
+    key ^= ZOBRIST.castling[castlingMask(info_.castlingRights)];
+    if (info_.enPassantPossible.first != -1) key ^= ZOBRIST.enPassant[info_.enPassantPossible.second];
+    return key;
+}
+
+int GameState::repetitionCount() const {
+    // Positions before the last capture or pawn move cannot repeat, and a repetition
+    // has the same side to move, so only every second key back to that move is compared.
+    const int last = static_cast<int>(keyHistory_.size()) - 1;
+    const int first = std::max(0, last - info_.seventyFiveMoveRuleCounter);
+    int count = 0;
+    for (int i = last; i >= first; i -= 2) {
+        if (keyHistory_[i] == key_) ++count;
+    }
+    return count;
+}
+
+void GameState::scanAndUpdate() {
+    if (moveLists_.size() <= moveLog_.size()) {
+        moveLists_.emplace_back();
+    }
+    currentMoves().clear();
     double score = 0.0;
-    std::vector<int> pieces;
-    pieces.reserve(8); // usually tiny for dead-position cases
+    std::array<int, 4> pieces{7, 7, 7, 7}; // dead-position candidates; unused slots sort last
+    std::size_t pieceCount = 0;
     bool possibleDead = true;
     int bishopColorBlack = -1; // unknown
     int bishopColorWhite = -1; // unknown
     const int player = player_;
     const double fac = 0.1;
     for (int r = 0; r < 8; ++r) {
-        std::string parts;
-        parts.reserve(16);
-        int empty = 0;
         for (int c = 0; c < 8; ++c) {
             const int sq = board_[r][c];
-            if (sq == 0) {
-                ++empty;
-                continue;
-            }
-            // --- FEN piece placement for this rank ---
-            if (empty) {
-                parts += std::to_string(empty);
-                empty = 0;
-            }
-            parts.push_back(PieceTables::pieceChar(sq));
+            if (sq == 0) continue;
             // --- evaluation (material + positional, excluding king positional) ---
             double posScore = 0.0;
             if (std::abs(sq) != 6) {
@@ -141,10 +285,10 @@ std::string GameState::scanAndUpdate() {
             score += (PieceTables::VALUES[std::abs(sq)] + posScore) * (sq > 0 ? 1.0 : -1.0);
             // --- dead position detection (insufficient material) ---
             if (possibleDead) {
-                pieces.push_back(sq);
-                if (pieces.size() > 4) {
+                if (pieceCount == 4) {
                     possibleDead = false;
                 } else {
+                    pieces[pieceCount++] = sq;
                     const int a = std::abs(sq);
                     if (a == 5 || a == 4 || a == 1) { // queen/rook/pawn present -> not dead
                         possibleDead = false;
@@ -160,85 +304,89 @@ std::string GameState::scanAndUpdate() {
                 updateValidMoves(r, c);
             }
         }
-        if (empty) {
-            parts += std::to_string(empty);
-        }
-        ranks_str.push_back(std::move(parts));
-    }
-    // --- finish board representation (FEN-like) ---
-    std::string placement;
-    placement.reserve(64);
-    for (int i = 0; i < 8; ++i) {
-        if (i) placement.push_back('/');
-        placement += ranks_str[i];
-    }
-    const char stm = (player_ == 1) ? 'w' : 'b';
-    // castling rights (index 1 = white, 2 = black)
-    const auto [w_k, w_q] = info_.castlingRights[1];
-    const auto [b_k, b_q] = info_.castlingRights[2];
-    std::string castling;
-    if (w_k) castling.push_back('K');
-    if (w_q) castling.push_back('Q');
-    if (b_k) castling.push_back('k');
-    if (b_q) castling.push_back('q');
-    if (castling.empty()) castling = "-";
-    // en passant target square
-    std::string ep = "-";
-    if (info_.enPassantPossible.first != -1) {
-        const int er = info_.enPassantPossible.first;
-        const int ec = info_.enPassantPossible.second;
-        ep.clear();
-        ep.push_back(static_cast<char>('a' + ec));
-        ep.push_back(static_cast<char>('0' + (8 - er)));
     }
     // Update eval (keep as int if your Info::eval is int; here we round)
     this->info_.eval = score;
     // --- insufficient material draw checks---
     if (possibleDead) {
-        if (pieces.size() == 2) { // K vs K
+        if (pieceCount == 2) { // K vs K
             info_.winner = 0;
             info_.eval = 0;
-            validMoves_.clear();
+            currentMoves().clear();
         } else {
             std::sort(pieces.begin(), pieces.end());
             // K vs K+N or K vs K+B
-            const std::vector<int> kb1 = {-6,  3, 6};
-            const std::vector<int> kb2 = {-6, -3, 6};
-            const std::vector<int> kn1 = {-6,  2, 6};
-            const std::vector<int> kn2 = {-6, -2, 6};
-            if (pieces.size() == 3 &&
-                (pieces == kb1 || pieces == kb2 || pieces == kn1 || pieces == kn2)) {
+            static constexpr std::array<int, 3> kb1 = {-6,  3, 6};
+            static constexpr std::array<int, 3> kb2 = {-6, -3, 6};
+            static constexpr std::array<int, 3> kn1 = {-6,  2, 6};
+            static constexpr std::array<int, 3> kn2 = {-6, -2, 6};
+            static constexpr std::array<int, 4> kbkb = {-6, -3, 3, 6};
+            const auto piecesAre = [&](const auto& set) {
+                return pieceCount == set.size() && std::equal(set.begin(), set.end(), pieces.begin());
+            };
+            if (piecesAre(kb1) || piecesAre(kb2) || piecesAre(kn1) || piecesAre(kn2)) {
                 info_.winner = 0;
                 info_.eval = 0;
-                validMoves_.clear();
+                currentMoves().clear();
             }
             // K+B vs K+B (bishops on same color)
-            else if (pieces == std::vector<int>({-6, -3, 3, 6})) {
+            else if (piecesAre(kbkb)) {
                 if (bishopColorBlack != -1 && bishopColorWhite != -1 &&
                     bishopColorBlack == bishopColorWhite) {
                     info_.winner = 0;
                     info_.eval = 0;
-                    validMoves_.clear();
+                    currentMoves().clear();
                 }
             }
         }
     }
-    // Return a compact rep: "{placement} {stm} {castling} {ep}"
-    std::string rep;
-    rep.reserve(placement.size() + 1 + 1 + 1 + castling.size() + 1 + ep.size());
-    rep += placement;
-    rep.push_back(' ');
-    rep.push_back(stm);
-    rep.push_back(' ');
-    rep += castling;
-    rep.push_back(' ');
-    rep += ep;
-    return rep;
 }
 
-static inline int sideIndex(int player) {
-    // Map +1 -> 1 (white), -1 -> 2 (black)
-    return (player == 1) ? 1 : 2;
+std::string GameState::fen() const {
+    std::string fen;
+    fen.reserve(90);
+    for (int r = 0; r < 8; ++r) {
+        if (r) fen.push_back('/');
+        int empty = 0;
+        for (int c = 0; c < 8; ++c) {
+            const int sq = board_[r][c];
+            if (sq == 0) {
+                ++empty;
+                continue;
+            }
+            if (empty) {
+                fen += std::to_string(empty);
+                empty = 0;
+            }
+            fen.push_back(PieceTables::pieceChar(sq));
+        }
+        if (empty) {
+            fen += std::to_string(empty);
+        }
+    }
+    fen.push_back(' ');
+    fen.push_back((player_ == 1) ? 'w' : 'b');
+    fen.push_back(' ');
+    // castling rights (index 1 = white, 2 = black)
+    const auto [w_k, w_q] = info_.castlingRights[1];
+    const auto [b_k, b_q] = info_.castlingRights[2];
+    const std::size_t castlingStart = fen.size();
+    if (w_k) fen.push_back('K');
+    if (w_q) fen.push_back('Q');
+    if (b_k) fen.push_back('k');
+    if (b_q) fen.push_back('q');
+    if (fen.size() == castlingStart) fen.push_back('-');
+    fen.push_back(' ');
+    // en passant target square
+    if (info_.enPassantPossible.first != -1) {
+        fen.push_back(static_cast<char>('a' + info_.enPassantPossible.second));
+        fen.push_back(static_cast<char>('0' + (8 - info_.enPassantPossible.first)));
+    } else {
+        fen.push_back('-');
+    }
+    fen += " " + std::to_string(info_.seventyFiveMoveRuleCounter);
+    fen += " " + std::to_string(moveLog_.size() / 2 + 1);
+    return fen;
 }
 
 void GameState::makeMove(const Move& move) {
@@ -246,9 +394,18 @@ void GameState::makeMove(const Move& move) {
     if ((move.pieceMoved > 0) != (player_ > 0)) {
         return;
     }
-    // Save info snapshot for undo
-    infoLog_.push_back(info_);
+    // Save the state this move overwrites for undo
+    undoLog_.push_back({key_, info_.block_mask, info_.castlingRights, info_.enPassantPossible,
+                        info_.inCheck, info_.winner, info_.seventyFiveMoveRuleCounter, info_.eval});
+    uint64_t key = key_ ^ ZOBRIST.blackToMove ^ ZOBRIST.castling[castlingMask(info_.castlingRights)];
+    if (info_.enPassantPossible.first != -1) {
+        key ^= ZOBRIST.enPassant[info_.enPassantPossible.second];
+    }
     // Move the piece
+    key ^= pieceKey(move.pieceMoved, move.startRow, move.startCol);
+    if (board_[move.endRow][move.endCol] != 0) {
+        key ^= pieceKey(board_[move.endRow][move.endCol], move.endRow, move.endCol);
+    }
     board_[move.startRow][move.startCol] = 0;
     board_[move.endRow][move.endCol] = move.pieceMoved;
     // Log move
@@ -259,21 +416,25 @@ void GameState::makeMove(const Move& move) {
     if (std::abs(move.pieceMoved) == 6) {
         info_.kingLocations[usIdx] = {move.endRow, move.endCol};
         if (move.isCastlingMove) {
+            const int rook = 4 * player_;
             // King-side: endCol - startCol == 2
             if (move.endCol - move.startCol == 2) {
                 // rook h-file (col 7) -> f-file (endCol-1)
                 board_[move.endRow][move.endCol - 1] = board_[move.endRow][7];
                 board_[move.endRow][7] = 0;
+                key ^= pieceKey(rook, move.endRow, 7) ^ pieceKey(rook, move.endRow, move.endCol - 1);
             } else {
                 // Queen-side: rook a-file (col 0) -> d-file (endCol+1)
                 board_[move.endRow][move.endCol + 1] = board_[move.endRow][0];
                 board_[move.endRow][0] = 0;
+                key ^= pieceKey(rook, move.endRow, 0) ^ pieceKey(rook, move.endRow, move.endCol + 1);
             }
         }
         info_.castlingRights[usIdx] = {false, false};
     }
     // ---- Handle rook moves and castling rights ----
-    else if (std::abs(move.pieceMoved) == 4) {
+    else if (std::abs(move.pieceMoved) == 4 && move.startRow == (player_ == 1 ? 7 : 0)) {
+        // a rook leaving its home rank
         auto [kSide, qSide] = info_.castlingRights[usIdx];
         if (move.startCol == 0) {
             // moved rook from a-file => lose queen-side
@@ -291,17 +452,21 @@ void GameState::makeMove(const Move& move) {
         // Captured pawn is behind the destination square, on endRow + player_, endCol
         const int capRow = move.endRow + player_;
         if (inBounds(capRow, move.endCol)) {
+            key ^= pieceKey(board_[capRow][move.endCol], capRow, move.endCol);
             board_[capRow][move.endCol] = 0;
         }
     }
+    key ^= pieceKey(board_[move.endRow][move.endCol], move.endRow, move.endCol);
     // Reset en passant, then possibly set it
     info_.enPassantPossible = {-1, -1};
     if (std::abs(move.pieceMoved) == 1 && std::abs(move.startRow - move.endRow) == 2) {
         // Pawn double push: set EP square to the jumped-over square
         info_.enPassantPossible = {(move.startRow + move.endRow) / 2, move.startCol};
+        key ^= ZOBRIST.enPassant[move.startCol];
     }
     // ---- Handle rook captures and castling rights (if EP not set) ----
-    else if (std::abs(move.pieceCaptured) == 4) {
+    else if (std::abs(move.pieceCaptured) == 4 && move.endRow == (player_ == 1 ? 0 : 7)) {
+        // a rook captured on the opponent's home rank
         auto [kSide, qSide] = info_.castlingRights[themIdx];
         if (move.endCol == 0) {
             // captured rook on a-file => opponent loses queen-side
@@ -312,6 +477,7 @@ void GameState::makeMove(const Move& move) {
         }
         info_.castlingRights[themIdx] = {kSide, qSide};
     }
+    key_ = key ^ ZOBRIST.castling[castlingMask(info_.castlingRights)];
     // ---- Update 75-move rule counter (150 half-moves) ----
     if (std::abs(move.pieceMoved) == 1 || move.pieceCaptured != 0) {
         info_.seventyFiveMoveRuleCounter = 0;
@@ -326,18 +492,17 @@ void GameState::makeMove(const Move& move) {
     player_ *= -1;
     // Update king safety for side to move
     updateKingSafety(move);
-    // Scan board, generate moves, and get board representation
-    const std::string boardRep = scanAndUpdate();
-    // Update repetition table & fivefold repetition
-    const int newCount = ++boardCounter_[boardRep];
-    if (newCount >= 5) {
+    // Scan board and generate moves into this ply's move list
+    scanAndUpdate();
+    // Update repetition history & fivefold repetition
+    keyHistory_.push_back(key_);
+    if (repetitionCount() >= 5) {
         info_.winner = 0; // draw
         info_.eval = 0;
     }
-    boardHistory_.push_back(boardRep);
     const bool ongoing = (info_.winner == 2);
     if (ongoing) {
-        if (validMoves_.empty()) {
+        if (currentMoves().empty()) {
             const int stmIdx = sideIndex(player_);
             if (info_.inCheck[stmIdx]) {
                 info_.winner = -player_; // side who just moved delivers mate => winner is -side_to_move
@@ -350,33 +515,30 @@ void GameState::makeMove(const Move& move) {
         }
     } else {
         // If already decided (draw by rules, etc.), no moves
-        validMoves_.clear();
+        currentMoves().clear();
     }
 }
 
+// The move list of the restored ply is still intact, so moves never need to be generated
+// again after an undo. With reCalculateMoves the pins and check squares are rebuilt as
+// well, which scanAndUpdate needs; without it they are left for the next makeMove to rebuild.
 void GameState::undoMove(bool reCalculateMoves) {
     if (moveLog_.empty()) return;
     player_ *= -1;
-    // Pop board rep and decrement repetition counter
-    if (!boardHistory_.empty()) {
-        const std::string rep = boardHistory_.back();
-        boardHistory_.pop_back();
-
-        auto it = boardCounter_.find(rep);
-        if (it != boardCounter_.end()) {
-            it->second -= 1;
-            if (it->second <= 0) {
-                boardCounter_.erase(it);
-            }
-        }
-    }
-    // Pop last move and restore info snapshot
+    keyHistory_.pop_back();
+    // Pop last move and restore the saved state
     const Move move = moveLog_.back();
     moveLog_.pop_back();
-    if (!infoLog_.empty()) {
-        info_ = infoLog_.back();
-        infoLog_.pop_back();
-    }
+    const UndoInfo& undo = undoLog_.back();
+    key_ = undo.key;
+    info_.block_mask = undo.block_mask;
+    info_.castlingRights = undo.castlingRights;
+    info_.enPassantPossible = undo.enPassantPossible;
+    info_.inCheck = undo.inCheck;
+    info_.winner = undo.winner;
+    info_.seventyFiveMoveRuleCounter = undo.seventyFiveMoveRuleCounter;
+    info_.eval = undo.eval;
+    undoLog_.pop_back();
     // Restore moved piece to start square
     board_[move.startRow][move.startCol] = move.pieceMoved;
     if (move.isEnPassantMove) {
@@ -408,15 +570,12 @@ void GameState::undoMove(bool reCalculateMoves) {
         }
     }
     if (reCalculateMoves) {
-        scanAndUpdate();
+        updatePotentialPins();
+        updateCheckSquares();
     }
 }
 
 void GameState::updateKingSafety(const Move& move) {
-    const int idx = sideIndex(player_);
-    const auto [kingRow, kingCol] = info_.kingLocations[idx];
-    // reset block mask
-    info_.block_mask = 0ULL;
     bool inCheck = false;
     int attackingPiece = 0; // abs piece type; 7 => multiple attackers
     int attackingPieceRow = -1;
@@ -424,7 +583,7 @@ void GameState::updateKingSafety(const Move& move) {
     const bool hasDiscovered = (move.discoveredCheck.first != -1);
     if (move.isCheck) {
         inCheck = true;
-        attackingPiece = std::abs(move.pieceMoved);
+        attackingPiece = std::abs(board_[move.endRow][move.endCol]); // the promoted piece after a promotion
         attackingPieceRow = move.endRow;
         attackingPieceCol = move.endCol;
         if (hasDiscovered) {
@@ -442,6 +601,16 @@ void GameState::updateKingSafety(const Move& move) {
             attackingPiece = std::abs(board_[attackingPieceRow][attackingPieceCol]);
         }
     }
+    setCheckState(inCheck, attackingPiece, attackingPieceRow, attackingPieceCol);
+}
+
+// Update check flag, block mask, potential pins and check squares for the side to move.
+// attackingPiece is the checking piece type, or 7 for a double check.
+void GameState::setCheckState(bool inCheck, int attackingPiece, int attackingPieceRow, int attackingPieceCol) {
+    const int idx = sideIndex(player_);
+    const auto [kingRow, kingCol] = info_.kingLocations[idx];
+    // reset block mask
+    info_.block_mask = 0ULL;
     info_.inCheck[idx] = inCheck;
     // Build block mask squares if single attacker
     if (inCheck && attackingPiece != 7) {
@@ -462,7 +631,14 @@ void GameState::updateKingSafety(const Move& move) {
             setSquare(info_.block_mask, attackingPieceRow, attackingPieceCol);
         }
     }
-    // Update potential pins: first friendly piece along each king ray
+    updatePotentialPins();
+    // Update check squares for this side
+    updateCheckSquares();
+}
+
+void GameState::updatePotentialPins() {
+    const auto [kingRow, kingCol] = info_.kingLocations[sideIndex(player_)];
+    // Potential pins: first friendly piece along each king ray
     static constexpr int dirs[8][2] = {
         {-1,-1}, {-1,0}, {-1,1},
         {0,-1},          {0,1},
@@ -487,10 +663,9 @@ void GameState::updateKingSafety(const Move& move) {
             break;
         }
     }
-    // Update check squares for this side
-    updateCheckSquares();
 }
 
+
 void GameState::updateCheckSquares() {
     // reset
     for (auto& s : info_.checkSquares) s = 0ULL;
@@ -639,6 +814,68 @@ bool GameState::isAttacked(int pieceRow, int pieceCol) const {
     return false;
 }
 
+// Like isAttacked, but also returns the attacking piece type and square
+// (piece type 7 and no square when there are several attackers).
+std::tuple<bool, int, std::pair<int,int>> GameState::findAttackers(int pieceRow, int pieceCol) const {
+    bool attacked = false;
+    int attackingPiece = 0;
+    std::pair<int,int> attackingSquare = {-1, -1};
+    const auto found = [&](int piece, int r, int c) {
+        if (attacked) {
+            attackingPiece = 7;
+            attackingSquare = {-1, -1};
+            return true;
+        }
+        attacked = true;
+        attackingPiece = piece;
+        attackingSquare = {r, c};
+        return false;
+    };
+    // ---- Pawns ----
+    const int pawnRow = pieceRow - player_;
+    for (int c = pieceCol - 1; c <= pieceCol + 1; c += 2) {
+        if (inBounds(pawnRow, c) && board_[pawnRow][c] == -1 * player_) {
+            found(1, pawnRow, c);
+            break;
+        }
+    }
+    // ---- Knights ----
+    static constexpr int knightMoves[8][2] = {
+        {-2,-1}, {-2, 1}, {-1,-2}, {-1, 2},
+        { 1,-2}, { 1, 2}, { 2,-1}, { 2, 1}
+    };
+    for (const auto& m : knightMoves) {
+        const int r = pieceRow + m[0];
+        const int c = pieceCol + m[1];
+        if (inBounds(r, c) && board_[r][c] == -2 * player_) {
+            if (found(2, r, c)) return {attacked, attackingPiece, attackingSquare};
+            break;
+        }
+    }
+    // ---- Sliders: rooks / queens (orthogonal), then bishops / queens (diagonal) ----
+    static constexpr int dirs[8][2] = {
+        {-1, 0}, { 1, 0}, { 0,-1}, { 0, 1},
+        {-1,-1}, {-1, 1}, { 1,-1}, { 1, 1}
+    };
+    for (int di = 0; di < 8; ++di) {
+        const int slider = (di < 4) ? 4 : 3;
+        int r = pieceRow;
+        int c = pieceCol;
+        while (true) {
+            r += dirs[di][0];
+            c += dirs[di][1];
+            if (!inBounds(r, c)) break;
+            const int piece = board_[r][c];
+            if (piece == 0) continue;
+            if (piece == -slider * player_ || piece == -5 * player_) {
+                if (found(std::abs(piece), r, c)) return {attacked, attackingPiece, attackingSquare};
+            }
+            break;
+        }
+    }
+    return {attacked, attackingPiece, attackingSquare};
+}
+
 void GameState::updateValidMoves(int row, int col) {
     const int piece = board_[row][col];
     if (piece == 0) return;
@@ -863,7 +1100,23 @@ std::pair<int,int> GameState::discoveredCheck(const Move& move) const {
     return {-1, -1};
 }
 
+// checkSquares stop at the pawn itself, so promoting further along a line the pawn was
+// blocking is tested separately.
+bool GameState::promotionChecks(const Move& move, int piece) const {
+    if (inSet(info_.checkSquares[piece], move.endRow, move.endCol)) {
+        return true;
+    }
+    if (piece == 2 || !inSet(info_.checkSquares[piece], move.startRow, move.startCol)) {
+        return false;
+    }
+    const auto& king = info_.kingLocations[sideIndex(-player_)];
+    const int lineDirR = (move.startRow > king.first) - (move.startRow < king.first);
+    const int lineDirC = (move.startCol > king.second) - (move.startCol < king.second);
+    return move.endRow - move.startRow == lineDirR && move.endCol - move.startCol == lineDirC;
+}
+
 void GameState::getPawnMoves(int row, int col) {
+    MoveList& moves = currentMoves();
     const int player = player_;
     const int idx = sideIndex(player);
     const bool inCheck = info_.inCheck[idx];
@@ -882,14 +1135,14 @@ void GameState::getPawnMoves(int row, int col) {
                     for (int p : promoPieces) {
                         Move pm(row, col, oneStepRow, col, board_[row][col], 0);
                         pm.pawnPromotion = p * player;
-                        pm.isCheck = inSet(info_.checkSquares[p], oneStepRow, col);
+                        pm.isCheck = promotionChecks(pm, p);
                         pm.discoveredCheck = discoveredCheck(pm);
-                        validMoves_.push_back(std::move(pm));
+                        moves.push_back(pm);
                     }
                 } else {
                     m.isCheck = inSet(info_.checkSquares[1], oneStepRow, col);
                     m.discoveredCheck = discoveredCheck(m);
-                    validMoves_.push_back(std::move(m));
+                    moves.push_back(m);
                 }
             }
             // Two-step from starting rank (only if 1-step was empty and we are on startRow)
@@ -899,7 +1152,7 @@ void GameState::getPawnMoves(int row, int col) {
                 if (!inCheck || inSet(info_.block_mask, twoStepRow, col)) {
                     m2.isCheck = inSet(info_.checkSquares[1], twoStepRow, col);
                     m2.discoveredCheck = discoveredCheck(m2);
-                    validMoves_.push_back(std::move(m2));
+                    moves.push_back(m2);
                 }
             }
         }
@@ -921,14 +1174,14 @@ void GameState::getPawnMoves(int row, int col) {
                         for (int p : promoPieces) {
                             Move pm(row, col, oneStepRow, endCol, board_[row][col], target);
                             pm.pawnPromotion = p * player;
-                            pm.isCheck = inSet(info_.checkSquares[p], oneStepRow, endCol);
+                            pm.isCheck = promotionChecks(pm, p);
                             pm.discoveredCheck = discoveredCheck(pm);
-                            validMoves_.push_back(std::move(pm));
+                            moves.push_back(pm);
                         }
                     } else {
                         m.isCheck = inSet(info_.checkSquares[1], oneStepRow, endCol);
                         m.discoveredCheck = discoveredCheck(m);
-                        validMoves_.push_back(std::move(m));
+                        moves.push_back(m);
                     }
                 }
             }
@@ -938,18 +1191,19 @@ void GameState::getPawnMoves(int row, int col) {
                  info_.enPassantPossible.second == endCol) {
             Move m(row, col, oneStepRow, endCol, board_[row][col], /*captured*/ -1 * player);
             m.isEnPassantMove = true;
-            if (!isPinned(m)) {
-                if (!inCheck || inSet(info_.block_mask, oneStepRow, endCol)) {
-                    m.isCheck = inSet(info_.checkSquares[1], oneStepRow, endCol);
-                    m.discoveredCheck = discoveredCheck(m);
-                    validMoves_.push_back(std::move(m));
-                }
+            // Pins and the block mask miss en passant cases (both pawns leaving the king's rank,
+            // or capturing a checking pawn), so the capture is simulated instead
+            if (checkMoveSafety(m)) {
+                m.isCheck = inSet(info_.checkSquares[1], oneStepRow, endCol);
+                m.discoveredCheck = discoveredCheck(m);
+                moves.push_back(m);
             }
         }
     }
 }
 
 void GameState::getKnightMoves(int row, int col) {
+    MoveList& moves = currentMoves();
     const int player = player_;
     const int idx = sideIndex(player);
     static constexpr int knightMoves[8][2] = {
@@ -972,11 +1226,12 @@ void GameState::getKnightMoves(int row, int col) {
         if (inCheck && !inSet(info_.block_mask, endRow, endCol)) continue;
         m.isCheck = inSet(info_.checkSquares[2], endRow, endCol);
         m.discoveredCheck = disc;
-        validMoves_.push_back(std::move(m));
+        moves.push_back(m);
     }
 }
 
 void GameState::getRayMoves(int row, int col, int piece) {
+    MoveList& moves = currentMoves();
     const int player = player_;
     const int idx = sideIndex(player);
     const bool inCheck = info_.inCheck[idx];
@@ -1021,7 +1276,7 @@ void GameState::getRayMoves(int row, int col, int piece) {
         if (!inCheck || inSet(info_.block_mask, r, c)) {
             firstMove.isCheck = inSet(info_.checkSquares[absPiece], r, c);
             firstMove.discoveredCheck = disc;
-            validMoves_.push_back(std::move(firstMove));
+            moves.push_back(firstMove);
         }
         // If first square was an enemy piece, ray stops
         if (board_[r][c] * player < 0) continue;
@@ -1035,7 +1290,7 @@ void GameState::getRayMoves(int row, int col, int piece) {
             if (!inCheck || inSet(info_.block_mask, r, c)) {
                 m.isCheck = inSet(info_.checkSquares[absPiece], r, c);
                 m.discoveredCheck = disc;
-                validMoves_.push_back(std::move(m));
+                moves.push_back(m);
             }
             if (board_[r][c] * player < 0) break; // capture ends ray
         }
@@ -1043,6 +1298,7 @@ void GameState::getRayMoves(int row, int col, int piece) {
 }
 
 void GameState::getKingMoves(int row, int col) {
+    MoveList& moves = currentMoves();
     const int player = player_;
     const int idx = sideIndex(player);
     static constexpr int kingOffsets[8][2] = {
@@ -1060,7 +1316,7 @@ void GameState::getKingMoves(int row, int col) {
         Move m(row, col, endRow, endCol, board_[row][col], board_[endRow][endCol]);
         if (checkMoveSafety(m)) {
             m.discoveredCheck = discoveredCheck(m); // same as python
-            validMoves_.push_back(std::move(m));
+            moves.push_back(m);
         }
     }
     // Castling moves (only if not currently in check)
@@ -1080,7 +1336,7 @@ void GameState::getKingMoves(int row, int col) {
                 if (inSet(info_.checkSquares[4], row, col + 1)) {
                     castle.discoveredCheck = {row, col + 1};
                 }
-                validMoves_.push_back(std::move(castle));
+                moves.push_back(castle);
             }
         }
     }
@@ -1098,7 +1354,7 @@ void GameState::getKingMoves(int row, int col) {
                 if (inSet(info_.checkSquares[4], row, col - 1)) {
                     castle.discoveredCheck = {row, col - 1};
                 }
-                validMoves_.push_back(std::move(castle));
+                moves.push_back(castle);
             }
         }
     }
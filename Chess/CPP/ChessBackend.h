@@ -2,8 +2,9 @@
 
 #include <array>
 #include <cstdint>
+#include <deque>
 #include <string>
-#include <unordered_map>
+#include <tuple>
 #include <vector>
 
 
@@ -24,11 +25,34 @@ struct Move {
     // (-1,-1) means none, (-2, -2) means en passant double discovery (extremely rare)
     std::pair<int,int> discoveredCheck = {-1, -1};
     std::string getChessNotation() const;
+    // Long algebraic notation used by the UCI protocol (e.g. "e2e4", "e7e8q")
+    std::string getUciNotation() const;
+    Move() = default;
     Move(int sRow, int sCol, int eRow, int eCol, int moved, int captured)
         : startRow(sRow), startCol(sCol), endRow(eRow), endCol(eCol),
           pieceMoved(moved), pieceCaptured(captured) {}
 };
 
+//////////////////////////////////////////////////////////////
+// MoveList
+//////////////////////////////////////////////////////////////
+
+// Fixed-capacity move buffer (no position has more than 218 legal moves).
+class MoveList {
+public:
+    static constexpr int CAPACITY = 256;
+    void push_back(const Move& move) { moves_[size_++] = move; }
+    void clear() { size_ = 0; }
+    bool empty() const { return size_ == 0; }
+    std::size_t size() const { return size_; }
+    const Move& operator[](std::size_t i) const { return moves_[i]; }
+    const Move* begin() const { return moves_.data(); }
+    const Move* end() const { return moves_.data() + size_; }
+private:
+    std::array<Move, CAPACITY> moves_;
+    std::size_t size_ = 0;
+};
+
 //////////////////////////////////////////////////////////////
 // Info
 //////////////////////////////////////////////////////////////
@@ -56,6 +80,18 @@ struct Info {
     double eval = 0.0;
 };
 
+// The part of Info a move overwrites that cannot be recomputed from the board.
+struct UndoInfo {
+    uint64_t key;
+    uint64_t block_mask;
+    std::array<std::pair<bool,bool>, 3> castlingRights;
+    std::pair<int,int> enPassantPossible;
+    std::array<bool, 3> inCheck;
+    int winner;
+    int seventyFiveMoveRuleCounter;
+    double eval;
+};
+
 //////////////////////////////////////////////////////////////
 // GameState
 //////////////////////////////////////////////////////////////
@@ -64,19 +100,34 @@ class GameState {
 public:
     using Board = std::array<std::array<int, 8>, 8>;
     GameState();
+    // Set up a position from a FEN string (the full-move number is ignored)
+    static GameState fromFen(const std::string& fen);
+    void loadFen(const std::string& fen);
     // Core update
-    std::string scanAndUpdate();
+    void scanAndUpdate();
+    // FEN of the current position, built on request
+    std::string fen() const;
+    // Zobrist key of the position (pieces, side to move, castling rights, en passant square)
+    uint64_t key() const { return key_; }
+    uint64_t computeKey() const;
+    // Occurrences of the current position since the last capture or pawn move
+    int repetitionCount() const;
     // Move handling
     void makeMove(const Move& move);
     void undoMove(bool reCalculateMoves = true);
     // Attack / legality
     bool isAttacked(int row, int col) const;
+    // {attacked, attacking piece type (7 for several), attacker square}
+    std::tuple<bool, int, std::pair<int,int>> findAttackers(int row, int col) const;
     void updateKingSafety(const Move& move);
+    void setCheckState(bool inCheck, int attackingPiece, int attackingRow, int attackingCol);
+    void updatePotentialPins();
     void updateCheckSquares();
     void updateValidMoves(int row, int col);
     bool checkMoveSafety(const Move& move);
     bool isPinned(const Move& move) const;
     std::pair<int,int> discoveredCheck(const Move& move) const;
+    bool promotionChecks(const Move& move, int piece) const;
     // Move generation
     void getPawnMoves(int row, int col);
     void getKnightMoves(int row, int col);
@@ -84,20 +135,23 @@ public:
     void getKingMoves(int row, int col);
     // Accessors
     const Info& info() const { return info_; }
-    const std::vector<Move>& validMoves() const { return validMoves_; }
+    // Moves of the current ply; they stay valid while deeper plies are made and undone
+    const MoveList& validMoves() const { return moveLists_[moveLog_.size()]; }
 private:
     static constexpr bool inBounds(int r, int c) {
         return r >= 0 && r < 8 && c >= 0 && c < 8;
     }
-    std::string buildBoardRep() const;
+    MoveList& currentMoves() { return moveLists_[moveLog_.size()]; }
 
 private:
     Board board_{};
     int player_ = 1;
+    uint64_t key_ = 0ULL;
     std::vector<Move> moveLog_;
-    std::vector<Info> infoLog_;
+    std::vector<UndoInfo> undoLog_;
     Info info_;
-    std::vector<std::string> boardHistory_;
-    std::unordered_map<std::string, int> boardCounter_;
-    std::vector<Move> validMoves_;
+    // Key of every position of the game, the current one last
+    std::vector<uint64_t> keyHistory_;
+    // One move buffer per ply; a deque so growing it keeps references to lower plies valid
+    std::deque<MoveList> moveLists_;
 };
@@ -1,13 +1,26 @@
-// perft_test.cpp
-// Build example (g++): g++ -O3 -std=c++17 perft_test.cpp GameState.cpp -o perft
-// Run: ./perft 5
+// perft.cpp
+// Build example (g++): g++ -O3 -std=c++17 -pthread perft.cpp ChessBackend.cpp -o perft
+// Run: ./perft 5 [--fen "FEN"] [--threads N] [--divide] [--stats]
+//
+// Root moves are split across threads, each searching on its own GameState copy.
+// Without --stats only nodes are counted, and the last ply is counted in bulk from
+// the move list sizes instead of making every leaf move.
 
 #include "ChessBackend.h"
+#include <algorithm>
+#include <atomic>
 #include <chrono>
 #include <cstdint>
+#include <cstdlib>
+#include <cctype>
 #include <iostream>
+#include <stdexcept>
+#include <string>
+#include <thread>
 #include <vector>
 
+static const char* START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1";
+
 struct PerftStats {
     std::uint64_t nodes = 0;
     std::uint64_t captures = 0;
@@ -18,75 +31,191 @@ struct PerftStats {
     std::uint64_t castles = 0;
     std::uint64_t promotions = 0;
     std::uint64_t doubleChecks = 0;
+
+    PerftStats& operator+=(const PerftStats& other) {
+        nodes += other.nodes;
+        captures += other.captures;
+        checks += other.checks;
+        mates += other.mates;
+        discoveredChecks += other.discoveredChecks;
+        enPassants += other.enPassants;
+        castles += other.castles;
+        promotions += other.promotions;
+        doubleChecks += other.doubleChecks;
+        return *this;
+    }
 };
 
-// NOTE: Your GameState currently keeps validMoves_ private.
-// Add ONE small accessor in your header:
-//
-//   const std::vector<Move>& validMoves() const { return validMoves_; }
-//
-// or make perft_test a friend.
-// This file assumes you added:
-//   const std::vector<Move>& validMoves() const;
-// and (optionally) access to info_:
-//   const Info& info() const { return info_; }
-//
-// If you don't want to expose info, you can skip mates counting.
+struct ThreadResult {
+    PerftStats stats;
+    std::size_t rootMoves = 0;
+    double seconds = 0.0;
+};
+
+// Node count only; the last ply is the size of the move lists one ply above it.
+std::uint64_t perft(GameState& gs, int depth) {
+    // The ply's move list survives the makeMove/undoMove pairs below, so it is not copied
+    const MoveList& moves = gs.validMoves();
+    if (depth == 1) {
+        return moves.size();
+    }
+    std::uint64_t nodes = 0;
+    for (const Move& mv : moves) {
+        gs.makeMove(mv);
+        nodes += perft(gs, depth - 1);
+        gs.undoMove(false);
+    }
+    return nodes;
+}
 
-void perft(GameState& gs, int depth, PerftStats& total) {
-    const auto moves = gs.validMoves(); // accessor needed
-    if (depth == 1) { 
-        total.nodes += moves.size();
-        for (const Move& mv : moves) {
-            if (mv.pieceCaptured != 0) total.captures++;
-            if (mv.isCheck) total.checks++;
-            if (mv.discoveredCheck.first != -1) total.discoveredChecks++;
-            if (mv.isEnPassantMove) total.enPassants++;
-            if (mv.isCastlingMove) total.castles++;
-            if (mv.pawnPromotion != 0) total.promotions++;
-            if (mv.isCheck && mv.discoveredCheck.first != -1) total.doubleChecks++;
+void countLeaf(GameState& gs, const Move& mv, PerftStats& total) {
+    total.nodes++;
+    if (mv.pieceCaptured != 0) total.captures++;
+    if (mv.isCheck || mv.discoveredCheck.first != -1) total.checks++;
+    if (mv.discoveredCheck.first != -1) total.discoveredChecks++;
+    if (mv.isEnPassantMove) total.enPassants++;
+    if (mv.isCastlingMove) total.castles++;
+    if (mv.pawnPromotion != 0) total.promotions++;
+    if (mv.isCheck && mv.discoveredCheck.first != -1) total.doubleChecks++;
+    gs.makeMove(mv);
+    const int w = gs.info().winner;
+    if (w == 1 || w == -1) total.mates++;
+    gs.undoMove(false);
+}
+
+// Node count plus the move statistics of the last ply; every leaf move is made.
+void perftStats(GameState& gs, int depth, PerftStats& total) {
+    const MoveList& moves = gs.validMoves();
+    for (const Move& mv : moves) {
+        if (depth == 1) {
+            countLeaf(gs, mv, total);
+        } else {
             gs.makeMove(mv);
-            const int w = gs.info().winner; // accessor needed
-            if (w == 1 || w == -1) total.mates++;
+            perftStats(gs, depth - 1, total);
             gs.undoMove(false);
         }
     }
-    else{
-        for (const Move& mv : moves) {
+}
+
+// Search the root moves handed out by `next` on a copy of the root position.
+void perftWorker(GameState gs, const std::vector<Move>& rootMoves, int depth, bool stats,
+                 std::atomic<std::size_t>& next, std::vector<std::uint64_t>& rootNodes, ThreadResult& result) {
+    const auto t0 = std::chrono::steady_clock::now();
+    for (std::size_t i = next++; i < rootMoves.size(); i = next++) {
+        const Move& mv = rootMoves[i];
+        PerftStats moveStats{};
+        if (depth == 1) {
+            countLeaf(gs, mv, moveStats);
+        } else if (stats) {
+            gs.makeMove(mv);
+            perftStats(gs, depth - 1, moveStats);
+            gs.undoMove(false);
+        } else {
             gs.makeMove(mv);
-            perft(gs, depth - 1, total);
+            moveStats.nodes = perft(gs, depth - 1);
             gs.undoMove(false);
         }
+        rootNodes[i] = moveStats.nodes;
+        result.stats += moveStats;
+        result.rootMoves++;
     }
+    result.seconds = std::chrono::duration<double>(std::chrono::steady_clock::now() - t0).count();
+}
+
+static void usage(const char* program) {
+    std::cerr << "Usage: " << program << " [depth] [--fen \"FEN\"] [--threads N] [--divide] [--stats]\n"
+              << "  depth      plies to search (default 5)\n"
+              << "  --fen      root position (default: the start position)\n"
+              << "  --threads  worker threads (default: all cores)\n"
+              << "  --divide   print the node count below every root move\n"
+              << "  --stats    also count captures, checks, mates, etc. (makes every leaf move)\n";
 }
 
 int main(int argc, char** argv) {
     int depth = 5;
-    if (argc >= 2) {
-        depth = std::max(1, std::atoi(argv[1]));
+    std::string fen = START_FEN;
+    unsigned threadCount = std::max(1u, std::thread::hardware_concurrency());
+    bool divide = false;
+    bool stats = false;
+    for (int i = 1; i < argc; ++i) {
+        const std::string arg = argv[i];
+        if (arg == "--fen" && i + 1 < argc) {
+            fen = argv[++i];
+        } else if (arg == "--threads" && i + 1 < argc) {
+            threadCount = static_cast<unsigned>(std::max(1, std::atoi(argv[++i])));
+        } else if (arg == "--divide") {
+            divide = true;
+        } else if (arg == "--stats") {
+            stats = true;
+        } else if (arg == "-h" || arg == "--help") {
+            usage(argv[0]);
+            return 0;
+        } else if (!arg.empty() && std::isdigit(static_cast<unsigned char>(arg[0]))) {
+            depth = std::max(1, std::atoi(arg.c_str()));
+        } else {
+            usage(argv[0]);
+            return 1;
+        }
     }
     GameState gs;
-    // Ensure initial moves exist (your constructor calls scanAndUpdate already,
-    // but calling it again is safe if you're unsure).
-    gs.scanAndUpdate();
-    const auto t0 = std::chrono::high_resolution_clock::now();
-    PerftStats s{};
-    perft(gs, depth, s);
-    const auto t1 = std::chrono::high_resolution_clock::now();
-    const std::chrono::duration<double> elapsed = t1 - t0;
+    try {
+        gs.loadFen(fen);
+    } catch (const std::invalid_argument& e) {
+        std::cerr << e.what() << "\n";
+        return 1;
+    }
+    const MoveList& legalMoves = gs.validMoves();
+    const std::vector<Move> rootMoves(legalMoves.begin(), legalMoves.end());
+    threadCount = std::max(1u, std::min(threadCount, static_cast<unsigned>(rootMoves.size())));
+
+    std::atomic<std::size_t> next{0};
+    std::vector<std::uint64_t> rootNodes(rootMoves.size(), 0);
+    std::vector<ThreadResult> results(threadCount);
+    const auto t0 = std::chrono::steady_clock::now();
+    std::vector<std::thread> workers;
+    for (unsigned t = 0; t < threadCount; ++t) {
+        workers.emplace_back(perftWorker, gs, std::cref(rootMoves), depth, stats,
+                             std::ref(next), std::ref(rootNodes), std::ref(results[t]));
+    }
+    for (auto& worker : workers) {
+        worker.join();
+    }
+    const std::chrono::duration<double> elapsed = std::chrono::steady_clock::now() - t0;
     const double secs = elapsed.count();
+
+    PerftStats s{};
+    for (const auto& result : results) {
+        s += result.stats;
+    }
+    if (divide) {
+        for (std::size_t i = 0; i < rootMoves.size(); ++i) {
+            std::cout << rootMoves[i].getUciNotation() << ": " << rootNodes[i] << "\n";
+        }
+        std::cout << "\n";
+    }
     std::cout << "Perft to depth " << depth << ": " << s.nodes << " nodes\n";
-    std::cout << "Captures: " << s.captures
-              << ", Checks: " << s.checks
-              << ", Checkmates: " << s.mates << "\n";
-    std::cout << "Discovered Checks: " << s.discoveredChecks
-              << ", En Passants: " << s.enPassants
-              << ", Castles: " << s.castles << "\n";
-    std::cout << "Promotions: " << s.promotions
-              << ", Double Checks: " << s.doubleChecks << "\n";
+    if (stats) {
+        std::cout << "Captures: " << s.captures
+                  << ", Checks: " << s.checks
+                  << ", Checkmates: " << s.mates << "\n";
+        std::cout << "Discovered Checks: " << s.discoveredChecks
+                  << ", En Passants: " << s.enPassants
+                  << ", Castles: " << s.castles << "\n";
+        std::cout << "Promotions: " << s.promotions
+                  << ", Double Checks: " << s.doubleChecks << "\n";
+    }
+    for (unsigned t = 0; t < threadCount; ++t) {
+        const ThreadResult& result = results[t];
+        std::cout << "Thread " << t << ": " << result.stats.nodes << " nodes, "
+                  << result.rootMoves << " root moves, " << result.seconds << " seconds";
+        if (result.seconds > 0.0) {
+            std::cout << ", " << static_cast<std::uint64_t>(result.stats.nodes / result.seconds) << " nps";
+        }
+        std::cout << "\n";
+    }
     std::cout << "Time taken: " << secs << " seconds\n";
     if (secs > 0.0) {
-        std::cout << "Nodes per second: " << (static_cast<double>(s.nodes) / secs) << "\n";
+        std::cout << "Nodes per second: " << static_cast<std::uint64_t>(s.nodes / secs) << "\n";
     }
     return 0;
-}
\ No newline at end of file
+}
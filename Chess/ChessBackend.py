@@ -2,20 +2,151 @@
 Contains the core logic for representing the chess game state, making and undoing moves,
 and generating valid moves.
 """
+import struct
+from array import array
+
 from PieceTables import PieceTables
+
+# Moves are packed into one int (GameState.moveCodes, moveLog). Squares are row * 8 + col, a8 = 0.
+#  bits  0-5  from square             bits 19-24 square of the piece giving a discovered check
+#  bits  6-11 to square               bit  25    en passant double discovered check
+#  bits 12-14 promotion piece type    bits 26-28 moved piece type
+#  bit  15    castling                bits 29-31 captured piece type (a pawn for en passant)
+#  bit  16    en passant
+#  bit  17    direct check
+#  bit  18    discovered check
+SQUARE_MASK = 63
+PIECE_MASK = 7
+TO_SHIFT = 6
+PROMOTION_SHIFT = 12
+CASTLING_FLAG = 1 << 15
+EN_PASSANT_FLAG = 1 << 16
+CHECK_FLAG = 1 << 17
+DISCOVERED_FLAG = 1 << 18
+DISCOVERER_SHIFT = 19
+DOUBLE_DISCOVERED_FLAG = 1 << 25
+MOVED_SHIFT = 26
+CAPTURED_SHIFT = 29
+TACTICAL_MASK = PIECE_MASK << CAPTURED_SHIFT | PIECE_MASK << PROMOTION_SHIFT # captures and promotions
+
+# The board is a flat list of 64 squares indexed like the move codes (row * 8 + col, a8 = 0).
+# Everything the move generator walks is precomputed per square, so no bounds checks are needed.
+# Directions 0-3 are diagonal and 4-7 orthogonal; RAYS[sq][d] lists the squares from sq to the edge.
+DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1))
+OPPOSITE_DIRECTION = (3, 2, 1, 0, 5, 4, 7, 6)
+KNIGHT_OFFSETS = ((-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1))
+KING_OFFSETS = ((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1))
+
+def _targets(sq, offsets):
+    row, col = divmod(sq, 8)
+    return tuple((row + dr) * 8 + col + dc for dr, dc in offsets if 0 <= row + dr < 8 and 0 <= col + dc < 8)
+
+def _ray(sq, direction):
+    row, col = divmod(sq, 8)
+    dr, dc = DIRECTIONS[direction]
+    squares = []
+    row += dr
+    col += dc
+    while 0 <= row < 8 and 0 <= col < 8:
+        squares.append(row * 8 + col)
+        row += dr
+        col += dc
+    return tuple(squares)
+
+KNIGHT_TARGETS = tuple(_targets(sq, KNIGHT_OFFSETS) for sq in range(64))
+KING_TARGETS = tuple(_targets(sq, KING_OFFSETS) for sq in range(64))
+# PAWN_ATTACKS[player][sq]: squares a pawn of `player` on sq attacks (index 1 white, -1 black)
+PAWN_ATTACKS = ((), tuple(_targets(sq, ((-1, -1), (-1, 1))) for sq in range(64)),
+                tuple(_targets(sq, ((1, -1), (1, 1))) for sq in range(64)))
+RAYS = tuple(tuple(_ray(sq, d) for d in range(8)) for sq in range(64))
+DIAGONAL_RAYS = tuple(rays[:4] for rays in RAYS)
+ORTHOGONAL_RAYS = tuple(rays[4:] for rays in RAYS)
+# Rays a slider of each piece type moves along (3 bishop, 4 rook, 5 queen)
+SLIDER_RAYS = (None, None, None, DIAGONAL_RAYS, ORTHOGONAL_RAYS, RAYS)
+# The same targets as bitmasks (bit n = square n) for the attack map built by scanAndUpdate
+KNIGHT_MASKS = tuple(sum(1 << target for target in targets) for targets in KNIGHT_TARGETS)
+KING_MASKS = tuple(sum(1 << target for target in targets) for targets in KING_TARGETS)
+PAWN_ATTACK_MASKS = ((), tuple(sum(1 << target for target in targets) for targets in PAWN_ATTACKS[1]),
+                     tuple(sum(1 << target for target in targets) for targets in PAWN_ATTACKS[-1]))
+# DIRECTION_BETWEEN[a][b]: direction from a to b if they share a line, else -1
+DIRECTION_BETWEEN = tuple(tuple(next((d for d in range(8) if b in RAYS[a][d]), -1) for b in range(64)) for a in range(64))
+
+# GameState.snapshot(): the board as 64 int8s, side to move, castling rights (K Q k q = bits 0-3),
+# en passant square (-1 for none), winner (2 while the game goes on), half-move clock and the number
+# of repetition keys that follow.
+SNAPSHOT_HEADER = struct.Struct("<64bbBbbHH")
+# A repetition key is a board representation packed into 35 bytes: two squares per byte (piece + 6),
+# then black to move (bit 0) and castling rights (bits 1-4), the en passant square and the count.
+REPETITION_KEY = struct.Struct("<32sBbB")
+
+def packRepetitionKey(rep: str, count: int) -> bytes:
+    placement, stm, castling, ep = rep.split()
+    squares = []
+    for ch in placement:
+        if ch.isdigit():
+            squares.extend([6] * int(ch))
+        elif ch != '/':
+            squares.append(PieceTables.PIECES.index(ch) + (6 if ch.isupper() else -7))
+    packed = bytes(squares[i] << 4 | squares[i + 1] for i in range(0, 64, 2))
+    flags = (stm == 'b') | sum(1 << i + 1 for i, right in enumerate("KQkq") if right in castling)
+    epSquare = (8 - int(ep[1])) * 8 + ord(ep[0]) - ord('a') if ep != '-' else -1
+    return REPETITION_KEY.pack(packed, flags, epSquare, min(count, 255))
+
+def unpackRepetitionKey(data: bytes, offset: int = 0) -> tuple[str, int]:
+    packed, flags, epSquare, count = REPETITION_KEY.unpack_from(data, offset)
+    ranks = []
+    for row in range(8):
+        parts = []
+        empty = 0
+        for col in range(8):
+            byte = packed[row * 4 + col // 2]
+            piece = (byte & 15 if col % 2 else byte >> 4) - 6
+            if piece == 0:
+                empty += 1
+                continue
+            if empty:
+                parts.append(str(empty))
+                empty = 0
+            parts.append(PieceTables.PIECES[piece])
+        if empty:
+            parts.append(str(empty))
+        ranks.append(''.join(parts))
+    castling = ''.join(right for i, right in enumerate("KQkq") if flags >> i + 1 & 1) or '-'
+    ep = f"{chr(ord('a') + epSquare % 8)}{8 - epSquare // 8}" if epSquare >= 0 else '-'
+    return f"{'/'.join(ranks)} {'b' if flags & 1 else 'w'} {castling} {ep}", count
+
 class Move:
-    def __init__(self, startSq, endSq, board):
-        self.startRow = startSq[0]
-        self.startCol = startSq[1]
-        self.endRow = endSq[0]
-        self.endCol = endSq[1]
-        self.pieceMoved = board[self.startRow][self.startCol]
-        self.pieceCaptured = board[self.endRow][self.endCol]
-        self.isCastlingMove = False
-        self.isEnPassantMove = False
-        self.pawnPromotion = 0
-        self.isCheck = False # True if this move gives check to opponent directly (without discovered check)
-        self.discoveredCheck = None # None means no discovered check. If there is discovered check, it stores the square of the checking piece
+    """
+    Decoded view of a packed move code, for the UI, notation and code outside the search.
+    `player` is the side making the move.
+    """
+    __slots__ = ("code", "startRow", "startCol", "endRow", "endCol", "pieceMoved", "pieceCaptured",
+                 "isCastlingMove", "isEnPassantMove", "pawnPromotion", "isCheck", "discoveredCheck")
+
+    def __init__(self, code: int, player: int):
+        self.code = code
+        self.startRow, self.startCol = divmod(code & SQUARE_MASK, 8)
+        self.endRow, self.endCol = divmod(code >> TO_SHIFT & SQUARE_MASK, 8)
+        self.pieceMoved = (code >> MOVED_SHIFT & PIECE_MASK) * player
+        self.pieceCaptured = -(code >> CAPTURED_SHIFT) * player
+        self.isCastlingMove = bool(code & CASTLING_FLAG)
+        self.isEnPassantMove = bool(code & EN_PASSANT_FLAG)
+        self.pawnPromotion = (code >> PROMOTION_SHIFT & PIECE_MASK) * player
+        self.isCheck = bool(code & CHECK_FLAG) # True if this move gives check to opponent directly (without discovered check)
+        # None means no discovered check. If there is discovered check, it stores the square of the checking piece
+        if code & DOUBLE_DISCOVERED_FLAG:
+            self.discoveredCheck = (-1, -1)
+        elif code & DISCOVERED_FLAG:
+            self.discoveredCheck = divmod(code >> DISCOVERER_SHIFT & SQUARE_MASK, 8)
+        else:
+            self.discoveredCheck = None
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and self.code == other.code
+
+    def __hash__(self):
+        return self.code
+
     def getChessNotation(self):
         # Simple chess notation (e.g., "e4" for pawn move to e4)
         str_return = ""
@@ -39,20 +170,27 @@ class Move:
             str_return += "+"
         return str_return
 
+    def getUciNotation(self):
+        # Long algebraic notation used by the UCI protocol (e.g. "e2e4", "e7e8q")
+        str_return = f"{chr(ord('a') + self.startCol)}{8 - self.startRow}{chr(ord('a') + self.endCol)}{8 - self.endRow}"
+        if self.pawnPromotion:
+            str_return += PieceTables.PIECES[abs(self.pawnPromotion)].lower()
+        return str_return
+
     def __str__(self):
         return self.getChessNotation()
     
 class Info:
     def __init__(self):
         self.castlingRights = [(False,False), (True, True), (True, True)] # index 0 unused, 1 for white, -1 for black; each tuple is (king side, queen side)
-        self.kingLocations = [(0,0), (7, 4), (0, 4)] # track kings' positions for check detection, index 0 unused, 1 for white, -1 for black
+        self.kingLocations = [0, 60, 4] # track kings' squares for check detection, index 0 unused, 1 for white, -1 for black
         self.inCheck = [False, False, False] # is white in check, is black in check
-        self.block_mask = [set(),set(),set()]
+        self.block_mask = [set(),set(),set()] # squares that resolve a single check
         self.enPassantPossible = () # coordinates for the square where en passant capture is possible
         self.winner = None # None, 1 for white win, -1 for black win, 0 for draw
         self.seventyFiveMoveRuleCounter = 0 # counts half-moves since last pawn move or capture for 75-move rule
         self.checkSquares = [set(),set(),set(),set(),set(),set()] # squares that put the enemy king in check. Index 0 unused, 1-5 for piece types
-        self.potentialPins = set() # squares where pieces are potentially pinned
+        self.potentialPins = set() # squares of pieces that are potentially pinned
         self.eval = 0 # evaluation score of the position
     def copy(self):
         new = Info()
@@ -71,37 +209,256 @@ class Info:
 class GameState:
     def __init__(self):
         # We represent each piece with an integer. White pieces are positive, and black pieces are negative.
+        # The board is flat: board[row * 8 + col], row 0 is the 8th rank.
         self.board = [
-            [-4, -2, -3, -5, -6, -3, -2, -4],
-            [-1, -1, -1, -1, -1, -1, -1, -1],
-            [ 0,  0,  0,  0,  0,  0,  0,  0],
-            [ 0,  0,  0,  0,  0,  0,  0,  0],
-            [ 0,  0,  0,  0,  0,  0,  0,  0],
-            [ 0,  0,  0,  0,  0,  0,  0,  0],
-            [ 1,  1,  1,  1,  1,  1,  1,  1],
-            [ 4,  2,  3,  5,  6,  3,  2,  4]
+            -4, -2, -3, -5, -6, -3, -2, -4,
+            -1, -1, -1, -1, -1, -1, -1, -1,
+             0,  0,  0,  0,  0,  0,  0,  0,
+             0,  0,  0,  0,  0,  0,  0,  0,
+             0,  0,  0,  0,  0,  0,  0,  0,
+             0,  0,  0,  0,  0,  0,  0,  0,
+             1,  1,  1,  1,  1,  1,  1,  1,
+             4,  2,  3,  5,  6,  3,  2,  4,
         ]
         # Piece codes: 1 = Pawn, 2 = Knight, 3 = Bishop, 4 = Rook, 5 = Queen, 6 = King
         self.player = 1 # 1 for white, -1 for black
         self.moveLog = []
         self.infoLog = []
+        self.moveListLog = [] # (moveCodes, attacked, decodedCodes, decodedMoves) of the earlier plies
+        self.info = Info()
+        self.boardHistory = []
+        self.boardCounter = {}
+        self.moveCodes = array('I') # packed legal moves of the side to move
+        self.attacked = 0 # squares attacked by the side not to move, as a bitmask (set by scanAndUpdate)
+        self.decodedCodes = None # moveCodes that decodedMoves was built from
+        self.decodedMoves = []
+        boardRep = self.scanAndUpdate()
+        self.boardCounter[boardRep] = 1
+        self.boardHistory.append(boardRep)
+
+    @classmethod
+    def fromFen(cls, fen: str):
+        gs = cls.__new__(cls)
+        gs.loadFen(fen)
+        return gs
+
+    def loadFen(self, fen: str):
+        """
+        Set up the position from a FEN string. The half-move clock is used for the
+        75-move rule; the full-move number is ignored. Missing trailing fields
+        default to "w - - 0".
+        """
+        fields = fen.split()
+        placement = fields[0]
+        stm = fields[1] if len(fields) > 1 else 'w'
+        castling = fields[2] if len(fields) > 2 else '-'
+        ep = fields[3] if len(fields) > 3 else '-'
+        halfMoves = int(fields[4]) if len(fields) > 4 else 0
+        ranks = placement.split('/')
+        if len(ranks) != 8:
+            raise ValueError(f"Invalid FEN placement: {placement}")
+        board = []
+        for rank in ranks:
+            row = []
+            for ch in rank:
+                if ch.isdigit():
+                    row.extend([0] * int(ch))
+                else:
+                    row.append(PieceTables.PIECES.index(ch) if ch.isupper() else PieceTables.PIECES.index(ch) - 13)
+            if len(row) != 8:
+                raise ValueError(f"Invalid FEN rank: {rank}")
+            board.extend(row)
+        castlingRights = [(False, False), ('K' in castling, 'Q' in castling), ('k' in castling, 'q' in castling)]
+        enPassant = (8 - int(ep[1]), ord(ep[0]) - ord('a')) if ep != '-' else ()
+        self.loadBoard(board, 1 if stm == 'w' else -1, castlingRights, enPassant, halfMoves)
+
+    def loadBoard(self, board: list, player: int, castlingRights=None, enPassant=(), halfMoves: int = 0):
+        """
+        Set up the position from a flat 64-square board (same layout as self.board) and the side to move.
+        Castling rights default to none.
+        """
+        self.board = board
+        self.player = player
+        self.moveLog = []
+        self.infoLog = []
+        self.moveListLog = []
         self.info = Info()
         self.boardHistory = []
         self.boardCounter = {}
-        self.validMoves = []
+        self.moveCodes = array('I')
+        self.decodedCodes = None
+        self.decodedMoves = []
+        if castlingRights is not None:
+            self.info.castlingRights = castlingRights
+        else:
+            self.info.castlingRights = [(False, False), (False, False), (False, False)]
+        for sq in range(64):
+            if abs(self.board[sq]) == 6:
+                self.info.kingLocations[1 if self.board[sq] > 0 else -1] = sq
+        self.info.enPassantPossible = enPassant
+        self.info.seventyFiveMoveRuleCounter = halfMoves
+        isAttacked, attackingPiece, attackingSq = self.findAttackers(self.info.kingLocations[self.player], self.player)
+        self.setCheckState(self.player, isAttacked, attackingPiece, attackingSq)
         boardRep = self.scanAndUpdate()
         self.boardCounter[boardRep] = 1
         self.boardHistory.append(boardRep)
+        if self.info.winner is None and not self.moveCodes:
+            if self.info.inCheck[self.player]:
+                self.info.winner = -self.player # Checkmate
+                self.info.eval = float('inf') * (-self.player)
+            else:
+                self.info.winner = 0 # Stalemate (draw)
+                self.info.eval = 0
+
+    def copy(self):
+        """
+        Return an independent copy of the game state, e.g. for searching in a background thread.
+        """
+        new = GameState.__new__(GameState)
+        new.board = self.board[:]
+        new.player = self.player
+        new.moveLog = self.moveLog[:]
+        new.infoLog = [info.copy() for info in self.infoLog]
+        new.moveListLog = self.moveListLog[:] # the move arrays are never changed once generated
+        new.info = self.info.copy()
+        new.boardHistory = self.boardHistory[:]
+        new.boardCounter = self.boardCounter.copy()
+        new.moveCodes = self.moveCodes[:]
+        new.attacked = self.attacked
+        new.decodedCodes = None
+        new.decodedMoves = []
+        return new
+
+    def isRepetition(self) -> bool:
+        """
+        Return True if the current position occurred before in the game or the search line. Only the
+        positions since the last capture or pawn move (seventyFiveMoveRuleCounter plies) can match,
+        since those moves cannot be undone, so the count in boardCounter is that bounded scan.
+        """
+        return self.boardCounter[self.boardHistory[-1]] > 1
+
+    def snapshot(self) -> bytes:
+        """
+        Compact binary form of the position for sending to other processes (see SNAPSHOT_HEADER),
+        with the repetition keys of the positions since the last capture or pawn move, the only
+        ones that can repeat. The move log is not included, so a restored state cannot undo past it.
+        """
+        info = self.info
+        castling = sum(1 << i for i, right in enumerate((*info.castlingRights[1], *info.castlingRights[2])) if right)
+        epSquare = info.enPassantPossible[0] * 8 + info.enPassantPossible[1] if info.enPassantPossible else -1
+        winner = 2 if info.winner is None else info.winner
+        current = self.boardHistory[-1]
+        recent = [current] + [rep for rep in dict.fromkeys(self.boardHistory[-1 - info.seventyFiveMoveRuleCounter:-1])
+                              if rep != current]
+        header = SNAPSHOT_HEADER.pack(*self.board, self.player, castling, epSquare, winner,
+                                      info.seventyFiveMoveRuleCounter, len(recent))
+        return header + b"".join(packRepetitionKey(rep, self.boardCounter[rep]) for rep in recent)
+
+    @classmethod
+    def restore(cls, data: bytes):
+        """
+        GameState from snapshot() bytes. Nothing is decoded until the state is first used; then the
+        board, moves, check info and repetition table are rebuilt at once.
+        """
+        gs = cls.__new__(cls)
+        gs.pendingSnapshot = data
+        return gs
+
+    def __getattr__(self, name):
+        # Only called for attributes that are not set, i.e. on the first use of a restored snapshot
+        data = self.__dict__.pop("pendingSnapshot", None)
+        if data is None:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        self.loadSnapshot(data)
+        return getattr(self, name)
+
+    def loadSnapshot(self, data: bytes):
+        fields = SNAPSHOT_HEADER.unpack_from(data)
+        player, castling, epSquare, winner, halfMoves, keyCount = fields[64:]
+        castlingRights = [(False, False), (bool(castling & 1), bool(castling & 2)), (bool(castling & 4), bool(castling & 8))]
+        self.loadBoard(list(fields[:64]), player, castlingRights, divmod(epSquare, 8) if epSquare >= 0 else (), halfMoves)
+        self.boardCounter = {}
+        for i in range(keyCount):
+            rep, count = unpackRepetitionKey(data, SNAPSHOT_HEADER.size + i * REPETITION_KEY.size)
+            self.boardCounter[rep] = count
+        # The first key is the current position, which goes last; the others are kept for the next snapshot
+        current = self.boardHistory[-1]
+        self.boardHistory = [rep for rep in self.boardCounter if rep != current] + [current]
+        if winner != 2:
+            self.info.winner = winner
+            self.info.eval = float('inf') * winner if winner else 0
+            self.moveCodes = array('I')
+
+    @property
+    def validMoves(self) -> list[Move]:
+        """
+        The legal moves as Move objects, decoded from moveCodes on first use.
+        """
+        if self.decodedCodes is not self.moveCodes:
+            player = self.player
+            self.decodedMoves = [Move(code, player) for code in self.moveCodes]
+            self.decodedCodes = self.moveCodes
+        return self.decodedMoves
+
+    @validMoves.setter
+    def validMoves(self, moves: list[Move]):
+        self.moveCodes = array('I', [move.code for move in moves])
+        self.decodedMoves = moves
+        self.decodedCodes = self.moveCodes
+
+    def getMoveLog(self) -> list[Move]:
+        """
+        The moves played so far as Move objects.
+        """
+        player = -self.player if len(self.moveLog) % 2 else self.player # side that made the first move
+        moves = []
+        for code in self.moveLog:
+            moves.append(Move(code, player))
+            player = -player
+        return moves
+
+    def getSanNotation(self, move: Move) -> str:
+        """
+        Standard algebraic notation of a legal move in the current position (e.g. "Nbd7", "exd6", "e8=Q+", "Qh4#").
+        """
+        toSquare = f"{chr(ord('a') + move.endCol)}{8 - move.endRow}"
+        piece = abs(move.pieceMoved)
+        if move.isCastlingMove:
+            san = "O-O" if move.endCol == 6 else "O-O-O"
+        elif piece == 1:
+            isCapture = move.pieceCaptured != 0 or move.isEnPassantMove
+            san = f"{chr(ord('a') + move.startCol)}x{toSquare}" if isCapture else toSquare
+            if move.pawnPromotion:
+                san += "=" + PieceTables.PIECES[abs(move.pawnPromotion)]
+        else:
+            # Disambiguate by file, then rank, then both when another piece of the same kind reaches the square
+            others = [m for m in self.validMoves if m.pieceMoved == move.pieceMoved and (m.endRow, m.endCol) == (move.endRow, move.endCol)
+                      and (m.startRow, m.startCol) != (move.startRow, move.startCol)]
+            origin = ""
+            if others:
+                if all(m.startCol != move.startCol for m in others):
+                    origin = chr(ord('a') + move.startCol)
+                elif all(m.startRow != move.startRow for m in others):
+                    origin = str(8 - move.startRow)
+                else:
+                    origin = f"{chr(ord('a') + move.startCol)}{8 - move.startRow}"
+            san = PieceTables.PIECES[piece] + origin + ("x" if move.pieceCaptured != 0 else "") + toSquare
+        self.makeMoveCode(move.code)
+        if self.info.inCheck[self.player]:
+            san += "#" if self.info.winner == -self.player else "+"
+        self.undoMove()
+        return san
 
     def scanAndUpdate(self):
         """
         Does all the updates that require board scanning in one pass.
-        Update board representation, evaluation, and valid moves. Also check for dead positions.
+        Update board representation, evaluation, the squares attacked by the opponent, and valid moves.
+        Also check for dead positions.
         Note: the score update is not final. Game status will be updated again after move generation.
         Return a string representation of the board for repetition detection.
         """
         ranks_str = []
-        self.validMoves = []
+        self.moveCodes = array('I')
         score = 0
         pieces = []
         possibleDead = True
@@ -109,43 +466,67 @@ class GameState:
         bishopColorWhite = None
         player = self.player
         fac = 0.1 # factor for positional score
+        board = self.board
+        kingSq = self.info.kingLocations[player]
+        ownSquares = []
+        attacked = 0 # bitmask of the squares the opponent attacks
         for r in range(8):
             parts = []
             empty = 0
             for c in range(8):
-                sq = self.board[r][c]
+                square = r * 8 + c
+                sq = board[square]
                 if sq == 0:
                     empty += 1
                 else:
                     #Update parts for FEN
-                    parts.append(PieceTables.PIECES[sq])
-                    #Update Score
-                    posScore = 0
                     if empty:
                         parts.append(str(empty))
                         empty = 0
+                    parts.append(PieceTables.PIECES[sq])
+                    #Update Score
+                    posScore = 0
                     if abs(sq) != 6:
                         posScore = PieceTables.positionalScores[sq][r][c] * fac
                     score += ( PieceTables.VALUES[abs(sq)] + posScore ) * (1 if sq > 0 else -1)
                     # Check for dead position
                     if possibleDead:
-                        pieces.append(self.board[r][c])
+                        pieces.append(sq)
                         if len(pieces) > 4:
                             possibleDead = False
-                        elif abs(self.board[r][c]) == 5 or (abs(self.board[r][c]) ==4 
-                        or abs(self.board[r][c]) ==1):
+                        elif abs(sq) == 5 or (abs(sq) ==4 
+                        or abs(sq) ==1):
                             possibleDead = False
-                        elif self.board[r][c] == -3:
+                        elif sq == -3:
                             bishopColorBlack = (r + c) % 2
-                        elif self.board[r][c] == 3:
+                        elif sq == 3:
                             bishopColorWhite = (r + c) % 2
-                    # Update valid moves for the player to move
-                    if (self.board[r][c] > 0) == (player > 0):
-                        self.updateValidMoves((r, c))
+                    # Moves are generated after the scan, once the opponent's attacks are known
+                    if (sq > 0) == (player > 0):
+                        ownSquares.append(square)
+                    else:
+                        pieceType = abs(sq)
+                        if pieceType == 1:
+                            attacked |= PAWN_ATTACK_MASKS[-player][square]
+                        elif pieceType == 2:
+                            attacked |= KNIGHT_MASKS[square]
+                        elif pieceType == 6:
+                            attacked |= KING_MASKS[square]
+                        else:
+                            for ray in SLIDER_RAYS[pieceType][square]:
+                                for target in ray:
+                                    attacked |= 1 << target
+                                    # x-ray through the king so it cannot step back along the ray
+                                    if board[target] and target != kingSq:
+                                        break
             #Finish board representation for the current rank
             if empty:
                 parts.append(str(empty))
             ranks_str.append(''.join(parts))
+        self.attacked = attacked
+        self.info.inCheck[player] = attacked >> kingSq & 1 == 1
+        for square in ownSquares:
+            self.updateValidMoves(square)
         #Finish board representation
         placement = '/'.join(ranks_str)
         stm = 'w' if self.player == 1 else 'b'
@@ -173,7 +554,7 @@ class GameState:
             if len(pieces) == 2: #K vs K
                 self.info.winner = 0 # Draw
                 self.info.eval = 0
-                self.validMoves = []
+                self.moveCodes = array('I')
             else:
                 pieces.sort()
                 # K vs K + N or K vs K + B
@@ -181,55 +562,71 @@ class GameState:
                                          or pieces == [-6, 2, 6] or pieces == [-6, -2, 6]):
                     self.info.winner = 0 # Draw
                     self.info.eval = 0
-                    self.validMoves = []
+                    self.moveCodes = array('I')
                 # K + B vs K + B (both bishops on same color)
                 elif pieces == [-6, -3, 3, 6]:
                     if bishopColorBlack == bishopColorWhite:
                         self.info.winner = 0 # Draw
                         self.info.eval = 0
-                        self.validMoves = []
+                        self.moveCodes = array('I')
         return(f"{placement} {stm} {castling} {ep}")
         
     def makeMove(self, move: Move):
-        if (move.pieceMoved > 0) != (self.player > 0):
+        self.makeMoveCode(move.code)
+
+    def makeMoveCode(self, code: int):
+        """
+        Make a packed move from moveCodes.
+        """
+        board = self.board
+        player = self.player
+        startSq = code & SQUARE_MASK
+        endSq = code >> TO_SHIFT & SQUARE_MASK
+        startRow, startCol = startSq >> 3, startSq & 7
+        endRow, endCol = endSq >> 3, endSq & 7
+        pieceMoved = board[startSq]
+        if pieceMoved * player <= 0:
             return # Not the player's turn
+        pieceType = code >> MOVED_SHIFT & PIECE_MASK
+        capturedType = code >> CAPTURED_SHIFT
         self.infoLog.append(self.info.copy())
-        self.board[move.startRow][move.startCol] = 0
-        self.board[move.endRow][move.endCol] = move.pieceMoved
-        self.moveLog.append(move)
+        self.moveListLog.append((self.moveCodes, self.attacked, self.decodedCodes, self.decodedMoves))
+        board[startSq] = 0
+        board[endSq] = pieceMoved
+        self.moveLog.append(code)
         #Handle king moves and castling rights
-        if abs(move.pieceMoved) == 6:
-            self.info.kingLocations[self.player] = (move.endRow, move.endCol)
-            if move.isCastlingMove:
-                if move.endCol - move.startCol == 2: # king side
-                    self.board[move.endRow][move.endCol - 1] = self.board[move.endRow][7]
-                    self.board[move.endRow][7] = 0
+        if pieceType == 6:
+            self.info.kingLocations[player] = endSq
+            if code & CASTLING_FLAG:
+                if endCol - startCol == 2: # king side
+                    board[endSq - 1] = board[endSq + 1]
+                    board[endSq + 1] = 0
                 else: # queen side
-                    self.board[move.endRow][move.endCol + 1] = self.board[move.endRow][0]
-                    self.board[move.endRow][0] = 0
-            self.info.castlingRights[self.player] = (False, False)
+                    board[endSq + 1] = board[endSq - 2]
+                    board[endSq - 2] = 0
+            self.info.castlingRights[player] = (False, False)
         #Handle rook moves and castling rights
-        elif abs(move.pieceMoved) == 4:
-            if move.startCol == 0:
-                self.info.castlingRights[self.player] = (self.info.castlingRights[self.player][0], False)
-            elif move.startCol == 7:
-                self.info.castlingRights[self.player] = (False, self.info.castlingRights[self.player][1])
+        elif pieceType == 4 and startRow == (7 if player == 1 else 0): # a rook leaving its home rank
+            if startCol == 0:
+                self.info.castlingRights[player] = (self.info.castlingRights[player][0], False)
+            elif startCol == 7:
+                self.info.castlingRights[player] = (False, self.info.castlingRights[player][1])
         #Handle special pawn moves
-        elif move.pawnPromotion:
-            self.board[move.endRow][move.endCol] = move.pawnPromotion
-        elif move.isEnPassantMove:
-            self.board[move.endRow + self.player][move.endCol] = 0
+        elif code & (PIECE_MASK << PROMOTION_SHIFT):
+            board[endSq] = (code >> PROMOTION_SHIFT & PIECE_MASK) * player
+        elif code & EN_PASSANT_FLAG:
+            board[endSq + 8 * player] = 0
         self.info.enPassantPossible = ()
-        if abs(move.pieceMoved) == 1 and abs(move.startRow - move.endRow) == 2:
-            self.info.enPassantPossible = ( (move.startRow + move.endRow)//2, move.startCol )
+        if pieceType == 1 and abs(startRow - endRow) == 2:
+            self.info.enPassantPossible = ( (startRow + endRow)//2, startCol )
         #Handle rook captures and castling rights
-        elif abs(move.pieceCaptured) == 4:
-            if move.endCol == 0:
-                self.info.castlingRights[-self.player] = (self.info.castlingRights[-self.player][0], False)
-            elif move.endCol == 7:
-                self.info.castlingRights[-self.player] = (False, self.info.castlingRights[-self.player][1])
+        elif capturedType == 4 and endRow == (0 if player == 1 else 7): # a rook captured on the opponent's home rank
+            if endCol == 0:
+                self.info.castlingRights[-player] = (self.info.castlingRights[-player][0], False)
+            elif endCol == 7:
+                self.info.castlingRights[-player] = (False, self.info.castlingRights[-player][1])
         # Update 75-move rule counter
-        if abs(move.pieceMoved) == 1 or move.pieceCaptured != 0:
+        if pieceType == 1 or capturedType != 0:
             self.info.seventyFiveMoveRuleCounter = 0
         else:
             self.info.seventyFiveMoveRuleCounter += 1
@@ -237,7 +634,7 @@ class GameState:
             self.info.winner = 0 # Draw by 75-move rule
             self.info.eval = 0
         self.player *= -1 # switch players
-        self.updateKingSafety(self.player, move)
+        self.updateKingSafety(self.player, code)
         #Scan for all moves and get board representation
         boardRepresentation = self.scanAndUpdate()
         # Update repetition counter and check for fivefold repetition
@@ -251,7 +648,7 @@ class GameState:
         self.boardHistory.append(boardRepresentation)   
 
         if self.info.winner is None:
-            if not self.validMoves:
+            if not self.moveCodes:
                 if self.info.inCheck[self.player]:
                     self.info.winner = -self.player # Checkmate
                     self.info.eval = float('inf') * (-self.player)
@@ -259,580 +656,428 @@ class GameState:
                     self.info.winner = 0 # Stalemate (draw)
                     self.info.eval = 0
         else:
-            self.validMoves = []
+            self.moveCodes = array('I')
 
         
-    def undoMove(self, reCalculateMoves = True):
+    def undoMove(self):
+        """
+        Take back the last move. The position's moves, attack map and check info come back from the
+        logs, so nothing is regenerated.
+        """
         if len(self.moveLog) == 0:
             return
         self.player *= -1 # switch players back
+        player = self.player
+        board = self.board
         boardRep = self.boardHistory.pop()
         count = self.boardCounter[boardRep] - 1
         if count == 0:
             del self.boardCounter[boardRep]
         else:
             self.boardCounter[boardRep] = count
-        move:Move = self.moveLog.pop()
+        code = self.moveLog.pop()
         self.info:Info = self.infoLog.pop()
-        self.board[move.startRow][move.startCol] = move.pieceMoved
-        if move.isEnPassantMove:
-            self.board[move.endRow + self.player][move.endCol] = move.pieceCaptured
-            self.board[move.endRow][move.endCol] = 0
+        self.moveCodes, self.attacked, self.decodedCodes, self.decodedMoves = self.moveListLog.pop()
+        startSq = code & SQUARE_MASK
+        endSq = code >> TO_SHIFT & SQUARE_MASK
+        pieceType = code >> MOVED_SHIFT & PIECE_MASK
+        board[startSq] = pieceType * player
+        if code & EN_PASSANT_FLAG:
+            board[endSq + 8 * player] = -player
+            board[endSq] = 0
         else:
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
-            if move.pieceMoved == 6 or move.pieceMoved == -6:
-                self.info.kingLocations[self.player] = (move.startRow, move.startCol)
-                if move.isCastlingMove:
-                    if move.endCol - move.startCol == 2: # king side
-                        self.board[move.endRow][7] = self.board[move.endRow][move.endCol - 1]
-                        self.board[move.endRow][move.endCol - 1] = 0
-                    else: # queen side
-                        self.board[move.endRow][0] = self.board[move.endRow][move.endCol + 1]
-                        self.board[move.endRow][move.endCol + 1] = 0
-        if reCalculateMoves:
-            self.scanAndUpdate()
+            board[endSq] = -(code >> CAPTURED_SHIFT) * player
+            if pieceType == 6 and code & CASTLING_FLAG:
+                if endSq - startSq == 2: # king side
+                    board[endSq + 1] = board[endSq - 1]
+                    board[endSq - 1] = 0
+                else: # queen side
+                    board[endSq - 2] = board[endSq + 1]
+                    board[endSq + 1] = 0
+    
     
     # Return True if the square is attacked by opponent pieces
-    def isAttacked(self, pieceRow, pieceCol, player):
+    def isAttacked(self, sq, player):
+        board = self.board
         #Check if attacked by knight
-        knightMoves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-        for move in knightMoves:
-            endRow = pieceRow + move[0]
-            endCol = pieceCol + move[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                if self.board[endRow][endCol] == -2 * player:
-                    return True
+        knight = -2 * player
+        for target in KNIGHT_TARGETS[sq]:
+            if board[target] == knight:
+                return True
         #Check if attacked by bishop/queen (diagonal)
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for direction in directions:
-            currRow, currCol = pieceRow, pieceCol
-            while True:
-                currRow += direction[0]
-                currCol += direction[1]
-                if 0 <= currRow < 8 and 0 <= currCol < 8:
-                    piece = self.board[currRow][currCol]
-                    if piece == 0:
-                        continue
-                    elif piece == -3 * player or piece == -5 * player:
+        bishop = -3 * player
+        queen = -5 * player
+        for ray in DIAGONAL_RAYS[sq]:
+            for target in ray:
+                piece = board[target]
+                if piece:
+                    if piece == bishop or piece == queen:
                         return True
-                    else:
-                        break
-                else:
                     break
         #Check if attacked by rook/queen (horizontal/vertical)
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for direction in directions:
-            currRow, currCol = pieceRow, pieceCol
-            while True:
-                currRow += direction[0]
-                currCol += direction[1]
-                if 0 <= currRow < 8 and 0 <= currCol < 8:
-                    piece = self.board[currRow][currCol]
-                    if piece == 0:
-                        continue
-                    elif piece == -4 * player or piece == -5 * player:
+        rook = -4 * player
+        for ray in ORTHOGONAL_RAYS[sq]:
+            for target in ray:
+                piece = board[target]
+                if piece:
+                    if piece == rook or piece == queen:
                         return True
-                    else:
-                        break
-                else:
                     break
-        #Check if attacked by pawn
-        if 0 <= pieceRow - player < 8:
-            if (0 <= pieceCol - 1 < 8 and self.board[pieceRow - player][pieceCol - 1] == -1 * player
-                ) or (0 <= pieceCol + 1 < 8 and self.board[pieceRow - player][pieceCol + 1] == -1 * player):
+        #Check if attacked by pawn: enemy pawns attack from the squares our own pawn would capture on
+        for target in PAWN_ATTACKS[player][sq]:
+            if board[target] == -player:
                 return True
         #Check if attacked by king
-        kingMoves = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        for move in kingMoves:
-            endRow = pieceRow + move[0]
-            endCol = pieceCol + move[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                if self.board[endRow][endCol] == -6 * player:
-                    return True
+        king = -6 * player
+        for target in KING_TARGETS[sq]:
+            if board[target] == king:
+                return True
         return False
     
-    def updateKingSafety(self, player, move: Move):
-        kingRow, kingCol = self.info.kingLocations[player]
-        self.info.block_mask[player] = set()
+    def updateKingSafety(self, player, code: int):
         inCheck = False
         attackingPiece = None
-        attackingPieceRow = -1
-        attackingPieceCol = -1
-        if move.isCheck:
+        attackingSq = -1
+        if code & CHECK_FLAG:
             inCheck = True
-            attackingPiece = abs(move.pieceMoved)
-            attackingPieceRow = move.endRow
-            attackingPieceCol = move.endCol
-            if move.isCheck and move.discoveredCheck:
+            attackingSq = code >> TO_SHIFT & SQUARE_MASK
+            attackingPiece = abs(self.board[attackingSq]) # the promoted piece after a promotion
+            if code & DISCOVERED_FLAG:
                 attackingPiece = 7 #indicate multiple attackers
-        elif move.discoveredCheck:
+        elif code & DISCOVERED_FLAG:
             inCheck = True
-            if move.isEnPassantMove and move.discoveredCheck == (-1,-1):
+            if code & DOUBLE_DISCOVERED_FLAG:
                 attackingPiece = 7 #indicate multiple attackers
             else:
-                attackingPieceRow = move.discoveredCheck[0]
-                attackingPieceCol = move.discoveredCheck[1]
-                attackingPiece = abs(self.board[attackingPieceRow][attackingPieceCol])
-        self.info.inCheck[player] = inCheck
+                attackingSq = code >> DISCOVERER_SHIFT & SQUARE_MASK
+                attackingPiece = abs(self.board[attackingSq])
+        self.setCheckState(player, inCheck, attackingPiece, attackingSq)
+
+    def setCheckState(self, player, inCheck, attackingPiece, attackingSq):
+        """
+        Update block mask, potential pins and check squares for `player` to move. The check
+        flag itself comes from the attack map in scanAndUpdate.
+        attackingPiece is the checking piece type, or 7 for a double check.
+        """
+        board = self.board
+        kingSq = self.info.kingLocations[player]
+        blockMask = set()
+        self.info.block_mask[player] = blockMask
         if inCheck and attackingPiece != 7:
             if attackingPiece in [2, 1, 6]: # knight, pawn, king
-                self.info.block_mask[player].add((attackingPieceRow, attackingPieceCol))
+                blockMask.add(attackingSq)
             else:
-                # Compute the direction from the king to the attacking piece
-                directionRow = (attackingPieceRow > kingRow) - (attackingPieceRow < kingRow)
-                directionCol = (attackingPieceCol > kingCol) - (attackingPieceCol < kingCol)
-                currRow = kingRow + directionRow
-                currCol = kingCol + directionCol
-                while (currRow, currCol) != (attackingPieceRow, attackingPieceCol):
-                    self.info.block_mask[player].add((currRow, currCol))
-                    currRow += directionRow
-                    currCol += directionCol
-                self.info.block_mask[player].add((attackingPieceRow, attackingPieceCol))
-        # Update potential pins
-        dirs = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        self.info.potentialPins = set()
-        for direction in dirs:
-            currRow, currCol = kingRow, kingCol
-            while True:
-                currRow += direction[0]
-                currCol += direction[1]
-                if 0 <= currRow < 8 and 0 <= currCol < 8:
-                    piece = self.board[currRow][currCol]
-                    if piece == 0:
-                        continue
-                    elif (piece > 0) == (player > 0): # friendly piece
-                        self.info.potentialPins.add((currRow, currCol))
-                        break
-                    else:  # enemy piece
+                # The squares from the king up to and including the attacking piece
+                for sq in RAYS[kingSq][DIRECTION_BETWEEN[kingSq][attackingSq]]:
+                    blockMask.add(sq)
+                    if sq == attackingSq:
                         break
-                else:
+        # Update potential pins
+        potentialPins = set()
+        self.info.potentialPins = potentialPins
+        for ray in RAYS[kingSq]:
+            for sq in ray:
+                piece = board[sq]
+                if piece:
+                    if (piece > 0) == (player > 0): # friendly piece
+                        potentialPins.add(sq)
                     break
         #Update Check squares
         self.updateCheckSquares(player)
 
     def updateCheckSquares(self, player):
         #Update check squares for the enemy king for move generation
-        self.info.checkSquares = [set(),set(),set(),set(),set(),set()]
-        enemyKingR, enemyKingC = self.info.kingLocations[-player]
-        #Pawns
-        dirs = [(player, -1), (player, 1)]
-        for d in dirs:
-            r = enemyKingR + d[0]
-            c = enemyKingC + d[1]
-            if 0 <= r < 8 and 0 <= c < 8:
-                self.info.checkSquares[1].add((r, c))
-        #Knights
-        knightMoves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-        for move in knightMoves:
-            r = enemyKingR + move[0]
-            c = enemyKingC + move[1]
-            if 0 <= r < 8 and 0 <= c < 8:
-                self.info.checkSquares[2].add((r, c))
-        #Bishops/Queens (diagonal)
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for direction in directions:
-            currRow, currCol = enemyKingR, enemyKingC
-            while True:
-                currRow += direction[0]
-                currCol += direction[1]
-                if 0 <= currRow < 8 and 0 <= currCol < 8:
-                    piece = self.board[currRow][currCol]
-                    if piece == 0:
-                        self.info.checkSquares[3].add((currRow, currCol))
-                        self.info.checkSquares[5].add((currRow, currCol))
-                    else:
-                        self.info.checkSquares[3].add((currRow, currCol))
-                        self.info.checkSquares[5].add((currRow, currCol))
-                        break
-                else:
+        board = self.board
+        enemyKing = self.info.kingLocations[-player]
+        diagonal = set()
+        for ray in DIAGONAL_RAYS[enemyKing]:
+            for sq in ray:
+                diagonal.add(sq)
+                if board[sq]:
                     break
-        #Rooks/Queens (horizontal/vertical)
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for direction in directions:
-            currRow, currCol = enemyKingR, enemyKingC
-            while True:
-                currRow += direction[0]
-                currCol += direction[1]
-                if 0 <= currRow < 8 and 0 <= currCol < 8:
-                    piece = self.board[currRow][currCol]
-                    if piece == 0:
-                        self.info.checkSquares[4].add((currRow, currCol))
-                        self.info.checkSquares[5].add((currRow, currCol))
-                    else:
-                        self.info.checkSquares[4].add((currRow, currCol))
-                        self.info.checkSquares[5].add((currRow, currCol))
-                        break
-                else:
+        orthogonal = set()
+        for ray in ORTHOGONAL_RAYS[enemyKing]:
+            for sq in ray:
+                orthogonal.add(sq)
+                if board[sq]:
                     break
+        # Pawns check from the squares an enemy pawn on the king's square would capture on
+        self.info.checkSquares = [set(), set(PAWN_ATTACKS[-player][enemyKing]), set(KNIGHT_TARGETS[enemyKing]),
+                                  diagonal, orthogonal, diagonal | orthogonal]
     
-    def updateValidMoves(self, position):
-        row, col = position
-        piece = self.board[row][col]
+    def updateValidMoves(self, sq):
+        piece = self.board[sq]
         if piece == 0 or (piece > 0) != (self.player > 0):
             return [] # No piece or not the player's piece
         if self.info.inCheck[self.player] and not self.info.block_mask[self.player]:
             if piece == 6 or piece == -6:
-                return self.getKingMoves(row, col, self.player)
+                return self.getKingMoves(sq, self.player)
             return [] # In double check, only king moves allowed
         if abs(piece) == 1:
-            return self.getPawnMoves(row, col, self.player)
+            return self.getPawnMoves(sq, self.player)
         if abs(piece) == 2:
-            return self.getKnightMoves(row, col, self.player)
+            return self.getKnightMoves(sq, self.player)
         if abs(piece) == 3 or abs(piece) == 4 or abs(piece) == 5:
-            return self.getRayMoves(row, col, self.player, piece)
+            return self.getRayMoves(sq, self.player, piece)
         if abs(piece) == 6:
-            return self.getKingMoves(row, col, self.player)
+            return self.getKingMoves(sq, self.player)
         return []
     
-    def checkMoveSafety(self, move: Move, player):
-        self.board[move.startRow][move.startCol] = 0
-        self.board[move.endRow][move.endCol] = move.pieceMoved
-        if move.isEnPassantMove:
-            self.board[move.endRow + player][move.endCol] = 0
-        if move.pieceMoved * player == 6:
-            kingRow, kingCol = move.endRow, move.endCol
-        else:
-            kingRow, kingCol = self.info.kingLocations[player]
-        inCheck = self.isAttacked(kingRow, kingCol, player)
-        if move.isEnPassantMove:
-            self.board[move.endRow + player][move.endCol] = move.pieceCaptured
-            self.board[move.endRow][move.endCol] = 0
-        else:
-            self.board[move.endRow][move.endCol] = move.pieceCaptured
-        self.board[move.startRow][move.startCol] = move.pieceMoved
-        return not inCheck
-    
-    def isPinned(self, move: Move, player):
+    def isPinned(self, startSq, endSq, player):
         """
         Return True if the piece being moved is pinned to the king
         """
-        if (move.startRow, move.startCol) not in self.info.potentialPins:
-            return False
-        kingRow = self.info.kingLocations[player][0]
-        kingCol = self.info.kingLocations[player][1]
-        pinnedDirectionRow = (move.startRow > kingRow) - (move.startRow < kingRow)
-        pinnedDirectionCol = (move.startCol > kingCol) - (move.startCol < kingCol)
-        moveDirectionRow = (move.endRow > move.startRow) - (move.endRow < move.startRow)
-        moveDirectionCol = (move.endCol > move.startCol) - (move.endCol < move.startCol)
-        if (pinnedDirectionRow, pinnedDirectionCol) == (moveDirectionRow, moveDirectionCol) or (
-            pinnedDirectionRow, pinnedDirectionCol) == (-moveDirectionRow, -moveDirectionCol):
+        if startSq not in self.info.potentialPins:
             return False
-        currRow, currCol = move.startRow, move.startCol
-        while True:
-            currRow += pinnedDirectionRow
-            currCol += pinnedDirectionCol
-            if 0 <= currRow < 8 and 0 <= currCol < 8:
-                piece = self.board[currRow][currCol]
-                if piece == 0:
-                    continue
-                elif (piece > 0) == (player > 0): # friendly piece
-                    break
-                else:  # enemy piece
-                    if pinnedDirectionRow == 0 or pinnedDirectionCol == 0:
-                        if piece == -4 * player or piece == -5 * player:
-                            return True
-                    else:
-                        if piece == -3 * player or piece == -5 * player:
-                            return True
-                    break
-            else:
-                break
+        pinnedDirection = DIRECTION_BETWEEN[self.info.kingLocations[player]][startSq]
+        moveDirection = DIRECTION_BETWEEN[startSq][endSq]
+        if moveDirection == pinnedDirection or moveDirection == OPPOSITE_DIRECTION[pinnedDirection]:
+            return False # moving along the pin line
+        board = self.board
+        for sq in RAYS[startSq][pinnedDirection]:
+            piece = board[sq]
+            if piece:
+                if (piece > 0) == (player > 0): # friendly piece
+                    return False
+                if pinnedDirection >= 4: # orthogonal
+                    return piece == -4 * player or piece == -5 * player
+                return piece == -3 * player or piece == -5 * player
+        return False
 
-    def discoveredCheck(self, move: Move, player):
-        if (move.startRow, move.startCol) not in self.info.checkSquares[5]:
-            if move.isEnPassantMove:
+    def discoveredCheck(self, startSq, endSq, player, pieceType, isEnPassant=False):
+        """
+        Return the discovered check bits of the move code: 0 for no discovered check, otherwise
+        DISCOVERED_FLAG with the square of the checking piece, or DOUBLE_DISCOVERED_FLAG as well
+        when an en passant capture uncovers two checks.
+        """
+        checkSquares = self.info.checkSquares
+        if startSq not in checkSquares[5]:
+            if isEnPassant:
                 #Check for single discovered check via en passant
-                enPassantRow = move.endRow + player
-                enPassantCol = move.endCol
-                if (enPassantRow, enPassantCol) in self.info.checkSquares[3]:
-                    return self.discoveredCheck(Move((enPassantRow, enPassantCol), 
-                                                     (move.endRow, enPassantCol),
-                                                     self.board), player)
-            return None
-        kingRow, kingCol = self.info.kingLocations[-player]
-        directionRow = (move.startRow > kingRow) - (move.startRow < kingRow)
-        directionCol = (move.startCol > kingCol) - (move.startCol < kingCol)
-        moveDirRow = (move.endRow > move.startRow) - (move.endRow < move.startRow)
-        moveDirCol = (move.endCol > move.startCol) - (move.endCol < move.startCol)
-        if abs(move.pieceMoved)!=2 and ((directionRow, directionCol) == (moveDirRow, moveDirCol) or (
-            directionRow, directionCol) == (-moveDirRow, -moveDirCol)):
-            return None # Moving away or along the line, no discovered check
-        currRow, currCol = move.startRow, move.startCol
-        while True:
-            currRow += directionRow
-            currCol += directionCol
-            if 0 <= currRow < 8 and 0 <= currCol < 8:
-                piece = self.board[currRow][currCol]
-                if piece == 0:
-                    continue
-                elif (piece > 0) != (player > 0): # enemy piece
+                capturedSq = endSq + 8 * player
+                if capturedSq in checkSquares[3]:
+                    return self.discoveredCheck(capturedSq, endSq, player, 1)
+            return 0
+        direction = DIRECTION_BETWEEN[self.info.kingLocations[-player]][startSq]
+        moveDirection = DIRECTION_BETWEEN[startSq][endSq]
+        if pieceType != 2 and (moveDirection == direction or moveDirection == OPPOSITE_DIRECTION[direction]):
+            return 0 # Moving away or along the line, no discovered check
+        board = self.board
+        for sq in RAYS[startSq][direction]:
+            piece = board[sq]
+            if piece:
+                if (piece > 0) != (player > 0): # enemy piece
                     break
-                else:  # friendly piece
-                    if directionRow == 0 or directionCol == 0:
-                        if piece == 4 * player or piece == 5 * player:
-                            #Check for Double discovered check (extremely rare)
-                            if move.isEnPassantMove:
-                                enPassantRow = move.endRow + player
-                                enPassantCol = move.endCol
-                                if (enPassantRow, enPassantCol) in self.info.checkSquares[3]:
-                                    if self.discoveredCheck(Move((enPassantRow, enPassantCol), 
-                                                                     (move.endRow, enPassantCol),self.board), 
-                                                                     player):
-                                        return (-1,-1) 
-                            return (currRow, currCol)
-                    else:
-                        if piece == 3 * player or piece == 5 * player:
-                            #Check for Double discovered check (extremely rare)
-                            if move.isEnPassantMove:
-                                enPassantRow = move.endRow + player
-                                enPassantCol = move.endCol
-                                if (enPassantRow, enPassantCol) in self.info.checkSquares[3]:
-                                    if self.discoveredCheck(Move((enPassantRow, enPassantCol), 
-                                                                     (move.endRow, enPassantCol),self.board), 
-                                                                     player):
-                                        return (-1,-1) 
-                            return (currRow, currCol)
-                    break
-            else:
+                if direction >= 4: # orthogonal
+                    isChecker = piece == 4 * player or piece == 5 * player
+                else:
+                    isChecker = piece == 3 * player or piece == 5 * player
+                if isChecker:
+                    #Check for Double discovered check (extremely rare)
+                    if isEnPassant:
+                        capturedSq = endSq + 8 * player
+                        if capturedSq in checkSquares[3]:
+                            if self.discoveredCheck(capturedSq, endSq, player, 1):
+                                return DISCOVERED_FLAG | DOUBLE_DISCOVERED_FLAG
+                    return DISCOVERED_FLAG | sq << DISCOVERER_SHIFT
                 break
-        if move.isEnPassantMove:
+        if isEnPassant:
             #Check for single discovered check via en passant
-            enPassantRow = move.endRow + player
-            enPassantCol = move.endCol
-            if (enPassantRow, enPassantCol) in self.info.checkSquares[3]: # Single discovered check via en passant
-                return self.discoveredCheck(Move((enPassantRow, enPassantCol), (move.endRow, enPassantCol),self.board), player)
-        return None
+            capturedSq = endSq + 8 * player
+            if capturedSq in checkSquares[3]: # Single discovered check via en passant
+                return self.discoveredCheck(capturedSq, endSq, player, 1)
+        return 0
 
-    def getPawnMoves(self, row, col, player):
+    def getPawnMoves(self, sq, player):
         inCheck = self.info.inCheck[player]
+        blockMask = self.info.block_mask[player]
+        checkSquares = self.info.checkSquares
+        board = self.board
+        moveCodes = self.moveCodes
+        row = sq >> 3
         startRow = 6 if player == 1 else 1
-        if self.board[row - player][col] == 0:
-            move = Move((row, col), (row - player, col), self.board)
-            if not self.isPinned(move, player):
-                if not inCheck or (row - player, col) in self.info.block_mask[player]:
-                    if row - player == 0 or row - player == 7:
+        endSq = sq - 8 * player
+        promotes = endSq < 8 or endSq >= 56
+        fromBits = sq | 1 << MOVED_SHIFT
+        if board[endSq] == 0:
+            if not self.isPinned(sq, endSq, player):
+                if not inCheck or endSq in blockMask:
+                    code = fromBits | endSq << TO_SHIFT
+                    if promotes:
                         for promoPiece in [5,4,3,2]: # promote to queen, rook, bishop, knight
-                            move = Move((row, col), (row - player, col), self.board)
-                            move.pawnPromotion = promoPiece * player
-                            move.isCheck = (row - player, col) in self.info.checkSquares[promoPiece]
-                            move.discoveredCheck = self.discoveredCheck(move, player)
-                            self.validMoves.append(move)
+                            promoCode = code | promoPiece << PROMOTION_SHIFT
+                            if self.promotionChecks(sq, endSq, player, promoPiece):
+                                promoCode |= CHECK_FLAG
+                            moveCodes.append(promoCode | self.discoveredCheck(sq, endSq, player, 1))
                     else:
-                        move.isCheck = (row - player, col) in self.info.checkSquares[1]
-                        move.discoveredCheck = self.discoveredCheck(move, player)
-                        self.validMoves.append(move)
-                if row == startRow and self.board[row - 2 * player][col] == 0:
-                    move = Move((row, col), (row - 2 * player, col), self.board)
-                    if not inCheck or (row - 2 * player, col) in self.info.block_mask[player]:
-                        move.isCheck = (row - 2 * player, col) in self.info.checkSquares[1]
-                        move.discoveredCheck = self.discoveredCheck(move, player)
-                        self.validMoves.append(move)
-        for dc in [-1, 1]:
-            if 0 <= col + dc < 8:
-                if self.board[row - player][col + dc] * player < 0:
-                    move = Move((row, col), (row - player, col + dc), self.board)
-                    if not self.isPinned(move, player):
-                        if not inCheck or (row - player, col + dc) in self.info.block_mask[player]:
-                            if row - player == 0 or row - player == 7:
-                                for promoPiece in [5,4,3,2]: # promote to queen, rook, bishop, knight
-                                    move = Move((row, col), (row - player, col + dc), self.board)
-                                    move.pawnPromotion = promoPiece * player
-                                    move.isCheck = (row - player, col + dc) in self.info.checkSquares[promoPiece]
-                                    move.discoveredCheck = self.discoveredCheck(move, player)
-                                    self.validMoves.append(move)
-                            else:
-                                move.isCheck = (row - player, col + dc) in self.info.checkSquares[1]
-                                move.discoveredCheck = self.discoveredCheck(move, player)
-                                self.validMoves.append(move)
-                elif (row - player, col + dc) == self.info.enPassantPossible:
-                    move = Move((row, col), (row - player, col + dc), self.board)
-                    move.isEnPassantMove = True
-                    move.pieceCaptured = -1 * player
-                    if not self.isPinned(move, player):
-                        if not inCheck or (row - player, col + dc) in self.info.block_mask[player]:
-                            move.isCheck = (row - player, col + dc) in self.info.checkSquares[1]
-                            move.discoveredCheck = self.discoveredCheck(move, player)
-                            self.validMoves.append(move)
+                        if endSq in checkSquares[1]:
+                            code |= CHECK_FLAG
+                        moveCodes.append(code | self.discoveredCheck(sq, endSq, player, 1))
+                doubleSq = endSq - 8 * player
+                if row == startRow and board[doubleSq] == 0:
+                    if not inCheck or doubleSq in blockMask:
+                        code = fromBits | doubleSq << TO_SHIFT
+                        if doubleSq in checkSquares[1]:
+                            code |= CHECK_FLAG
+                        moveCodes.append(code | self.discoveredCheck(sq, doubleSq, player, 1))
+        enPassant = self.info.enPassantPossible
+        enPassantSq = enPassant[0] * 8 + enPassant[1] if enPassant else -1
+        for endSq in PAWN_ATTACKS[player][sq]:
+            captured = board[endSq]
+            if captured * player < 0:
+                if not self.isPinned(sq, endSq, player):
+                    if not inCheck or endSq in blockMask:
+                        code = fromBits | endSq << TO_SHIFT | abs(captured) << CAPTURED_SHIFT
+                        if promotes:
+                            for promoPiece in [5,4,3,2]: # promote to queen, rook, bishop, knight
+                                promoCode = code | promoPiece << PROMOTION_SHIFT
+                                if self.promotionChecks(sq, endSq, player, promoPiece):
+                                    promoCode |= CHECK_FLAG
+                                moveCodes.append(promoCode | self.discoveredCheck(sq, endSq, player, 1))
+                        else:
+                            if endSq in checkSquares[1]:
+                                code |= CHECK_FLAG
+                            moveCodes.append(code | self.discoveredCheck(sq, endSq, player, 1))
+            elif endSq == enPassantSq:
+                # Removing two pawns can uncover the king in ways pins and block masks miss
+                # (both pawns between the king and a rook on the rank), so test the capture itself.
+                if self.enPassantIsSafe(sq, endSq, player):
+                    code = fromBits | endSq << TO_SHIFT | 1 << CAPTURED_SHIFT | EN_PASSANT_FLAG
+                    if endSq in checkSquares[1]:
+                        code |= CHECK_FLAG
+                    moveCodes.append(code | self.discoveredCheck(sq, endSq, player, 1, True))
+
+    def promotionChecks(self, startSq, endSq, player, promoPiece):
+        """
+        Return True if the piece promoted on endSq checks the enemy king. The check squares stop at
+        the pawn itself, so promoting further along a line the pawn was blocking is tested separately.
+        """
+        checkSquares = self.info.checkSquares[promoPiece]
+        if endSq in checkSquares:
+            return True
+        return promoPiece != 2 and startSq in checkSquares and \
+            DIRECTION_BETWEEN[self.info.kingLocations[-player]][startSq] == DIRECTION_BETWEEN[startSq][endSq]
+
+    def enPassantIsSafe(self, startSq, endSq, player):
+        """
+        Return True if the en passant capture does not leave `player`'s king attacked.
+        """
+        board = self.board
+        capturedSq = endSq + 8 * player
+        board[startSq] = 0
+        board[capturedSq] = 0
+        board[endSq] = player
+        safe = not self.isAttacked(self.info.kingLocations[player], player)
+        board[endSq] = 0
+        board[capturedSq] = -player
+        board[startSq] = player
+        return safe
     
-    def getKnightMoves(self, row, col, player):
-        knightMoves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+    def getKnightMoves(self, sq, player):
         #Return if pinned
-        if self.isPinned(Move((row, col), (row, col), self.board), player):
+        if self.isPinned(sq, sq, player):
             return
         inCheck = self.info.inCheck[player]
-        discoveredCheck = self.discoveredCheck(Move((row, col), (row, col), self.board), player)
-        for moveOffset in knightMoves:
-            endRow = row + moveOffset[0]
-            endCol = col + moveOffset[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8 and self.board[endRow][endCol] * player <= 0:
-                move = Move((row, col), (endRow, endCol), self.board)
-                if not inCheck or (endRow, endCol) in self.info.block_mask[player]:
-                    move.isCheck = (endRow, endCol) in self.info.checkSquares[2]
-                    move.discoveredCheck = discoveredCheck
-                    self.validMoves.append(move)
+        blockMask = self.info.block_mask[player]
+        checkSquares = self.info.checkSquares[2]
+        board = self.board
+        moveCodes = self.moveCodes
+        fromBits = sq | 2 << MOVED_SHIFT | self.discoveredCheck(sq, sq, player, 2)
+        for endSq in KNIGHT_TARGETS[sq]:
+            captured = board[endSq]
+            if captured * player <= 0:
+                if not inCheck or endSq in blockMask:
+                    code = fromBits | endSq << TO_SHIFT | abs(captured) << CAPTURED_SHIFT
+                    if endSq in checkSquares:
+                        code |= CHECK_FLAG
+                    moveCodes.append(code)
     
-    def getRayMoves(self, row, col, player, piece):
-        if abs(piece) == 3: #Bishop
-            directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        elif abs(piece) == 4: #Rook
-            directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        elif abs(piece) == 5: #Queen
-            directions = [(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)]
-        else:
-            return
+    def getRayMoves(self, sq, player, piece):
+        pieceType = abs(piece)
         inCheck = self.info.inCheck[player]
-        for direction in directions:
-            currRow, currCol = row + direction[0], col + direction[1]
-            if 0 <= currRow < 8 and 0 <= currCol < 8:
-                if self.board[currRow][currCol] * player > 0:
-                    continue
-                move = Move((row, col), (currRow, currCol), self.board)
-                if not self.isPinned(move, player):
-                    discoveredCheck = None if abs(piece) == 5 else self.discoveredCheck(move, player) # queen can't give discovered check
-                    if not inCheck or (currRow, currCol) in self.info.block_mask[player]:
-                        move.isCheck = (currRow, currCol) in self.info.checkSquares[abs(piece)]
-                        move.discoveredCheck = discoveredCheck
-                        self.validMoves.append(move)
-                    if self.board[currRow][currCol] * player < 0:
-                        continue
-                    while True:
-                        currRow += direction[0]
-                        currCol += direction[1]
-                        if 0 <= currRow < 8 and 0 <= currCol < 8:
-                            if self.board[currRow][currCol] * player > 0:
-                                break
-                            move = Move((row, col), (currRow, currCol), self.board)
-                            if not inCheck or (currRow, currCol) in self.info.block_mask[player]:
-                                move.isCheck = (currRow, currCol) in self.info.checkSquares[abs(piece)]
-                                move.discoveredCheck = discoveredCheck
-                                self.validMoves.append(move)
-                            if self.board[currRow][currCol] * player < 0:
-                                break
-                        else:
-                            break
+        blockMask = self.info.block_mask[player]
+        checkSquares = self.info.checkSquares[pieceType]
+        board = self.board
+        moveCodes = self.moveCodes
+        pieceBits = sq | pieceType << MOVED_SHIFT
+        for ray in SLIDER_RAYS[pieceType][sq]:
+            if not ray or board[ray[0]] * player > 0:
+                continue
+            if self.isPinned(sq, ray[0], player):
+                continue
+            # queen can't give discovered check
+            fromBits = pieceBits if pieceType == 5 else pieceBits | self.discoveredCheck(sq, ray[0], player, pieceType)
+            for endSq in ray:
+                captured = board[endSq]
+                if captured * player > 0:
+                    break
+                if not inCheck or endSq in blockMask:
+                    code = fromBits | endSq << TO_SHIFT | abs(captured) << CAPTURED_SHIFT
+                    if endSq in checkSquares:
+                        code |= CHECK_FLAG
+                    moveCodes.append(code)
+                if captured:
+                    break
     
-    def getKingMoves(self, row, col, player):
-        kingMoves = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
-        for moveOffset in kingMoves:
-            endRow = row + moveOffset[0]
-            endCol = col + moveOffset[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8 and self.board[endRow][endCol] * player <= 0:
-                move = Move((row, col), (endRow, endCol), self.board)
-                if self.checkMoveSafety(move, player):
-                    move.discoveredCheck = self.discoveredCheck(move, player)
-                    self.validMoves.append(move)
-        if not self.info.inCheck[player]:
+    def getKingMoves(self, sq, player):
+        board = self.board
+        moveCodes = self.moveCodes
+        attacked = self.attacked
+        fromBits = sq | 6 << MOVED_SHIFT
+        for endSq in KING_TARGETS[sq]:
+            captured = board[endSq]
+            if captured * player <= 0 and not attacked >> endSq & 1:
+                moveCodes.append(fromBits | endSq << TO_SHIFT | abs(captured) << CAPTURED_SHIFT
+                                 | self.discoveredCheck(sq, endSq, player, 6))
+        if not attacked >> sq & 1:
             if self.info.castlingRights[player][0]: #king side
-                if self.board[row][col + 1] == 0 and self.board[row][col + 2] == 0:
-                    if not self.isAttacked(row, col + 1, player) and not self.isAttacked(row, col + 2, player):
-                        move = Move((row, col), (row, col + 2), self.board)
-                        move.isCastlingMove = True
-                        if (row, col + 1) in self.info.checkSquares[4]:
-                            move.discoveredCheck = (row, col + 1)
-                        self.validMoves.append(move)
+                if board[sq + 1] == 0 and board[sq + 2] == 0:
+                    if not attacked & 3 << sq + 1: # neither square the king passes is attacked
+                        code = fromBits | (sq + 2) << TO_SHIFT | CASTLING_FLAG
+                        if sq + 1 in self.info.checkSquares[4]:
+                            code |= DISCOVERED_FLAG | (sq + 1) << DISCOVERER_SHIFT
+                        moveCodes.append(code)
             if self.info.castlingRights[player][1]: #queen side
-                if self.board[row][col - 1] == 0 and self.board[row][col - 2] == 0 and self.board[row][col - 3] == 0:
-                    if not self.isAttacked(row, col - 1, player) and not self.isAttacked(row, col - 2, player):
-                        move = Move((row, col), (row, col - 2), self.board)
-                        move.isCastlingMove = True
-                        if (row, col - 1) in self.info.checkSquares[4]:
-                            move.discoveredCheck = (row, col - 1)
-                        self.validMoves.append(move)
-
-    #Legacy: A more detailed version of isAttacked that also returns the attacking piece and its location
-    def findAttackers(self, pieceRow, pieceCol, player):
+                if board[sq - 1] == 0 and board[sq - 2] == 0 and board[sq - 3] == 0:
+                    if not attacked & 3 << sq - 2:
+                        code = fromBits | (sq - 2) << TO_SHIFT | CASTLING_FLAG
+                        if sq - 1 in self.info.checkSquares[4]:
+                            code |= DISCOVERED_FLAG | (sq - 1) << DISCOVERER_SHIFT
+                        moveCodes.append(code)
+
+    #Legacy: A more detailed version of isAttacked that also returns the attacking piece and its square
+    def findAttackers(self, sq, player):
+        board = self.board
         #Check if attacked by pawn
         isAttacked = False
         attackingPiece = None
-        attackingPieceRow = -1
-        attackingPieceCol = -1
-        if 0 <= pieceRow - player < 8:
-            if 0 <= pieceCol - 1 < 8 and self.board[pieceRow - player][pieceCol - 1] == -1 * player:
-                isAttacked = True
-                attackingPiece = 1
-                attackingPieceRow = pieceRow - player
-                attackingPieceCol = pieceCol - 1
-            elif 0 <= pieceCol + 1 < 8 and self.board[pieceRow - player][pieceCol + 1] == -1 * player:
+        attackingSq = -1
+        for target in PAWN_ATTACKS[player][sq]:
+            if board[target] == -1 * player:
                 isAttacked = True
                 attackingPiece = 1
-                attackingPieceRow = pieceRow - player
-                attackingPieceCol = pieceCol + 1
+                attackingSq = target
+                break
         #Check if attacked by knight
-        knightMoves = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
-        for move in knightMoves:
-            endRow = pieceRow + move[0]
-            endCol = pieceCol + move[1]
-            if 0 <= endRow < 8 and 0 <= endCol < 8:
-                if self.board[endRow][endCol] == -2 * player:
-                    isAttacked = True
-                    attackingPiece = 2
-                    attackingPieceRow = endRow
-                    attackingPieceCol = endCol
-                    break
-        #Check if attacked by rook/queen (horizontal/vertical)
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-        for direction in directions:
-            currRow, currCol = pieceRow, pieceCol
-            while True:
-                currRow += direction[0]
-                currCol += direction[1]
-                if 0 <= currRow < 8 and 0 <= currCol < 8:
-                    piece = self.board[currRow][currCol]
-                    if piece == 0:
-                        continue
-                    elif piece == -4 * player:
-                        if isAttacked:
-                            attackingPiece = 7 #indicate multiple attackers
-                            return True, attackingPiece, attackingPieceRow, attackingPieceCol
-                        isAttacked = True
-                        attackingPiece = 4
-                        attackingPieceRow = currRow
-                        attackingPieceCol = currCol
-                        break
-                    elif piece == -5 * player:
-                        if isAttacked:
-                            attackingPiece = 7 #indicate multiple attackers
-                            return True, attackingPiece, attackingPieceRow, attackingPieceCol
-                        isAttacked = True
-                        attackingPiece = 5
-                        attackingPieceRow = currRow
-                        attackingPieceCol = currCol
-                        break
-                    else:
-                        break
-                else:
-                    break
-        #Check if attacked by bishop/queen (diagonal)
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-        for direction in directions:
-            currRow, currCol = pieceRow, pieceCol
-            while True:
-                currRow += direction[0]
-                currCol += direction[1]
-                if 0 <= currRow < 8 and 0 <= currCol < 8:
-                    piece = self.board[currRow][currCol]
+        for target in KNIGHT_TARGETS[sq]:
+            if board[target] == -2 * player:
+                isAttacked = True
+                attackingPiece = 2
+                attackingSq = target
+                break
+        #Check if attacked by rook/queen (horizontal/vertical), then bishop/queen (diagonal)
+        for rays, slider in ((ORTHOGONAL_RAYS, 4), (DIAGONAL_RAYS, 3)):
+            for ray in rays[sq]:
+                for target in ray:
+                    piece = board[target]
                     if piece == 0:
                         continue
-                    elif piece == -3 * player:
-                        if isAttacked:
-                            attackingPiece = 7 #indicate multiple attackers
-                            return True, attackingPiece, attackingPieceRow, attackingPieceCol
-                        isAttacked = True
-                        attackingPiece = 3
-                        attackingPieceRow = currRow
-                        attackingPieceCol = currCol
-                        break
-                    elif piece == -5 * player:
+                    if piece == -slider * player or piece == -5 * player:
                         if isAttacked:
                             attackingPiece = 7 #indicate multiple attackers
-                            return True, attackingPiece, attackingPieceRow, attackingPieceCol
+                            return True, attackingPiece, attackingSq
                         isAttacked = True
-                        attackingPiece = 5
-                        attackingPieceRow = currRow
-                        attackingPieceCol = currCol
-                        break
-                    else:
-                        break
-                else:
+                        attackingPiece = abs(piece)
+                        attackingSq = target
                     break
-        return isAttacked, attackingPiece, attackingPieceRow, attackingPieceCol
\ No newline at end of file
+        return isAttacked, attackingPiece, attackingSq
@@ -1,9 +1,51 @@
 """
 Contains the chess engine implementing a negamax algorithm with alpha-beta pruning
 """
+import os
+import threading
+import time
+
 import ChessBackend
+import OpeningBook
+import SearchStats
+import Tablebase
 from PieceTables import PieceTables
 
+PROMOTION_BITS = ChessBackend.PIECE_MASK << ChessBackend.PROMOTION_SHIFT
+MATE_SCORE = 100000 # score of mating at the root; a mate n plies from the root scores MATE_SCORE - n
+MATE_THRESHOLD = MATE_SCORE - 1000 # scores beyond this are mates (tablebase wins stay below it)
+FORCING_MASK = ChessBackend.TACTICAL_MASK | ChessBackend.CHECK_FLAG | ChessBackend.DISCOVERED_FLAG # captures, promotions, checks
+# Frontier pruning margins by remaining depth (index 1 and 2), in pawns like info.eval. A quiet move only
+# changes the positional part of the evaluation, which is below one pawn (PieceTables scores are 0-8 tenths).
+PAWN = PieceTables.VALUES[1]
+MINOR = PieceTables.VALUES[2]
+ROOK = PieceTables.VALUES[4]
+FRONTIER_PRUNING = ("reverseFutility", "futility", "razoring") # Engine switches, also UCI/match/bench options
+FUTILITY_MARGINS = (0, PAWN, MINOR)
+REVERSE_FUTILITY_MARGINS = (0, PAWN, MINOR)
+RAZOR_MARGINS = (0, MINOR, ROOK)
+TB_WIN_THRESHOLD = Tablebase.TB_WIN_SCORE - 1000 # tablebase wins and mates score beyond this
+
+def scoreToMemo(score: float, ply: int) -> float:
+    # Mate and tablebase win scores are stored as distances from the node, so they stay valid from other roots
+    if score > TB_WIN_THRESHOLD:
+        return score + ply
+    if score < -TB_WIN_THRESHOLD:
+        return score - ply
+    return score
+
+def scoreFromMemo(score: float, ply: int) -> float:
+    if score > TB_WIN_THRESHOLD:
+        return score - ply
+    if score < -TB_WIN_THRESHOLD:
+        return score + ply
+    return score
+
+class SearchAborted(Exception):
+    """
+    Raised inside the search when the stop event is set.
+    """
+
 class Engine:
     def __init__(self):
         self.nodesSearched = 0
@@ -11,6 +53,120 @@ class Engine:
         self.nodesQSearched = 0
         self.memo = {}
         self.qplyLimit = 8
+        # Frontier pruning at the last two plies before the q-search, each switchable with its own margins
+        self.reverseFutility = True # return the static eval when it beats beta by the margin
+        self.futility = True # skip quiet moves when the static eval plus the margin cannot reach alpha
+        self.razoring = True # drop into the q-search when the static eval is far below alpha
+        self.reverseFutilityMargins = list(REVERSE_FUTILITY_MARGINS)
+        self.futilityMargins = list(FUTILITY_MARGINS)
+        self.razorMargins = list(RAZOR_MARGINS)
+        self.stopEvent = None # threading.Event checked at every node; set it to abort the search
+        self.rootBestMove = None # best root move found so far by the running iteration
+        self.searchDepth = 0 # depth of the running iteration
+        self.completedDepth = 0 # deepest fully searched iteration
+        self.totalNodes = 0 # nodes of the finished iterations of the current search
+        self.maxNodes = None # node budget of the current search, None for unlimited
+        self.memoLimit = None # clear the memo once it holds more entries than this, None for unlimited
+        self.rootScore = 0 # score of the last completed root search, from the side to move
+        self.rootPly = 0 # length of the move log at the search root, for mate distances
+        self.bestMoves = {} # board representation -> packed best move found there, used to extract the PV
+        self.ponderEnabled = False
+        self.ponderThread = None
+        self.ponderStop = None
+        self.ponderKey = None # board representation the ponder search starts from
+        self.ponderResult = None
+        self.book = None # OpeningBook probed before searching, None to always search
+        self.tablebases = None # Tablebase.Tablebases probed at the root and in the search, None to disable
+        self.tbHits = 0
+        self.repetitionDraws = 0 # repetitions scored as draws; a subtree that hit one is not stored in the memo
+        self.collectStats = False # collect SearchStats for every search into lastStats
+        self.profiler = None # "cprofile" or "sampling" to profile every search
+        self.profileOutput = None # file for the profile, None to print it
+        self.stats = None # SearchStats of the running search
+        self.lastStats = None
+
+    def loadBook(self, path: str, randomize: bool = True):
+        """
+        Use the compiled opening book at `path`; a missing file disables the book.
+        """
+        if self.book is not None:
+            self.book.close()
+        self.book = OpeningBook.OpeningBook(path, randomize) if path and os.path.exists(path) else None
+        return self.book is not None
+
+    def bookMove(self, gameState: ChessBackend.GameState):
+        """
+        Return a book move for the position (and record it as the root result), or None if out of book.
+        """
+        if self.book is None:
+            return None
+        move = self.book.bookMove(gameState)
+        if move is not None:
+            self.rootBestMove = move
+            self.rootScore = 0
+            self.bestMoves[gameState.boardHistory[-1]] = move.code
+        return move
+
+    def loadTablebases(self, directory: str):
+        """
+        Probe the tables generated in `directory`; a missing or empty directory disables them.
+        """
+        if self.tablebases is not None:
+            self.tablebases.close()
+        self.tablebases = Tablebase.Tablebases(directory) if directory and os.path.isdir(directory) else None
+        if self.tablebases is not None and self.tablebases.maxPieces == 0:
+            self.tablebases = None
+        return self.tablebases is not None
+
+    def tablebaseMove(self, gameState: ChessBackend.GameState):
+        """
+        Return the tablebase move for the position (and record it as the root result), or None if not covered.
+        """
+        if self.tablebases is None:
+            return None
+        result = self.tablebases.bestMove(gameState)
+        if result is None:
+            return None
+        move, score = result
+        self.tbHits += 1
+        self.rootBestMove = move
+        self.rootScore = score
+        self.bestMoves[gameState.boardHistory[-1]] = move.code
+        return move
+
+    def rootMoveWithoutSearch(self, gameState: ChessBackend.GameState):
+        # A book or tablebase move makes the search unnecessary
+        return self.bookMove(gameState) or self.tablebaseMove(gameState)
+
+    def noMovesScore(self, gameState: ChessBackend.GameState) -> float:
+        # Root score without legal moves: mated on the spot or a draw (stalemate)
+        return -MATE_SCORE if gameState.info.winner == -gameState.player else 0
+
+    def probeTablebases(self, gameState: ChessBackend.GameState):
+        """
+        Tablebase score from the side to move inside the search, or None. Like mate scores, the
+        distance of a win or loss is counted from the search root.
+        """
+        score = self.tablebases.score(gameState)
+        if score is None:
+            return None
+        self.tbHits += 1
+        # The tables count from the probed position, as the memo does
+        return scoreFromMemo(score, len(gameState.moveLog) - self.rootPly)
+
+    def nodeCount(self) -> int:
+        return self.nodesSearched + self.nodesFromMemo + self.nodesQSearched
+
+    def checkStop(self):
+        if self.stopEvent is not None and self.stopEvent.is_set():
+            raise SearchAborted()
+        if self.maxNodes is not None and self.totalNodes + self.nodeCount() >= self.maxNodes:
+            raise SearchAborted()
+
+    def trimMemo(self):
+        if self.memoLimit is not None and len(self.memo) > self.memoLimit:
+            self.memo = {}
+            self.bestMoves = {}
 
     def negamax(self, gameState: ChessBackend.GameState, depth: int, alpha: float, beta: float, color: int) -> float:
         """
@@ -19,99 +175,398 @@ class Engine:
                 -1 if from Black perspective,
         assuming gameState.info.eval is positive for White.
         """
+        self.checkStop()
         self.nodesSearched += 1
         boardRep = gameState.boardHistory[-1]
+        stats = self.stats
+        if stats is not None:
+            stats.node(len(gameState.moveLog) - stats.rootPly)
+        if gameState.isRepetition():
+            self.repetitionDraws += 1
+            return 0 # draw; checked before the memo, whose scores do not depend on the path
+        ply = len(gameState.moveLog) - self.rootPly
+        # Mate distance pruning: nothing here beats mating on the next ply or loses slower than being mated now
+        alpha = max(alpha, -MATE_SCORE + ply)
+        beta = min(beta, MATE_SCORE - ply - 1)
+        if alpha >= beta:
+            return alpha
+        if stats is not None:
+            stats.ttProbe((boardRep, depth) in self.memo)
         if (boardRep, depth) in self.memo:
             self.nodesFromMemo += 1
-            return self.memo[(boardRep, depth)]
+            return scoreFromMemo(self.memo[(boardRep, depth)], ply)
+        if self.tablebases is not None:
+            tbScore = self.probeTablebases(gameState)
+            if tbScore is not None:
+                return tbScore
         if depth == 0 or gameState.info.winner is not None:
             return self.qSearch(gameState, alpha, beta, color, self.qplyLimit)
-        allMoves = gameState.validMoves.copy()
-        self.sortMoves(allMoves)
+        futilityScore = None # set when quiet moves cannot reach alpha
+        if depth <= 2 and not gameState.info.inCheck[gameState.player]:
+            # Not against mate bounds, which the static eval says nothing about
+            staticEval = color * gameState.info.eval
+            if self.reverseFutility and abs(beta) < MATE_THRESHOLD and staticEval - self.reverseFutilityMargins[depth] >= beta:
+                return staticEval
+            if abs(alpha) < MATE_THRESHOLD:
+                if self.razoring and staticEval + self.razorMargins[depth] <= alpha:
+                    score = self.qSearch(gameState, alpha, beta, color, self.qplyLimit)
+                    if depth == 1 or score <= alpha:
+                        return score
+                if self.futility and staticEval + self.futilityMargins[depth] <= alpha:
+                    futilityScore = staticEval + self.futilityMargins[depth]
+        allMoves = list(gameState.moveCodes)
+        self.sortMoveCodes(allMoves, gameState.player)
         best = float("-inf")
         a = alpha
-        for move in allMoves:
-            gameState.makeMove(move)
+        repetitionDraws = self.repetitionDraws
+        for index, move in enumerate(allMoves):
+            if futilityScore is not None and not move & FORCING_MASK:
+                if futilityScore > best:
+                    best = futilityScore
+                continue
+            gameState.makeMoveCode(move)
             score = -self.negamax(gameState, depth - 1, -beta, -a, -color)
-            gameState.undoMove(reCalculateMoves=False)
+            gameState.undoMove()
             if score > best:
                 best = score
+                self.bestMoves[boardRep] = move
             if score > a:
                 a = score
             if a >= beta:
+                if stats is not None:
+                    stats.cutoff(index)
                 return best  # beta cutoff
-        self.memo[(boardRep, depth)] = best
+        # A repetition draw below this node only holds on the current path
+        if self.repetitionDraws == repetitionDraws:
+            self.memo[(boardRep, depth)] = scoreToMemo(best, ply)
+            if stats is not None:
+                stats.ttStores += 1
         return best
 
+    @SearchStats.instrumented
     def findBestMove(self, gameState: ChessBackend.GameState, depth: int) -> ChessBackend.Move:
         bestMove = None
         self.nodesSearched = 0
         self.nodesFromMemo = 0
         self.nodesQSearched = 0
-        allMoves = gameState.validMoves.copy()
-        self.sortMoves(allMoves)
+        self.tbHits = 0
+        instantMove = self.rootMoveWithoutSearch(gameState)
+        if instantMove is not None:
+            return instantMove
+        self.trimMemo()
+        self.rootPly = len(gameState.moveLog)
+        if self.stats is not None:
+            self.stats.node(0)
+        allMoves = list(gameState.moveCodes)
+        if not allMoves:
+            self.rootScore = self.noMovesScore(gameState)
+            return None
         # color based on who's to move at root
         color = gameState.player
+        self.sortMoveCodes(allMoves, color)
         bestScore = float("-inf")
-        alpha, beta = float("-inf"), float("inf")
+        alpha, beta = -MATE_SCORE, MATE_SCORE
         for move in allMoves:
-            gameState.makeMove(move)
+            gameState.makeMoveCode(move)
             score = -self.negamax(gameState, depth - 1, -beta, -alpha, -color)
-            gameState.undoMove(reCalculateMoves=False)
+            gameState.undoMove()
             if score > bestScore:
                 bestScore = score
                 bestMove = move
+                self.rootBestMove = ChessBackend.Move(move, color)
             if score > alpha:
                 alpha = score
-        if bestMove is None and allMoves:
+        if bestMove is None:
             bestMove = allMoves[0]
+        self.rootScore = bestScore
+        self.bestMoves[gameState.boardHistory[-1]] = bestMove
+        return ChessBackend.Move(bestMove, color)
+
+    def principalVariation(self, gameState: ChessBackend.GameState, maxLength: int = 32) -> list[ChessBackend.Move]:
+        """
+        Follow the best-move table from the current position and return the expected line.
+        """
+        pv = []
+        seen = set()
+        while len(pv) < maxLength:
+            boardRep = gameState.boardHistory[-1]
+            move = self.bestMoves.get(boardRep)
+            if move is None or boardRep in seen:
+                break
+            seen.add(boardRep)
+            pv.append(ChessBackend.Move(move, gameState.player))
+            gameState.makeMoveCode(move)
+            if gameState.info.winner is not None:
+                break
+        for _ in pv:
+            gameState.undoMove()
+        return pv
+
+    def startPonder(self, gameState: ChessBackend.GameState, depth: int):
+        """
+        Start searching the expected reply in the background while the opponent thinks.
+        `gameState` is the position after our move, with the opponent to move. Returns
+        the ponder move, or None if the PV has no reply to ponder on.
+        """
+        self.stopPonder()
+        ponderMove = self.bestMoves.get(gameState.boardHistory[-1])
+        if ponderMove is None:
+            return None
+        ponderState = gameState.copy()
+        ponderState.makeMoveCode(ponderMove)
+        if ponderState.info.winner is not None:
+            return None
+        self.ponderKey = ponderState.boardHistory[-1]
+        self.ponderStop = threading.Event()
+        self.ponderResult = None
+        self.ponderThread = threading.Thread(target=self.ponder, args=(ponderState, depth), daemon=True)
+        self.ponderThread.start()
+        return ChessBackend.Move(ponderMove, gameState.player)
+
+    def ponder(self, ponderState: ChessBackend.GameState, depth: int):
+        self.ponderResult = self.iterativeSearch(ponderState, depth, self.ponderStop)
+
+    def stopPonder(self):
+        if self.ponderThread is not None:
+            self.ponderStop.set()
+            self.ponderThread.join()
+        self.ponderThread = None
+        self.ponderKey = None
+
+    def resolvePonder(self, gameState: ChessBackend.GameState, stopEvent=None):
+        """
+        Call once the opponent has moved. On a ponder hit the ponder search keeps
+        running to its full depth and its move is returned. On a miss the ponder
+        search is stopped and None is returned; the memo stays filled for the
+        new search. Setting `stopEvent` while waiting stops the ponder search early.
+        """
+        if self.ponderThread is None:
+            return None
+        if gameState.boardHistory[-1] != self.ponderKey:
+            self.stopPonder()
+            return None
+        while self.ponderThread.is_alive():
+            if stopEvent is not None and stopEvent.is_set():
+                self.ponderStop.set()
+            self.ponderThread.join(0.05)
+        self.ponderThread = None
+        self.ponderKey = None
+        return self.ponderResult
+
+    @SearchStats.instrumented
+    def iterativeSearch(self, gameState: ChessBackend.GameState, depth: int, stopEvent=None, onProgress=None,
+                        maxNodes=None) -> ChessBackend.Move:
+        """
+        Search depth 1, 2, ..., depth with findBestMove until the stop event is set
+        or more than `maxNodes` nodes were searched.
+        Returns the best move of the deepest completed iteration, falling back to
+        the best move found so far by an interrupted first iteration.
+        `onProgress(engine, move, elapsed)` is called after every completed iteration.
+        On abort the game state is restored to the root position.
+        Book and tablebase moves are returned without searching.
+        """
+        instantMove = self.rootMoveWithoutSearch(gameState)
+        if instantMove is not None:
+            self.completedDepth = 0
+            self.totalNodes = 0
+            if onProgress is not None:
+                onProgress(self, instantMove, 0.0)
+            return instantMove
+        self.stopEvent = stopEvent
+        self.maxNodes = maxNodes
+        self.rootBestMove = None
+        self.completedDepth = 0
+        self.totalNodes = 0
+        rootPly = len(gameState.moveLog)
+        startTime = time.time()
+        bestMove = None
+        try:
+            for d in range(1, depth + 1):
+                self.searchDepth = d
+                move = self.findBestMove(gameState, d)
+                self.totalNodes += self.nodeCount()
+                bestMove = move
+                self.completedDepth = d
+                if onProgress is not None:
+                    onProgress(self, move, time.time() - startTime)
+                if move is None:
+                    break
+        except SearchAborted:
+            self.totalNodes += self.nodeCount()
+            while len(gameState.moveLog) > rootPly:
+                gameState.undoMove()
+        finally:
+            self.stopEvent = None
+            self.maxNodes = None
+        if bestMove is None:
+            bestMove = self.rootBestMove
         return bestMove
 
-    def sortMoves(self, moves: list[ChessBackend.Move]):
+    @SearchStats.instrumented
+    def searchLines(self, gameState: ChessBackend.GameState, depth: int, multiPV: int, firstMoves=()) -> list[tuple[float, int]]:
+        """
+        Root search that scores the best `multiPV` moves exactly. Each move is searched with alpha
+        at the score of the multiPV-th best line so far, so only moves that can still enter the
+        top lines get exact scores. `firstMoves` (packed) are searched first, e.g. the previous
+        iteration's lines. Returns (score, packed move) pairs, best first.
+        """
+        self.nodesSearched = 0
+        self.nodesFromMemo = 0
+        self.nodesQSearched = 0
+        self.tbHits = 0
+        self.trimMemo()
+        self.rootPly = len(gameState.moveLog)
+        if self.stats is not None:
+            self.stats.node(0)
+        rootMoves = gameState.moveCodes
+        color = gameState.player
+        allMoves = list(rootMoves)
+        self.sortMoveCodes(allMoves, color)
+        first = [move for move in firstMoves if move in rootMoves]
+        allMoves = first + [move for move in allMoves if move not in first]
+        lines = []
+        beta = MATE_SCORE
+        for move in allMoves:
+            alpha = lines[-1][0] if len(lines) == multiPV else -MATE_SCORE
+            gameState.makeMoveCode(move)
+            score = -self.negamax(gameState, depth - 1, -beta, -alpha, -color)
+            gameState.undoMove()
+            if len(lines) < multiPV or score > alpha:
+                lines.append((score, move))
+                lines.sort(key=lambda line: line[0], reverse=True)
+                del lines[multiPV:]
+                if lines[0][1] == move:
+                    self.rootBestMove = ChessBackend.Move(move, color)
+        if lines:
+            self.rootScore = lines[0][0]
+            self.bestMoves[gameState.boardHistory[-1]] = lines[0][1]
+        else:
+            self.rootScore = self.noMovesScore(gameState)
+        return lines
+
+    @SearchStats.instrumented
+    def analyse(self, gameState: ChessBackend.GameState, depth: int, multiPV: int = 1, stopEvent=None,
+                maxNodes=None, onProgress=None) -> list[dict]:
+        """
+        Iterative deepening MultiPV analysis with searchLines. Returns the lines of the deepest
+        completed iteration, best first, as dicts with the move, its score from the side to move,
+        the PV starting with the move and the depth. Unlike iterativeSearch the book is not used.
+        `onProgress(engine, lines, elapsed)` is called after every completed iteration.
+        """
+        self.stopEvent = stopEvent
+        self.maxNodes = maxNodes
+        self.rootBestMove = None
+        self.completedDepth = 0
+        self.totalNodes = 0
+        rootPly = len(gameState.moveLog)
+        startTime = time.time()
+        lines = []
+        try:
+            for d in range(1, depth + 1):
+                self.searchDepth = d
+                scored = self.searchLines(gameState, d, multiPV, [line["move"].code for line in lines])
+                self.totalNodes += self.nodeCount()
+                lines = [{"move": ChessBackend.Move(move, gameState.player), "score": score,
+                          "pv": self.linePV(gameState, move), "depth": d} for score, move in scored]
+                self.completedDepth = d
+                if onProgress is not None:
+                    onProgress(self, lines, time.time() - startTime)
+                if not lines:
+                    break
+        except SearchAborted:
+            self.totalNodes += self.nodeCount()
+            while len(gameState.moveLog) > rootPly:
+                gameState.undoMove()
+        finally:
+            self.stopEvent = None
+            self.maxNodes = None
+        if not lines and self.rootBestMove is not None:
+            lines = [{"move": self.rootBestMove, "score": self.rootScore, "pv": [self.rootBestMove], "depth": 0}]
+        return lines
+
+    def linePV(self, gameState: ChessBackend.GameState, move: int) -> list[ChessBackend.Move]:
+        """
+        The PV of a root move: the move followed by the best-move table from the position after it.
+        """
+        pv = [ChessBackend.Move(move, gameState.player)]
+        gameState.makeMoveCode(move)
+        if gameState.info.winner is None:
+            pv += self.principalVariation(gameState)
+        gameState.undoMove()
+        return pv
+
+    def sortMoveCodes(self, moves: list[int], player: int):
         # Sort moves to prioritize captures and center control
-        def moveValue(move: ChessBackend.Move):
+        positionalScores = PieceTables.positionalScores
+        def moveValue(move: int):
             value = 0
-            if move.isCheck:
+            if move & ChessBackend.CHECK_FLAG:
                 value += 100  # High value for checks
-            if move.discoveredCheck:
+            if move & ChessBackend.DISCOVERED_FLAG:
                 value += 100  # High value for discovered checks
-            if move.pieceCaptured != 0:
-                value += 10 * abs(move.pieceCaptured) - abs(move.pieceMoved)
-            if move.pawnPromotion != 0:
-                value += 20 * abs(move.pawnPromotion)  # High value for promotion
-            elif move.isCastlingMove:
+            pieceMoved = move >> ChessBackend.MOVED_SHIFT & ChessBackend.PIECE_MASK
+            if move >> ChessBackend.CAPTURED_SHIFT:
+                value += 10 * (move >> ChessBackend.CAPTURED_SHIFT) - pieceMoved
+            if move & PROMOTION_BITS:
+                value += 20 * (move >> ChessBackend.PROMOTION_SHIFT & ChessBackend.PIECE_MASK)  # High value for promotion
+            elif move & ChessBackend.CASTLING_FLAG:
                 value += 5  # High value for castling
-            value += PieceTables.positionalScores[move.pieceMoved][move.endRow][move.endCol]
+            endSquare = move >> ChessBackend.TO_SHIFT & ChessBackend.SQUARE_MASK
+            value += positionalScores[pieceMoved * player][endSquare >> 3][endSquare & 7]
             return value
         moves.sort(key=moveValue, reverse=True)
 
+    def sortMoves(self, moves: list[ChessBackend.Move]) -> list[ChessBackend.Move]:
+        """
+        sortMoveCodes for a list of Move objects. Returns a new list, so the game state's cached
+        validMoves can be passed in.
+        """
+        if not moves:
+            return []
+        byCode = {move.code: move for move in moves}
+        codes = list(byCode)
+        self.sortMoveCodes(codes, 1 if moves[0].pieceMoved > 0 else -1)
+        return [byCode[code] for code in codes]
+
+    def evalScore(self, gameState: ChessBackend.GameState, color: int) -> float:
+        """
+        gameState.info.eval from `color`'s side, with checkmate as a finite score that prefers the
+        shorter mate: MATE_SCORE minus the plies from the search root.
+        """
+        winner = gameState.info.winner
+        if winner:
+            return winner * color * (MATE_SCORE - (len(gameState.moveLog) - self.rootPly))
+        return color * gameState.info.eval
+
     def qSearch(self, gs: ChessBackend.GameState, alpha, beta, color, qply_limit):
         """
         Quiescence search to extend the search in volatile positions.
         """
         self.nodesQSearched += 1
+        if self.stats is not None:
+            self.stats.qNode(self.qplyLimit - qply_limit)
         if gs.info.winner is not None or qply_limit <= 0:
-            return color * gs.info.eval
+            return self.evalScore(gs, color)
         in_check = gs.info.inCheck[color]
         stand_pat = color * gs.info.eval
         if in_check:
             best = float("-inf")
-            moves = gs.validMoves.copy()
+            moves = list(gs.moveCodes)
         else:
             if stand_pat >= beta:
                 return stand_pat
             if stand_pat > alpha:
                 alpha = stand_pat
             best = stand_pat
-            moves = [m for m in gs.validMoves if (m.pieceCaptured != 0 or m.pawnPromotion != 0)]
+            moves = [m for m in gs.moveCodes if m & ChessBackend.TACTICAL_MASK]
         if not moves:
             return stand_pat
-        self.sortMoves(moves)
+        self.sortMoveCodes(moves, gs.player)
         a = alpha
         for m in moves:
-            gs.makeMove(m)
+            gs.makeMoveCode(m)
             score = -self.qSearch(gs, -beta, -a, -color, qply_limit - 1)
-            gs.undoMove(reCalculateMoves=False)
+            gs.undoMove()
             if score > best:
                 best = score
             if score > a:
@@ -0,0 +1,336 @@
+"""
+Monte Carlo tree search engine (PUCT) guided by the ChessModel policy priors.
+Leaves are expanded in batches using virtual loss, and the tree is reused between moves.
+"""
+import math
+import time
+from typing import Optional
+
+import numpy as np
+
+import ChessBackend
+import ChessEngineNN
+import SearchStats
+
+
+class MCTSNode:
+    __slots__ = ("prior", "visits", "valueSum", "moves", "children", "key", "terminalValue")
+
+    def __init__(self, prior: float):
+        self.prior = prior
+        self.visits = 0
+        # Sum of results from the perspective of the player who moved into this node.
+        self.valueSum = 0.0
+        self.moves = None # legal moves, filled on expansion
+        self.children = None # MCTSNode per move, filled on expansion
+        self.key = None # board representation, filled on expansion
+        self.terminalValue = None # result from the side to move if the game is over
+
+    def isExpanded(self) -> bool:
+        return self.children is not None
+
+    def q(self) -> float:
+        return self.valueSum / self.visits if self.visits else 0.0
+
+
+class EngineMCTS(ChessEngineNN.EngineNN):
+    def __init__(
+        self,
+        model_path: Optional[str] = None,
+        playouts: int = 800,
+        time_limit: Optional[float] = None,
+        batch_size: int = 8,
+        c_puct: float = 1.5,
+        virtual_loss: float = 1.0,
+        reuse_tree: bool = True,
+        **kwargs,
+    ):
+        """
+        `playouts` and `time_limit` (seconds) bound each search; whichever is hit
+        first stops it. `batch_size` leaves are collected with virtual loss and
+        evaluated in one network call. Remaining keyword arguments are passed to
+        EngineNN (device, inference backend, value scale, ...).
+        """
+        super().__init__(model_path=model_path, **kwargs)
+        self.playoutLimit = max(1, playouts)
+        self.timeLimit = time_limit
+        self.batchSize = max(1, batch_size)
+        self.cPuct = c_puct
+        self.virtualLoss = virtual_loss
+        self.reuseTree = reuse_tree
+        self.root = None
+        self.playouts = 0
+        self.collisions = 0
+        self.reusedVisits = 0
+        self.searchTime = 0.0
+        self.playoutsPerSecond = 0.0
+
+    def set_mcts_options(
+        self,
+        playouts: Optional[int] = None,
+        time_limit: Optional[float] = None,
+        batch_size: Optional[int] = None,
+        c_puct: Optional[float] = None,
+        virtual_loss: Optional[float] = None,
+        reuse_tree: Optional[bool] = None,
+    ):
+        if playouts is not None:
+            self.playoutLimit = max(1, int(playouts))
+        if time_limit is not None:
+            self.timeLimit = time_limit if time_limit > 0 else None
+        if batch_size is not None:
+            self.batchSize = max(1, int(batch_size))
+        if c_puct is not None:
+            self.cPuct = float(c_puct)
+        if virtual_loss is not None:
+            self.virtualLoss = float(virtual_loss)
+        if reuse_tree is not None:
+            self.reuseTree = bool(reuse_tree)
+            if not self.reuseTree:
+                self.root = None
+
+    def search_settings(self) -> str:
+        time_limit = f"{self.timeLimit:.2f}s" if self.timeLimit else "none"
+        return (
+            f"mcts playouts: {self.playoutLimit}, time limit: {time_limit}, "
+            f"batch: {self.batchSize}, c_puct: {self.cPuct:.2f}, "
+            f"virtual loss: {self.virtualLoss:.1f}, reuse: {self.reuseTree}, "
+            f"value: {'head' if self.valueEnabled else 'qsearch'}, "
+            f"nn: {'loaded' if self.nnEnabled else ('fallback' if self.modelLoaded else 'loading')}"
+        )
+
+    def search_report(self) -> str:
+        return (
+            f"Playouts: {self.playouts} (+{self.reusedVisits} reused), collisions: {self.collisions}, "
+            f"playouts/s: {self.playoutsPerSecond:.1f}, NN batches: {self.nnInferences}"
+        )
+
+    def findRoot(self, gameState: ChessBackend.GameState) -> MCTSNode:
+        """
+        Reuse the subtree of the previous search if the current position is
+        the old root or one of its descendants up to two plies deep.
+        """
+        key = gameState.boardHistory[-1]
+        if self.reuseTree and self.root is not None and self.root.isExpanded():
+            frontier = [self.root]
+            for _ in range(3):
+                for node in frontier:
+                    if node.key == key:
+                        return node
+                frontier = [child for node in frontier if node.isExpanded() for child in node.children]
+        return MCTSNode(1.0)
+
+    def selectChild(self, node: MCTSNode) -> int:
+        sqrtVisits = math.sqrt(max(1, node.visits))
+        bestIndex = 0
+        bestScore = float("-inf")
+        for i, child in enumerate(node.children):
+            score = child.q() + self.cPuct * child.prior * sqrtVisits / (1 + child.visits)
+            if score > bestScore:
+                bestScore = score
+                bestIndex = i
+        return bestIndex
+
+    def terminalValue(self, gameState: ChessBackend.GameState) -> Optional[float]:
+        # Result from the perspective of the side to move, None if the game goes on.
+        winner = gameState.info.winner
+        if winner is None:
+            return None
+        if winner == 0:
+            return 0.0
+        return 1.0 if winner == gameState.player else -1.0
+
+    def staticValue(self, gameState: ChessBackend.GameState) -> float:
+        color = gameState.player
+        score = self.qSearch(gameState, float("-inf"), float("inf"), color, self.qplyLimit)
+        return math.tanh(score / self.valueScale)
+
+    def priors(self, moves: list[ChessBackend.Move], logits: Optional[np.ndarray]) -> list[float]:
+        if logits is None:
+            return [1.0 / len(moves)] * len(moves)
+        moveLogits = np.array([logits[self.move_to_index(move)] for move in moves], dtype=np.float64)
+        moveLogits -= moveLogits.max()
+        weights = np.exp(moveLogits)
+        return (weights / weights.sum()).tolist()
+
+    def expandBatch(self, gameState: ChessBackend.GameState, leaves: list) -> list[float]:
+        """
+        Expand the collected leaves with one batched network call. Each entry
+        is (path of moves from the root, node). Returns the leaf values from
+        the side to move at each leaf.
+        """
+        matrices = []
+        masks = []
+        for moves, node in leaves:
+            for move in moves:
+                gameState.makeMove(move)
+            node.key = gameState.boardHistory[-1]
+            node.moves = gameState.validMoves
+            if self.nnEnabled:
+                matrices.append(self.game_state_to_matrix(gameState))
+                masks.append(self.legal_mask(gameState))
+            for _ in moves:
+                gameState.undoMove()
+        logits = [None] * len(leaves)
+        values = None
+        if self.nnEnabled:
+            positions = np.stack(matrices)
+            logits = self.run_model(positions, np.stack(masks))
+            self.nnInferences += 1
+            if self.valueEnabled:
+                values = self.run_value_model(positions) # already from the side to move
+                self.valueInferences += 1
+        results = []
+        for i, (moves, node) in enumerate(leaves):
+            node.children = [MCTSNode(prior) for prior in self.priors(node.moves, logits[i])]
+            self.nodesSearched += 1
+            if self.stats is not None:
+                self.stats.node(len(moves))
+            if values is not None:
+                results.append(float(values[i]))
+                continue
+            for move in moves:
+                gameState.makeMove(move)
+            results.append(self.staticValue(gameState))
+            for _ in moves:
+                gameState.undoMove()
+        return results
+
+    def backup(self, path: list[MCTSNode], value: float, virtualLoss: float):
+        """
+        Propagate a leaf value (from the side to move at the leaf) up the path,
+        removing the virtual loss applied during selection.
+        """
+        for node in reversed(path):
+            # A node's statistics are kept from the side that moved into it.
+            value = -value
+            node.visits += 1 - virtualLoss
+            node.valueSum += value + virtualLoss
+
+    def runBatch(self, gameState: ChessBackend.GameState, root: MCTSNode) -> int:
+        """
+        Collect up to batchSize leaves by PUCT selection with virtual loss,
+        evaluate them together and back the results up. Returns the number of
+        playouts completed.
+        """
+        pending = []
+        pendingNodes = set()
+        completed = 0
+        for _ in range(self.batchSize):
+            node = root
+            path = [root]
+            moves = []
+            while node.isExpanded() and node.terminalValue is None:
+                index = self.selectChild(node)
+                move = node.moves[index]
+                gameState.makeMove(move)
+                moves.append(move)
+                node = node.children[index]
+                path.append(node)
+                if not node.isExpanded() and node.terminalValue is None:
+                    node.terminalValue = self.terminalValue(gameState)
+                    if node.terminalValue is not None:
+                        node.children = []
+                        node.moves = []
+                        node.key = gameState.boardHistory[-1]
+            for _ in moves:
+                gameState.undoMove()
+            if node.terminalValue is not None:
+                self.backup(path, node.terminalValue, 0.0)
+                completed += 1
+                continue
+            if id(node) in pendingNodes:
+                # Another playout in this batch already waits on this leaf.
+                self.collisions += 1
+                break
+            for pathNode in path:
+                pathNode.visits += self.virtualLoss
+                pathNode.valueSum -= self.virtualLoss
+            pendingNodes.add(id(node))
+            pending.append((moves, node, path))
+        if pending:
+            values = self.expandBatch(gameState, [(moves, node) for moves, node, _ in pending])
+            for (_, _, path), value in zip(pending, values):
+                self.backup(path, value, self.virtualLoss)
+                completed += 1
+        return completed
+
+    @SearchStats.instrumented
+    def findBestMove(self, gameState: ChessBackend.GameState, depth: Optional[int] = None) -> Optional[ChessBackend.Move]:
+        """
+        Run PUCT playouts from the current position within the playout and time
+        budgets. `depth` is accepted for interface compatibility with the other
+        engines and ignored.
+        """
+        self.load_model()
+        self.nodesSearched = 0
+        self.nodesFromMemo = 0
+        self.nodesQSearched = 0
+        self.nnInferences = 0
+        self.valueInferences = 0
+        self.playouts = 0
+        self.collisions = 0
+        rootMoves = gameState.validMoves
+        if not rootMoves:
+            self.rootScore = self.noMovesScore(gameState)
+            return None
+        instantMove = self.rootMoveWithoutSearch(gameState)
+        if instantMove is not None:
+            return instantMove
+
+        root = self.findRoot(gameState)
+        # A reused node can be a finished game (repetition, dead position) that still has legal
+        # moves; the search is asked for one of them anyway, so it is expanded like a new root.
+        if not root.isExpanded() or root.terminalValue is not None:
+            root.visits = 0
+            root.valueSum = 0.0
+            root.terminalValue = None
+            self.expandBatch(gameState, [([], root)])
+            root.visits = 1
+        self.reusedVisits = root.visits
+        self.root = root
+
+        startTime = time.perf_counter()
+        deadline = startTime + self.timeLimit if self.timeLimit else None
+        while self.playouts < self.playoutLimit:
+            self.playouts += self.runBatch(gameState, root)
+            self.rootBestMove = self.bestRootMove(root)
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if self.stopEvent is not None and self.stopEvent.is_set():
+                break
+        self.searchTime = time.perf_counter() - startTime
+        self.playoutsPerSecond = self.playouts / (self.searchTime + 1e-9)
+
+        return self.bestRootMove(root)
+
+    def bestRootMove(self, root: MCTSNode) -> ChessBackend.Move:
+        bestIndex = max(range(len(root.children)), key=lambda i: root.children[i].visits)
+        return root.moves[bestIndex]
+
+    @SearchStats.instrumented
+    def iterativeSearch(self, gameState: ChessBackend.GameState, depth: int, stopEvent=None, onProgress=None,
+                        maxNodes=None):
+        """
+        MCTS has no iterations: run a single budgeted search that also stops
+        when the stop event is set, and report it as depth 1. `maxNodes` caps
+        the playouts.
+        """
+        self.stopEvent = stopEvent
+        self.searchDepth = 1
+        self.completedDepth = 0
+        self.totalNodes = 0
+        playoutLimit = self.playoutLimit
+        if maxNodes is not None:
+            self.playoutLimit = max(1, min(playoutLimit, maxNodes))
+        startTime = time.time()
+        try:
+            move = self.findBestMove(gameState, depth)
+        finally:
+            self.stopEvent = None
+            self.playoutLimit = playoutLimit
+        self.completedDepth = 1
+        self.totalNodes = self.nodeCount()
+        if onProgress is not None:
+            onProgress(self, move, time.time() - startTime)
+        return move
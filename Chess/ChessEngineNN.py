@@ -4,27 +4,43 @@ search, and quiescence search.
 """
 import importlib.util
 import os
+import threading
 from typing import Optional
 
 import numpy as np
-import torch
 
 import ChessBackend
 import ChessEngine
+import SearchStats
 from PieceTables import PieceTables
 
-try:
-    from Chess.torch.model import ChessModel
-except ModuleNotFoundError:
-    current_path = os.path.dirname(__file__)
-    model_module_path = os.path.join(current_path, "torch", "model.py")
-    model_spec = importlib.util.spec_from_file_location("chess_torch_model", model_module_path)
-    if model_spec is None or model_spec.loader is None:
-        raise ImportError(f"Unable to load ChessModel from {model_module_path}.")
-    model_module = importlib.util.module_from_spec(model_spec)
-    model_spec.loader.exec_module(model_module)
-    ChessModel = model_module.ChessModel
-
+# torch and ChessModel are imported on first use (see import_torch), so importing this
+# module and constructing an engine stay cheap.
+torch = None
+ChessModel = None
+
+
+def import_torch():
+    global torch, ChessModel
+    if torch is None:
+        import torch as torch_module
+        try:
+            from Chess.torch.model import ChessModel as model_class
+        except ModuleNotFoundError:
+            current_path = os.path.dirname(__file__)
+            model_module_path = os.path.join(current_path, "torch", "model.py")
+            model_spec = importlib.util.spec_from_file_location("chess_torch_model", model_module_path)
+            if model_spec is None or model_spec.loader is None:
+                raise ImportError(f"Unable to load ChessModel from {model_module_path}.")
+            model_module = importlib.util.module_from_spec(model_spec)
+            model_spec.loader.exec_module(model_module)
+            model_class = model_module.ChessModel
+        ChessModel = model_class
+        torch = torch_module
+    return torch
+
+INFERENCE_BACKENDS = ("eager", "torchscript", "onnx")
+LEAF_EVALUATIONS = ("qsearch", "value")
 
 class EngineNN(ChessEngine.Engine):
     def __init__(
@@ -35,8 +51,32 @@ class EngineNN(ChessEngine.Engine):
         policy_weight: float = 1.0,
         heuristic_weight: float = 0.05,
         device: Optional[str] = None,
+        inference_backend: str = "eager",
+        quantize: bool = False,
+        num_threads: Optional[int] = None,
+        leaf_evaluation: str = "qsearch",
+        value_scale: float = 10.0,
+        warm_up: bool = True,
     ):
+        """
+        `inference_backend` selects how the policy network is run: "eager" (plain
+        PyTorch module), "torchscript" (traced and frozen graph) or "onnx"
+        (exported model run by onnxruntime). `quantize` applies dynamic int8
+        quantization to the linear layers, which forces CPU inference.
+        `num_threads` sets the intra-op thread count; small batches of one
+        position usually run fastest with very few threads.
+        `leaf_evaluation` chooses how search leaves are scored: "qsearch" runs the
+        quiescence search on the hand-written evaluation, "value" scores leaves
+        with the network's value head (in batches of sibling positions), scaled
+        by `value_scale` to pawn units.
+        The model is loaded by `load_model`, in a background thread started here
+        when `warm_up` is set, or otherwise on the first search.
+        """
         super().__init__()
+        if inference_backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend {inference_backend!r}, expected one of {INFERENCE_BACKENDS}.")
+        if leaf_evaluation not in LEAF_EVALUATIONS:
+            raise ValueError(f"Unknown leaf evaluation {leaf_evaluation!r}, expected one of {LEAF_EVALUATIONS}.")
         current_path = os.path.dirname(__file__)
         default_model_path = os.path.join(current_path, "torch", "models", "TORCH_100EPOCHS.pth")
 
@@ -44,17 +84,35 @@ class EngineNN(ChessEngine.Engine):
         self.fullWidthDepth = max(0, full_width_depth)
         self.policyWeight = policy_weight
         self.heuristicWeight = heuristic_weight
-        self.device = torch.device(device or ("cuda" if torch.cuda.is_available() else "cpu"))
+        if quantize:
+            # Dynamic int8 kernels only exist for CPU.
+            device = "cpu"
+        self.deviceName = device
+        self.device = None # resolved when the model is loaded
         self.modelPath = model_path or default_model_path
+        self.inferenceBackend = inference_backend
+        self.quantize = quantize
+        self.numThreads = num_threads
+        self.leafEvaluation = leaf_evaluation
+        self.valueScale = value_scale
 
         self.nnEnabled = False
+        self.valueEnabled = False
         self.nnInferences = 0
+        self.valueInferences = 0
         self.beamCuts = 0
         self.policyCache = {}
-
-        self.model = ChessModel().to(self.device)
-        self.model.eval()
-        self._load_model_weights()
+        self.valueCache = {}
+
+        self.model = None
+        self.inferenceModel = None
+        self.valueModel = None
+        self.onnxSession = None
+        self.modelLock = threading.Lock()
+        self.modelLoaded = False
+        self.modelError = None
+        if warm_up:
+            threading.Thread(target=self._warm_up, daemon=True).start()
 
     def set_search_options(
         self,
@@ -63,6 +121,8 @@ class EngineNN(ChessEngine.Engine):
         policy_weight: Optional[float] = None,
         heuristic_weight: Optional[float] = None,
         qply_limit: Optional[int] = None,
+        leaf_evaluation: Optional[str] = None,
+        value_scale: Optional[float] = None,
     ):
         if beam_width is not None:
             self.beamWidth = max(1, int(beam_width))
@@ -74,26 +134,153 @@ class EngineNN(ChessEngine.Engine):
             self.heuristicWeight = float(heuristic_weight)
         if qply_limit is not None:
             self.qplyLimit = max(1, int(qply_limit))
+        if leaf_evaluation is not None:
+            if leaf_evaluation not in LEAF_EVALUATIONS:
+                raise ValueError(f"Unknown leaf evaluation {leaf_evaluation!r}, expected one of {LEAF_EVALUATIONS}.")
+            self.leafEvaluation = leaf_evaluation
+        if value_scale is not None:
+            self.valueScale = float(value_scale)
+        # Memoized scores depend on these options.
+        self.memo = {}
+
+    def set_num_threads(self, num_threads: int):
+        """
+        Inference threads. Applied when torch is imported, or right away if it already is.
+        """
+        self.numThreads = max(1, int(num_threads))
+        if torch is not None:
+            torch.set_num_threads(self.numThreads)
 
     def search_settings(self) -> str:
-        nn_status = "loaded" if self.nnEnabled else "fallback"
+        nn_status = "loaded" if self.nnEnabled else ("fallback" if self.modelLoaded else "loading")
         return (
             f"depth(full->beam): {self.fullWidthDepth}, "
             f"beam width: {self.beamWidth}, "
             f"policy weight: {self.policyWeight:.2f}, "
             f"heuristic weight: {self.heuristicWeight:.2f}, "
             f"qply: {self.qplyLimit}, "
-            f"nn: {nn_status}"
+            f"leaf: {self.leafEvaluation}{'' if self.valueEnabled or self.leafEvaluation != 'value' else ' (no value head, qsearch)'}, "
+            f"nn: {nn_status}, "
+            f"inference: {self.inferenceBackend}{'+int8' if self.quantize else ''}"
         )
 
+    def load_model(self):
+        """
+        Import torch, build the model and load its weights. The first call does the
+        work (waiting for a running warm-up instead of loading twice); later calls
+        return at once and re-raise the error if loading failed. Without a weights
+        file the engine runs in fallback mode and torch is never imported.
+        """
+        with self.modelLock:
+            if not self.modelLoaded:
+                try:
+                    self._load_model_weights()
+                except Exception as exc:
+                    self.modelError = exc
+                self.modelLoaded = True
+        if self.modelError is not None:
+            raise self.modelError
+
+    def _warm_up(self):
+        try:
+            self.load_model()
+        except Exception:
+            pass # reported by the first search
+
     def _load_model_weights(self):
         if not os.path.exists(self.modelPath):
             return
+        import_torch()
+        self.device = torch.device(self.deviceName or ("cuda" if torch.cuda.is_available() else "cpu"))
+        if self.numThreads is not None:
+            torch.set_num_threads(max(1, int(self.numThreads)))
+        self.model = ChessModel().to(self.device)
         state_dict = torch.load(self.modelPath, map_location=self.device)
-        self.model.load_state_dict(state_dict)
+        # Checkpoints trained before the value head existed only hold policy weights.
+        missing, unexpected = self.model.load_state_dict(state_dict, strict=False)
+        if unexpected or any(not key.startswith("value_") for key in missing):
+            raise RuntimeError(f"Incompatible model weights in {self.modelPath}: missing {missing}, unexpected {unexpected}")
+        self.valueEnabled = not missing
         self.model.eval()
+        self._build_inference_model()
         self.nnEnabled = True
 
+    def _build_inference_model(self):
+        """
+        Prepare the optimized inference path selected in the constructor.
+        The fp32 eager model in `self.model` is always kept as the reference.
+        """
+        model = self.model
+        if self.quantize and self.inferenceBackend != "onnx":
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            model.eval()
+        example_position = torch.zeros((1, 18, 8, 8), dtype=torch.float32, device=self.device)
+        example_mask = torch.ones((1, 64, 64), dtype=torch.bool, device=self.device)
+        # The onnx backend only exports the policy graph; value evaluation stays in torch.
+        self.valueModel = model
+        if self.inferenceBackend == "torchscript":
+            with torch.no_grad():
+                traced = torch.jit.trace_module(
+                    model, {"forward": (example_position, example_mask), "value": (example_position,)}
+                )
+                frozen = torch.jit.freeze(traced.eval(), preserved_attrs=["value"])
+                model = torch.jit.optimize_for_inference(frozen, other_methods=["value"])
+            self.valueModel = model
+        elif self.inferenceBackend == "onnx":
+            self.onnxSession = self._build_onnx_session(example_position, example_mask)
+        self.inferenceModel = model
+
+    def _build_onnx_session(self, example_position, example_mask):
+        try:
+            import onnxruntime
+        except ModuleNotFoundError as exc:
+            raise ImportError("The onnx inference backend requires the onnxruntime package.") from exc
+        onnx_path = os.path.splitext(self.modelPath)[0] + ".onnx"
+        torch.onnx.export(
+            self.model,
+            (example_position, example_mask),
+            onnx_path,
+            input_names=["position", "legal_mask"],
+            output_names=["move_logits"],
+            dynamic_axes={"position": {0: "batch"}, "legal_mask": {0: "batch"}, "move_logits": {0: "batch"}},
+        )
+        if self.quantize:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantized_path = os.path.splitext(self.modelPath)[0] + ".int8.onnx"
+            quantize_dynamic(onnx_path, quantized_path, weight_type=QuantType.QInt8)
+            onnx_path = quantized_path
+        options = onnxruntime.SessionOptions()
+        if self.numThreads is not None:
+            options.intra_op_num_threads = max(1, int(self.numThreads))
+            options.inter_op_num_threads = 1
+        return onnxruntime.InferenceSession(onnx_path, options, providers=["CPUExecutionProvider"])
+
+    def run_model(self, positions: np.ndarray, legal_masks: np.ndarray) -> np.ndarray:
+        """
+        Run the selected inference backend on a batch of encoded positions and
+        legal-move masks and return the masked move logits as a numpy array.
+        """
+        if self.onnxSession is not None:
+            return self.onnxSession.run(
+                None,
+                {"position": positions.astype(np.float32), "legal_mask": legal_masks.astype(bool)},
+            )[0]
+        position_tensor = torch.from_numpy(positions).to(self.device)
+        mask_tensor = torch.from_numpy(legal_masks).to(self.device)
+        with torch.no_grad():
+            logits = self.inferenceModel(position_tensor, legal_mask=mask_tensor)
+        return logits.detach().cpu().numpy()
+
+    def run_value_model(self, positions: np.ndarray) -> np.ndarray:
+        """
+        Return the value head output (side-to-move perspective, in [-1, 1]) for
+        a batch of encoded positions.
+        """
+        position_tensor = torch.from_numpy(positions).to(self.device)
+        with torch.no_grad():
+            values = self.valueModel.value(position_tensor)
+        return values.detach().cpu().numpy()
+
     @staticmethod
     def square_to_index(row: int, col: int) -> int:
         # The training pipeline uses python-chess square numbering:
@@ -111,7 +298,7 @@ class EngineNN(ChessEngine.Engine):
 
         for row in range(8):
             for col in range(8):
-                piece = game_state.board[row][col]
+                piece = game_state.board[row * 8 + col]
                 if piece == 0:
                     continue
                 matrix_row = 7 - row
@@ -171,25 +358,70 @@ class EngineNN(ChessEngine.Engine):
         if cached is not None:
             return cached
 
-        position = torch.from_numpy(self.game_state_to_matrix(game_state)).unsqueeze(0).to(self.device)
-        legal_mask = torch.from_numpy(self.legal_mask(game_state)).unsqueeze(0).to(self.device)
-
-        with torch.no_grad():
-            logits = self.model(position, legal_mask=legal_mask).squeeze(0).detach().cpu().numpy()
+        position = self.game_state_to_matrix(game_state)[np.newaxis]
+        legal_mask = self.legal_mask(game_state)[np.newaxis]
+        logits = self.run_model(position, legal_mask)[0]
 
         self.nnInferences += 1
         self.policyCache[board_rep] = logits
         return logits
 
+    def value_leaves_enabled(self) -> bool:
+        return self.leafEvaluation == "value" and self.valueEnabled
+
+    def leaf_values(self, game_state: ChessBackend.GameState, moves: list[ChessBackend.Move], color: int) -> list[float]:
+        """
+        Score every move by the value of the position it leads to, from the
+        perspective of `color` (the side to move in `game_state`). All
+        non-terminal, uncached children are evaluated in a single batch.
+        Children that repeat a position of the game or the search line are
+        draws, as in hybrid_negamax.
+        """
+        scores = [0.0] * len(moves)
+        pending = []
+        pending_matrices = []
+        for i, move in enumerate(moves):
+            game_state.makeMove(move)
+            board_rep = game_state.boardHistory[-1]
+            if game_state.isRepetition():
+                self.repetitionDraws += 1 # scores[i] stays 0
+            elif game_state.info.winner is not None:
+                scores[i] = self.evalScore(game_state, color)
+            elif board_rep in self.valueCache:
+                scores[i] = -self.valueCache[board_rep]
+            else:
+                pending.append((i, board_rep))
+                pending_matrices.append(self.game_state_to_matrix(game_state))
+            game_state.undoMove()
+        if pending:
+            values = self.run_value_model(np.stack(pending_matrices))
+            self.valueInferences += 1
+            for (i, board_rep), value in zip(pending, values):
+                # The network scores the child from the opponent's side.
+                child_score = self.valueScale * float(value)
+                self.valueCache[board_rep] = child_score
+                scores[i] = -child_score
+        return scores
+
+    def leaf_value(self, game_state: ChessBackend.GameState, color: int) -> float:
+        if game_state.info.winner is not None:
+            return self.evalScore(game_state, color)
+        board_rep = game_state.boardHistory[-1]
+        cached = self.valueCache.get(board_rep)
+        if cached is None:
+            value = self.run_value_model(self.game_state_to_matrix(game_state)[np.newaxis])[0]
+            self.valueInferences += 1
+            cached = self.valueScale * float(value)
+            self.valueCache[board_rep] = cached
+        return cached
+
     def rank_moves(self, game_state: ChessBackend.GameState, moves: list[ChessBackend.Move]) -> list[ChessBackend.Move]:
         if not moves:
             return []
 
         logits = self.policy_logits(game_state)
         if logits is None:
-            ordered = moves.copy()
-            self.sortMoves(ordered)
-            return ordered
+            return self.sortMoves(moves)
 
         def combined_score(move: ChessBackend.Move) -> float:
             move_index = self.move_to_index(move)
@@ -204,7 +436,7 @@ class EngineNN(ChessEngine.Engine):
         game_state: ChessBackend.GameState,
         full_width_left: int,
     ) -> list[ChessBackend.Move]:
-        all_moves = game_state.validMoves.copy()
+        all_moves = game_state.validMoves
         use_beam = self.nnEnabled and full_width_left <= 0
         if use_beam:
             all_moves = self.rank_moves(game_state, all_moves)
@@ -212,7 +444,7 @@ class EngineNN(ChessEngine.Engine):
                 self.beamCuts += len(all_moves) - self.beamWidth
                 all_moves = all_moves[: self.beamWidth]
         else:
-            self.sortMoves(all_moves)
+            all_moves = self.sortMoves(all_moves)
         return all_moves
 
     def hybrid_negamax(
@@ -224,65 +456,124 @@ class EngineNN(ChessEngine.Engine):
         color: int,
         full_width_left: int,
     ) -> float:
+        self.checkStop()
         self.nodesSearched += 1
         board_rep = game_state.boardHistory[-1]
         memo_key = (board_rep, depth, full_width_left)
+        stats = self.stats
+        if stats is not None:
+            stats.node(len(game_state.moveLog) - stats.rootPly)
+        if game_state.isRepetition():
+            self.repetitionDraws += 1
+            return 0 # draw; checked before the memo, whose scores do not depend on the path
+        ply = len(game_state.moveLog) - self.rootPly
+        alpha = max(alpha, -ChessEngine.MATE_SCORE + ply) # mate distance pruning
+        beta = min(beta, ChessEngine.MATE_SCORE - ply - 1)
+        if alpha >= beta:
+            return alpha
+        if stats is not None:
+            stats.ttProbe(memo_key in self.memo)
         if memo_key in self.memo:
             self.nodesFromMemo += 1
-            return self.memo[memo_key]
+            return ChessEngine.scoreFromMemo(self.memo[memo_key], ply)
+        if self.tablebases is not None:
+            tb_score = self.probeTablebases(game_state)
+            if tb_score is not None:
+                return tb_score
 
         if depth == 0 or game_state.info.winner is not None:
+            if self.value_leaves_enabled():
+                return self.leaf_value(game_state, color)
             return self.qSearch(game_state, alpha, beta, color, self.qplyLimit)
 
         all_moves = self.select_search_moves(game_state, full_width_left)
+        if not all_moves:
+            return self.evalScore(game_state, color)
+        repetition_draws = self.repetitionDraws
+        if depth == 1 and self.value_leaves_enabled():
+            # Frontier node: all children are leaves, score them in one batch.
+            self.nodesSearched += len(all_moves)
+            scores = self.leaf_values(game_state, all_moves, color)
+            best = max(scores)
+            self.bestMoves[board_rep] = all_moves[scores.index(best)].code
+            if self.repetitionDraws == repetition_draws:
+                self.memo[memo_key] = ChessEngine.scoreToMemo(best, ply)
+            return best
         best = float("-inf")
         a = alpha
         next_full_width_left = max(full_width_left - 1, 0)
-        for move in all_moves:
+        for index, move in enumerate(all_moves):
             game_state.makeMove(move)
             score = -self.hybrid_negamax(game_state, depth - 1, -beta, -a, -color, next_full_width_left)
-            game_state.undoMove(reCalculateMoves=False)
+            game_state.undoMove()
 
             if score > best:
                 best = score
+                self.bestMoves[board_rep] = move.code
             if score > a:
                 a = score
             if a >= beta:
+                if stats is not None:
+                    stats.cutoff(index)
                 break
 
-        self.memo[memo_key] = best
+        # A repetition draw below this node only holds on the current path
+        if self.repetitionDraws == repetition_draws:
+            self.memo[memo_key] = ChessEngine.scoreToMemo(best, ply)
+            if stats is not None:
+                stats.ttStores += 1
         return best
 
+    @SearchStats.instrumented
     def findBestMove(self, gameState: ChessBackend.GameState, depth: int) -> Optional[ChessBackend.Move]:
+        self.load_model()
         self.nodesSearched = 0
         self.nodesFromMemo = 0
         self.nodesQSearched = 0
         self.nnInferences = 0
+        self.valueInferences = 0
         self.beamCuts = 0
-        self.memo = {}
-        self.policyCache = {}
-
-        all_moves = gameState.validMoves.copy()
-        if not all_moves:
+        if not self.ponderEnabled:
+            # Pondering keeps the tables warm between searches.
+            self.memo = {}
+            self.bestMoves = {}
+            self.policyCache = {}
+            self.valueCache = {}
+        else:
+            self.trimMemo()
+        self.tbHits = 0
+        instant_move = self.rootMoveWithoutSearch(gameState)
+        if instant_move is not None:
+            return instant_move
+        self.rootPly = len(gameState.moveLog)
+
+        root_moves = gameState.validMoves
+        if not root_moves:
+            self.rootScore = self.noMovesScore(gameState)
             return None
+        if self.stats is not None:
+            self.stats.node(0)
 
         full_width_left = min(self.fullWidthDepth, depth)
         ordered_moves = self.select_search_moves(gameState, full_width_left)
         color = gameState.player
         best_move = ordered_moves[0]
         best_score = float("-inf")
-        alpha, beta = float("-inf"), float("inf")
+        alpha, beta = -ChessEngine.MATE_SCORE, ChessEngine.MATE_SCORE
         next_full_width_left = max(full_width_left - 1, 0)
 
         for move in ordered_moves:
             gameState.makeMove(move)
             score = -self.hybrid_negamax(gameState, depth - 1, -beta, -alpha, -color, next_full_width_left)
-            gameState.undoMove(reCalculateMoves=False)
+            gameState.undoMove()
 
             if score > best_score:
                 best_score = score
                 best_move = move
+                self.rootBestMove = move
             if score > alpha:
                 alpha = score
 
+        self.rootScore = best_score
+        self.bestMoves[gameState.boardHistory[-1]] = best_move.code
         return best_move
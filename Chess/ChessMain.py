@@ -4,8 +4,10 @@ User interface for the chess game, handling graphics and user interactions.
 import pygame as p
 import ChessBackend
 import ChessEngine
+import OpeningBook
+import SearchWorker
+import Tablebase
 import os
-import time
 
 BOARD_WIDTH = BOARD_HEIGHT = 512
 MOVE_LOG_PANEL_WIDTH = 270
@@ -15,22 +17,29 @@ DIMENSION = 8
 SQ_SIZE = BOARD_HEIGHT // DIMENSION
 # for animation later on
 MAX_FPS = 15
-IMAGES = [None]
+IMAGES = {} # piece -> scaled image, loaded the first time the piece is drawn
+PIECE_IMAGE_NAMES = {1: 'wp', 2: 'wN', 3: 'wB', 4: 'wR', 5: 'wQ', 6: 'wK', -1: 'bp', -2: 'bN', -3: 'bB', -4: 'bR', -5: 'bQ', -6: 'bK'}
 current_path = os.path.dirname(__file__)  # Where your .py file is located
 image_path = os.path.join(current_path, "images")  # The image folder path
 
-def loadImages():
-    pieces = ['wp', 'wN', 'wB', 'wR', 'wQ', 'wK', 'bK', 'bQ', 'bR', 'bB', 'bN', 'bp']
-    for piece in pieces:
-        IMAGES.append(p.transform.scale(p.image.load(os.path.join(image_path, piece + ".png")), (SQ_SIZE, SQ_SIZE)))
-        
+def pieceImage(piece):
+    image = IMAGES.get(piece)
+    if image is None:
+        image = p.transform.scale(p.image.load(os.path.join(image_path, PIECE_IMAGE_NAMES[piece] + ".png")), (SQ_SIZE, SQ_SIZE))
+        IMAGES[piece] = image
+    return image
+
+def initDisplay():
+    # Only the modules the UI uses; p.init() also starts audio, which is slow to open.
+    p.display.init()
+    p.font.init()
+
 def main():
-    p.init()
+    initDisplay()
     screen = p.display.set_mode((BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH, BOARD_HEIGHT))
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
     gs = ChessBackend.GameState()
-    loadImages()
     running = True
     sqSelected = () # no square is selected initially, keep track of the last click of the user (tuple: (row, col))
     validMoves = []
@@ -40,11 +49,25 @@ def main():
     engineDepth = 4 # Adjust engine search depth here. Depth 5 takes approximately 10s per move on average.
     qplyLimit = 8
     engine.qplyLimit = qplyLimit
+    if engine.loadBook(OpeningBook.DEFAULT_BOOK_PATH):
+        print(f"Opening book: {OpeningBook.DEFAULT_BOOK_PATH}")
+    if engine.loadTablebases(Tablebase.DEFAULT_TB_DIR):
+        print(f"Tablebases: up to {engine.tablebases.maxPieces} pieces")
+    worker = None # background search, None while the engine is idle
     moveLogFont = p.font.SysFont("", 20, False, False)
     drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
     while running:
-        if engineEnabled == gs.player and gs.info.winner == None:
-            makeEngineMove(gs, screen, engine, flipped, engineDepth, moveLogFont, engineEnabled)
+        if worker is None and engineEnabled == gs.player and gs.info.winner == None:
+            worker = startEngineSearch(gs, engine, engineDepth)
+        if worker is not None and not worker.done:
+            drawMoveLog(screen, gs, moveLogFont, engineEnabled, worker.status())
+        elif worker is not None:
+            makeEngineMove(gs, screen, engine, worker, flipped, moveLogFont, engineEnabled)
+            worker = None
+            if engine.ponderEnabled and gs.info.winner is None:
+                ponderMove = engine.startPonder(gs, engineDepth)
+                if ponderMove is not None:
+                    print(f"Pondering on {ponderMove.getChessNotation()}")
             if gs.info.winner != None:
                 text = ""
                 if gs.info.winner == 0:
@@ -57,8 +80,13 @@ def main():
                 drawEndGameText(screen, text)
         for e in p.event.get():
             if e.type == p.QUIT:
+                if worker is not None:
+                    worker.abort()
+                engine.stopPonder()
                 running = False
             elif e.type == p.MOUSEBUTTONDOWN:
+                if worker is not None:
+                    continue # the engine is thinking
                 location = p.mouse.get_pos() # (x,y) location of mouse
                 col = location[0] // SQ_SIZE
                 row = location[1] // SQ_SIZE
@@ -68,7 +96,7 @@ def main():
                 if row >= DIMENSION or col >= DIMENSION: 
                     continue # click was outside the board
                 if not sqSelected: 
-                    if gs.board[row][col] == 0 or (gs.board[row][col] > 0) != (gs.player > 0):
+                    if gs.board[row * 8 + col] == 0 or (gs.board[row * 8 + col] > 0) != (gs.player > 0):
                         continue # clicked on an empty square without having selected a piece
                     sqSelected = (row, col)
                     drawSelectedSquare(screen, row, col, flipped)
@@ -80,7 +108,7 @@ def main():
                         validMoves = []
                         drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
                         continue
-                    if gs.board[row][col] != 0 and (gs.board[row][col] > 0) == (gs.player > 0):
+                    if gs.board[row * 8 + col] != 0 and (gs.board[row * 8 + col] > 0) == (gs.player > 0):
                         sqSelected = (row, col)
                         validMoves = getValidMovesList(gs, row, col)
                         drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
@@ -142,6 +170,10 @@ def main():
     
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z: # undo when 'z' is pressed
+                    if worker is not None:
+                        worker.abort()
+                        worker = None
+                    engine.stopPonder()
                     gs.undoMove()
                     if engineEnabled == gs.player:
                         gs.undoMove()
@@ -160,8 +192,30 @@ def main():
                     drawMoveLog(screen, gs, moveLogFont, engineEnabled)
                     print("Engine enabled for player {}".format("White" if engineEnabled == 1 else "Black"))
                 if e.key == p.K_d: # disable engine when 'd' is pressed
+                    if worker is not None:
+                        worker.abort()
+                        worker = None
+                    engine.stopPonder()
                     engineEnabled = 0
+                    drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
                     print("Engine disabled")
+                if e.key == p.K_p: # toggle pondering on the opponent's time when 'p' is pressed
+                    engine.ponderEnabled = not engine.ponderEnabled
+                    if not engine.ponderEnabled:
+                        engine.stopPonder()
+                    print("Pondering {}".format("enabled" if engine.ponderEnabled else "disabled"))
+                if e.key == p.K_s: # toggle search statistics when 's' is pressed
+                    engine.collectStats = not engine.collectStats
+                    print("Search statistics {}".format("enabled" if engine.collectStats else "disabled"))
+                if e.key == p.K_SPACE and worker is not None: # force the engine to move now
+                    worker.forceMove()
+                    print("Forcing engine move")
+                if e.key == p.K_ESCAPE and worker is not None: # abort the search and disable the engine
+                    worker.abort()
+                    worker = None
+                    engineEnabled = 0
+                    drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
+                    print("Engine search aborted")
         clock.tick(MAX_FPS)
         p.display.flip()
 
@@ -172,13 +226,19 @@ def getValidMovesList(gameState: ChessBackend.GameState, row, col) -> list[Chess
             validMoves.append(move)
     return validMoves
 
-def makeEngineMove(gs: ChessBackend.GameState, screen, engine: ChessEngine.Engine, flipped = False, engineDepth = 3, moveLogFont = None, engineEnabled = 0):
+def startEngineSearch(gs: ChessBackend.GameState, engine: ChessEngine.Engine, engineDepth = 3) -> SearchWorker.SearchWorker:
     print("Engine is thinking...")
-    statTime = time.time()
-    engineMove = engine.findBestMove(gs, engineDepth)
-    print("Engine move time: {:.2f} seconds".format(time.time() - statTime))
+    worker = SearchWorker.SearchWorker(engine, gs, engineDepth)
+    worker.start()
+    return worker
+
+def makeEngineMove(gs: ChessBackend.GameState, screen, engine: ChessEngine.Engine, worker: SearchWorker.SearchWorker, flipped = False, moveLogFont = None, engineEnabled = 0):
+    engineMove = worker.bestMove()
+    print("Engine move time: {:.2f} seconds, completed depth: {}".format(worker.elapsed, engine.completedDepth))
     print(f"Nodes searched: {engine.nodesSearched}, from memo: {engine.nodesFromMemo}, QSearched: {engine.nodesQSearched}")
-    print(f"Nodes per second: {(engine.nodesSearched + engine.nodesFromMemo + engine.nodesQSearched) / (time.time() - statTime + 1e-9):.2f}")
+    print(f"Nodes per second: {engine.totalNodes / (worker.elapsed + 1e-9):.2f}")
+    if engine.collectStats and engine.lastStats is not None:
+        print(engine.lastStats.report())
     if engineMove is not None:
         print(engineMove.getChessNotation())
         gs.makeMove(engineMove)
@@ -210,12 +270,12 @@ def drawBoard(screen, flipped=False):
 def drawPieces(screen, board, flipped=False):
     for r in range(DIMENSION):
         for c in range(DIMENSION):
-            piece = board[r][c]
+            piece = board[r * 8 + c]
             if piece != 0: # not an empty square
                 if not flipped:
-                    screen.blit(IMAGES[piece], p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+                    screen.blit(pieceImage(piece), p.Rect(c*SQ_SIZE, r*SQ_SIZE, SQ_SIZE, SQ_SIZE))
                 else:
-                    screen.blit(IMAGES[piece], p.Rect((DIMENSION - 1 - c)*SQ_SIZE, (DIMENSION - 1 - r)*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+                    screen.blit(pieceImage(piece), p.Rect((DIMENSION - 1 - c)*SQ_SIZE, (DIMENSION - 1 - r)*SQ_SIZE, SQ_SIZE, SQ_SIZE))
                 
 def drawPromotionChoice(screen, gs, row, col, player, flipped=False):
     color = p.Color("gray")
@@ -223,10 +283,10 @@ def drawPromotionChoice(screen, gs, row, col, player, flipped=False):
     for i in range(4):
         if not flipped:
             p.draw.rect(screen, color, p.Rect(col*SQ_SIZE, (row+i*player)*SQ_SIZE, SQ_SIZE, SQ_SIZE))
-            screen.blit(IMAGES[promotionPieces[i]*player], p.Rect(col*SQ_SIZE, (row+i*player)*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+            screen.blit(pieceImage(promotionPieces[i]*player), p.Rect(col*SQ_SIZE, (row+i*player)*SQ_SIZE, SQ_SIZE, SQ_SIZE))
         else:
             p.draw.rect(screen, color, p.Rect((DIMENSION - 1 - col)*SQ_SIZE, (DIMENSION - 1 - (row+i*player))*SQ_SIZE, SQ_SIZE, SQ_SIZE))
-            screen.blit(IMAGES[promotionPieces[i]*player], p.Rect((DIMENSION - 1 - col)*SQ_SIZE, (DIMENSION - 1 - (row+i*player))*SQ_SIZE, SQ_SIZE, SQ_SIZE))
+            screen.blit(pieceImage(promotionPieces[i]*player), p.Rect((DIMENSION - 1 - col)*SQ_SIZE, (DIMENSION - 1 - (row+i*player))*SQ_SIZE, SQ_SIZE, SQ_SIZE))
     p.display.flip()
 
 def drawSelectedSquare(screen, row, col, flipped=False):
@@ -242,12 +302,12 @@ def drawHighlightedSquares(screen, moves: list[ChessBackend.Move], flipped=False
         else:
             p.draw.rect(screen, p.Color("yellow"), p.Rect((DIMENSION - 1 - move.endCol)*SQ_SIZE, (DIMENSION - 1 - move.endRow)*SQ_SIZE, SQ_SIZE, SQ_SIZE), 4)
 
-def drawMoveLog(screen, gs:ChessBackend.GameState, font, engineStatus):
+def drawMoveLog(screen, gs:ChessBackend.GameState, font, engineStatus, searchStatus = None):
     moveLogRect = p.Rect(BOARD_WIDTH, 0, MOVE_LOG_PANEL_WIDTH, MOVE_LOG_PANEL_HEIGHT)
     p.draw.rect(screen, p.Color("white"), moveLogRect)
     # ---- bottom info panel (footer) ----
     padding = 5
-    footer_h = 40 
+    footer_h = 40 if searchStatus is None else 60
     footerRect = p.Rect(
         moveLogRect.left,
         moveLogRect.bottom - footer_h,
@@ -273,6 +333,8 @@ def drawMoveLog(screen, gs:ChessBackend.GameState, font, engineStatus):
         f"Side to move: {side_str}",
         f"Engine: {engine_str}",
     ]
+    if searchStatus is not None:
+        info_lines.append(searchStatus)
 
     # Render footer text
     info_y = footerRect.top + padding
@@ -280,7 +342,7 @@ def drawMoveLog(screen, gs:ChessBackend.GameState, font, engineStatus):
         textObj = font.render(line, True, p.Color("black"))
         screen.blit(textObj, (footerRect.left + padding, info_y))
         info_y += textObj.get_height() + 4
-    moveLog = gs.moveLog
+    moveLog = gs.getMoveLog()
     moveTexts = []
 
     # Render move log
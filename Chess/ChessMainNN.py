@@ -2,22 +2,25 @@
 User interface for the chess game, using the hybrid neural-network engine.
 """
 import os
-import time
 
 import pygame as p
 
 import ChessBackend
+import OpeningBook
 import ChessEngineNN
+import SearchWorker
+import Tablebase
 from ChessMain import (
     BOARD_WIDTH,
     MOVE_LOG_PANEL_WIDTH,
     MAX_FPS,
     DIMENSION,
     SQ_SIZE,
-    loadImages,
+    initDisplay,
     drawEndGameText,
     drawGameState,
     drawHighlightedSquares,
+    drawMoveLog,
     drawPromotionChoice,
     drawSelectedSquare,
     getValidMovesList,
@@ -33,11 +36,14 @@ DEFAULT_QPLY_LIMIT = 8
 def print_nn_controls():
     print("NN engine controls:")
     print("  E/D: enable or disable engine")
+    print("  Space/Esc: force the engine to move now or abort its search")
+    print("  P: toggle pondering on the opponent's time")
     print("  Z/F: undo or flip board")
     print("  Up/Down: increase or decrease search depth")
     print("  Right/Left: increase or decrease beam width")
     print("  PageUp/PageDown: increase or decrease full-width depth before beam search")
     print("  = / -: increase or decrease q-search ply limit")
+    print("  V: toggle leaf evaluation between q-search and the value head")
 
 
 def update_window_caption(engineDepth: int, engine: ChessEngineNN.EngineNN):
@@ -47,7 +53,8 @@ def update_window_caption(engineDepth: int, engine: ChessEngineNN.EngineNN):
         f"full={engine.fullWidthDepth} | "
         f"beam={engine.beamWidth} | "
         f"qply={engine.qplyLimit} | "
-        f"nn={'on' if engine.nnEnabled else 'fallback'}"
+        f"leaf={engine.leafEvaluation} | "
+        f"nn={'on' if engine.nnEnabled else ('fallback' if engine.modelLoaded else 'loading')}"
     )
 
 
@@ -55,30 +62,35 @@ def print_nn_settings(engineDepth: int, engine: ChessEngineNN.EngineNN):
     print(f"NN engine settings -> search depth: {engineDepth}, {engine.search_settings()}")
 
 
+def startNNEngineSearch(gs: ChessBackend.GameState, engine: ChessEngineNN.EngineNN, engineDepth=3) -> SearchWorker.SearchWorker:
+    print("NN engine is thinking...")
+    worker = SearchWorker.SearchWorker(engine, gs, engineDepth)
+    worker.start()
+    return worker
+
+
 def makeNNEngineMove(
     gs: ChessBackend.GameState,
     screen,
     engine: ChessEngineNN.EngineNN,
+    worker: SearchWorker.SearchWorker,
     flipped=False,
-    engineDepth=3,
     moveLogFont=None,
     engineEnabled=0,
 ):
-    print("NN engine is thinking...")
-    statTime = time.time()
-    engineMove = engine.findBestMove(gs, engineDepth)
-    elapsed = time.time() - statTime
-    print("Engine move time: {:.2f} seconds".format(elapsed))
+    engineMove = worker.bestMove()
+    elapsed = worker.elapsed
+    print("Engine move time: {:.2f} seconds, completed depth: {}".format(elapsed, engine.completedDepth))
     print(
         f"Nodes searched: {engine.nodesSearched}, from memo: {engine.nodesFromMemo}, "
         f"QSearched: {engine.nodesQSearched}, NN inferences: {engine.nnInferences}, "
+        f"value inferences: {engine.valueInferences}, "
         f"beam cuts: {engine.beamCuts}"
     )
-    print(
-        f"Nodes per second: "
-        f"{(engine.nodesSearched + engine.nodesFromMemo + engine.nodesQSearched) / (elapsed + 1e-9):.2f}"
-    )
+    print(f"Nodes per second: {engine.totalNodes / (elapsed + 1e-9):.2f}")
     print(engine.search_settings())
+    if engine.collectStats and engine.lastStats is not None:
+        print(engine.lastStats.report())
     if engineMove is not None:
         print(engineMove.getChessNotation())
         gs.makeMove(engineMove)
@@ -94,12 +106,11 @@ def makeNNEngineMove(
 
 
 def main():
-    p.init()
+    initDisplay()
     screen = p.display.set_mode((BOARD_WIDTH + MOVE_LOG_PANEL_WIDTH, BOARD_WIDTH))
     clock = p.time.Clock()
     screen.fill(p.Color("white"))
     gs = ChessBackend.GameState()
-    loadImages()
     running = True
     sqSelected = ()
     validMoves = []
@@ -114,16 +125,35 @@ def main():
     engineDepth = DEFAULT_ENGINE_DEPTH
     qplyLimit = DEFAULT_QPLY_LIMIT
     engine.qplyLimit = qplyLimit
+    if engine.loadBook(OpeningBook.DEFAULT_BOOK_PATH):
+        print(f"Opening book: {OpeningBook.DEFAULT_BOOK_PATH}")
+    if engine.loadTablebases(Tablebase.DEFAULT_TB_DIR):
+        print(f"Tablebases: up to {engine.tablebases.maxPieces} pieces")
+    worker = None
 
     moveLogFont = p.font.SysFont("", 20, False, False)
     drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
     print_nn_controls()
     print_nn_settings(engineDepth, engine)
     update_window_caption(engineDepth, engine)
+    modelLoaded = engine.modelLoaded # the model loads in the background; refresh the caption once it is ready
 
     while running:
-        if engineEnabled == gs.player and gs.info.winner is None:
-            makeNNEngineMove(gs, screen, engine, flipped, engineDepth, moveLogFont, engineEnabled)
+        if not modelLoaded and engine.modelLoaded:
+            modelLoaded = True
+            print_nn_settings(engineDepth, engine)
+            update_window_caption(engineDepth, engine)
+        if worker is None and engineEnabled == gs.player and gs.info.winner is None:
+            worker = startNNEngineSearch(gs, engine, engineDepth)
+        if worker is not None and not worker.done:
+            drawMoveLog(screen, gs, moveLogFont, engineEnabled, worker.status())
+        elif worker is not None:
+            makeNNEngineMove(gs, screen, engine, worker, flipped, moveLogFont, engineEnabled)
+            worker = None
+            if engine.ponderEnabled and gs.info.winner is None:
+                ponderMove = engine.startPonder(gs, engineDepth)
+                if ponderMove is not None:
+                    print(f"Pondering on {ponderMove.getChessNotation()}")
             if gs.info.winner is not None:
                 text = ""
                 if gs.info.winner == 0:
@@ -137,8 +167,13 @@ def main():
 
         for e in p.event.get():
             if e.type == p.QUIT:
+                if worker is not None:
+                    worker.abort()
+                engine.stopPonder()
                 running = False
             elif e.type == p.MOUSEBUTTONDOWN:
+                if worker is not None:
+                    continue
                 location = p.mouse.get_pos()
                 col = location[0] // SQ_SIZE
                 row = location[1] // SQ_SIZE
@@ -148,7 +183,7 @@ def main():
                 if row >= DIMENSION or col >= DIMENSION:
                     continue
                 if not sqSelected:
-                    if gs.board[row][col] == 0 or (gs.board[row][col] > 0) != (gs.player > 0):
+                    if gs.board[row * 8 + col] == 0 or (gs.board[row * 8 + col] > 0) != (gs.player > 0):
                         continue
                     sqSelected = (row, col)
                     drawSelectedSquare(screen, row, col, flipped)
@@ -160,7 +195,7 @@ def main():
                         validMoves = []
                         drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
                         continue
-                    if gs.board[row][col] != 0 and (gs.board[row][col] > 0) == (gs.player > 0):
+                    if gs.board[row * 8 + col] != 0 and (gs.board[row * 8 + col] > 0) == (gs.player > 0):
                         sqSelected = (row, col)
                         validMoves = getValidMovesList(gs, row, col)
                         drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
@@ -222,6 +257,10 @@ def main():
 
             elif e.type == p.KEYDOWN:
                 if e.key == p.K_z:
+                    if worker is not None:
+                        worker.abort()
+                        worker = None
+                    engine.stopPonder()
                     gs.undoMove()
                     if engineEnabled == gs.player:
                         gs.undoMove()
@@ -240,9 +279,29 @@ def main():
                     drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
                     print("NN engine enabled for player {}".format("White" if engineEnabled == 1 else "Black"))
                 if e.key == p.K_d:
+                    if worker is not None:
+                        worker.abort()
+                        worker = None
+                    engine.stopPonder()
                     engineEnabled = 0
                     drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
                     print("NN engine disabled")
+                if e.key == p.K_p:
+                    engine.ponderEnabled = not engine.ponderEnabled
+                    if not engine.ponderEnabled:
+                        engine.stopPonder()
+                    print("Pondering {}".format("enabled" if engine.ponderEnabled else "disabled"))
+                if e.key == p.K_s:
+                    engine.collectStats = not engine.collectStats
+                    print("Search statistics {}".format("enabled" if engine.collectStats else "disabled"))
+                if e.key == p.K_SPACE and worker is not None:
+                    worker.forceMove()
+                    print("Forcing NN engine move")
+                if e.key == p.K_ESCAPE and worker is not None:
+                    worker.abort()
+                    worker = None
+                    engineEnabled = 0
+                    print("NN engine search aborted")
                 if e.key == p.K_UP:
                     engineDepth += 1
                     print_nn_settings(engineDepth, engine)
@@ -267,6 +326,9 @@ def main():
                 if e.key == p.K_MINUS or e.key == p.K_KP_MINUS:
                     engine.set_search_options(qply_limit=engine.qplyLimit - 1)
                     print_nn_settings(engineDepth, engine)
+                if e.key == p.K_v:
+                    engine.set_search_options(leaf_evaluation="qsearch" if engine.leafEvaluation == "value" else "value")
+                    print_nn_settings(engineDepth, engine)
                 update_window_caption(engineDepth, engine)
                 drawGameState(screen, gs, flipped, moveLogFont, engineEnabled)
 
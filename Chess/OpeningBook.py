@@ -0,0 +1,176 @@
+"""
+Opening book compiled from PGN collections into a compact, sorted binary file.
+
+Each entry is 16 bytes, big-endian, laid out like a Polyglot entry:
+    key (uint64) | move (uint16) | weight (uint16) | games (uint32)
+The key is a stable 64-bit hash of the board representation used by the backend
+("placement side castling en-passant"), so it is not interchangeable with Polyglot
+Zobrist keys. Entries are sorted by key and, within a key, by descending weight, and the
+file is probed with a binary search over an mmap.
+
+    python -m Chess.OpeningBook games1.pgn games2.pgn -o book.bin --max-ply 20
+"""
+import argparse
+import hashlib
+import mmap
+import os
+import random
+import struct
+from typing import Optional
+
+import ChessBackend
+
+DEFAULT_BOOK_PATH = os.path.join(os.path.dirname(__file__), "book.bin")
+ENTRY = struct.Struct(">QHHI")
+PROMOTION_PIECES = "nbrq" # promotion field 1-4 in the move encoding
+
+
+def positionKey(boardRep: str) -> int:
+    """
+    64-bit key of a backend board representation, stable across processes and runs.
+    """
+    return int.from_bytes(hashlib.blake2b(boardRep.encode(), digest_size=8).digest(), "big")
+
+
+def encodeMove(uciMove: str) -> int:
+    # Squares are numbered a1 = 0 ... h8 = 63: to-square in bits 0-5, from-square in bits 6-11, promotion in bits 12-14.
+    fromSquare = (ord(uciMove[0]) - ord('a')) + 8 * (int(uciMove[1]) - 1)
+    toSquare = (ord(uciMove[2]) - ord('a')) + 8 * (int(uciMove[3]) - 1)
+    promotion = PROMOTION_PIECES.index(uciMove[4]) + 1 if len(uciMove) > 4 else 0
+    return toSquare | (fromSquare << 6) | (promotion << 12)
+
+
+def decodeMove(code: int) -> str:
+    toSquare = code & 63
+    fromSquare = (code >> 6) & 63
+    promotion = (code >> 12) & 7
+    uciMove = (f"{chr(ord('a') + fromSquare % 8)}{fromSquare // 8 + 1}"
+               f"{chr(ord('a') + toSquare % 8)}{toSquare // 8 + 1}")
+    if promotion:
+        uciMove += PROMOTION_PIECES[promotion - 1]
+    return uciMove
+
+
+def writeBook(stats: dict, path: str, minGames: int = 1):
+    """
+    Write {(key, uciMove): [weight, games]} as a sorted book file. Weights are
+    scaled down proportionally per position if they do not fit in 16 bits.
+    """
+    byKey = {}
+    for (key, uciMove), (weight, games) in stats.items():
+        if games >= minGames and weight > 0:
+            byKey.setdefault(key, []).append((weight, games, uciMove))
+    with open(path, "wb") as f:
+        for key in sorted(byKey):
+            moves = sorted(byKey[key], key=lambda entry: (-entry[0], entry[2]))
+            scale = max(1.0, moves[0][0] / 0xFFFF)
+            for weight, games, uciMove in moves:
+                f.write(ENTRY.pack(key, encodeMove(uciMove), max(1, int(weight / scale)), min(games, 0xFFFFFFFF)))
+
+
+def compileBook(pgnPaths: list[str], path: str, maxPly: int = 20, minGames: int = 1) -> int:
+    """
+    Collect the first `maxPly` moves of every game and write them as a book.
+    A move scores 2 for a win and 1 for a draw of the side that played it, so
+    moves that only ever lost are left out. Returns the number of entries written.
+    """
+    import chess.pgn # python-chess is only needed to compile books
+
+    stats = {}
+    for pgnPath in pgnPaths:
+        with open(pgnPath) as pgnFile:
+            while True:
+                game = chess.pgn.read_game(pgnFile)
+                if game is None:
+                    break
+                result = game.headers.get("Result", "*")
+                board = game.board()
+                for ply, move in enumerate(game.mainline_moves()):
+                    if ply >= maxPly:
+                        break
+                    # fen(en_passant="fen") always names the square after a double push, like the backend does
+                    boardRep = " ".join(board.fen(en_passant="fen").split()[:4])
+                    if result == "1/2-1/2":
+                        points = 1
+                    elif result in ("1-0", "0-1"):
+                        points = 2 if (result == "1-0") == (board.turn == chess.WHITE) else 0
+                    else:
+                        points = 1
+                    entry = stats.setdefault((positionKey(boardRep), move.uci()), [0, 0])
+                    entry[0] += points
+                    entry[1] += 1
+                    board.push(move)
+    writeBook(stats, path, minGames)
+    return sum(1 for weight, games in stats.values() if games >= minGames and weight > 0)
+
+
+class OpeningBook:
+    def __init__(self, path: str, randomize: bool = True, seed: Optional[int] = None):
+        """
+        Open a compiled book. With `randomize` moves are picked at random in
+        proportion to their weight, otherwise the heaviest move is played.
+        """
+        self.path = path
+        self.randomize = randomize
+        self.rng = random.Random(seed)
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.size = size // ENTRY.size
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.file.close()
+
+    def keyAt(self, index: int) -> int:
+        return struct.unpack_from(">Q", self.data, index * ENTRY.size)[0]
+
+    def probe(self, boardRep: str) -> list[tuple[str, int, int]]:
+        """
+        Return the (uciMove, weight, games) entries stored for a board representation.
+        """
+        key = positionKey(boardRep)
+        lo, hi = 0, self.size
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.keyAt(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        entries = []
+        while lo < self.size:
+            entryKey, move, weight, games = ENTRY.unpack_from(self.data, lo * ENTRY.size)
+            if entryKey != key:
+                break
+            entries.append((decodeMove(move), weight, games))
+            lo += 1
+        return entries
+
+    def bookMove(self, gameState: ChessBackend.GameState) -> Optional[ChessBackend.Move]:
+        """
+        Pick a book move for the position, as one of gameState.validMoves, or None if out of book.
+        """
+        legal = {move.getUciNotation(): move for move in gameState.validMoves}
+        entries = [(legal[uciMove], weight) for uciMove, weight, _ in self.probe(gameState.boardHistory[-1])
+                   if uciMove in legal]
+        if not entries:
+            return None
+        if not self.randomize:
+            return entries[0][0]
+        return self.rng.choices([move for move, _ in entries], weights=[weight for _, weight in entries])[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pgn", nargs="+", help="PGN files to compile.")
+    parser.add_argument("-o", "--output", default=DEFAULT_BOOK_PATH)
+    parser.add_argument("--max-ply", type=int, default=20, help="Only use the first plies of every game.")
+    parser.add_argument("--min-games", type=int, default=2, help="Drop moves played in fewer games.")
+    args = parser.parse_args()
+    entries = compileBook(args.pgn, args.output, args.max_ply, args.min_games)
+    print(f"Wrote {entries} entries ({entries * ENTRY.size} bytes) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
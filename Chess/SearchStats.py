@@ -0,0 +1,248 @@
+"""
+Per-search instrumentation for the engines and opt-in profiling around a search.
+
+Set `engine.collectStats = True` to get a SearchStats object in `engine.lastStats` after every
+search, and `engine.profiler = "cprofile"` or `"sampling"` to profile searches. With both off,
+the search only pays for one attribute check per node.
+"""
+import cProfile
+import functools
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+
+# Backend and engine methods timed while stats are collected, with the category they count towards.
+# Times are exclusive: e.g. move generation inside scanAndUpdate is not counted as eval.
+GAME_STATE_TIMERS = {
+    "makeMove": "make/undo",
+    "undoMove": "make/undo",
+    "scanAndUpdate": "eval",
+    "updateValidMoves": "movegen",
+    "updateKingSafety": "movegen",
+}
+ENGINE_TIMERS = {
+    "sortMoves": "ordering",
+    "sortMoveCodes": "ordering",
+    "select_search_moves": "ordering",
+    "run_model": "nn",
+    "run_value_model": "nn",
+}
+
+
+class SearchStats:
+    def __init__(self, rootPly: int = 0):
+        self.rootPly = rootPly
+        self.nodesPerPly = [] # the root is ply 0
+        self.qNodesPerQply = []
+        self.ttProbes = 0
+        self.ttHits = 0
+        self.ttStores = 0
+        self.cutoffIndex = Counter() # index of the move that caused a beta cutoff
+        self.times = Counter() # category -> exclusive seconds
+        self.timerStack = []
+        self.startTime = time.perf_counter()
+        self.elapsed = 0.0
+
+    def node(self, ply: int):
+        nodesPerPly = self.nodesPerPly
+        while len(nodesPerPly) <= ply:
+            nodesPerPly.append(0)
+        nodesPerPly[ply] += 1
+
+    def qNode(self, qply: int):
+        qNodesPerQply = self.qNodesPerQply
+        while len(qNodesPerQply) <= qply:
+            qNodesPerQply.append(0)
+        qNodesPerQply[qply] += 1
+
+    def ttProbe(self, hit: bool):
+        self.ttProbes += 1
+        if hit:
+            self.ttHits += 1 # the memo has no bounds, so every hit ends the node
+
+    def cutoff(self, index: int):
+        self.cutoffIndex[index] += 1
+
+    def branchingFactor(self) -> float:
+        """
+        Average number of children searched per interior node of the main search.
+        """
+        interior = sum(self.nodesPerPly[:-1])
+        return sum(self.nodesPerPly[1:]) / interior if interior else 0.0
+
+    def timed(self, category: str, function):
+        stack = self.timerStack
+        times = self.times
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            stack.append(0.0)
+            startTime = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - startTime
+                children = stack.pop()
+                times[category] += elapsed - children
+                if stack:
+                    stack[-1] += elapsed
+        return wrapper
+
+    def install(self, engine, gameState):
+        """
+        Shadow the timed methods with instance attributes; uninstall removes them again.
+        """
+        for name, category in GAME_STATE_TIMERS.items():
+            setattr(gameState, name, self.timed(category, getattr(gameState, name)))
+        for name, category in ENGINE_TIMERS.items():
+            if hasattr(engine, name):
+                setattr(engine, name, self.timed(category, getattr(engine, name)))
+
+    def uninstall(self, engine, gameState):
+        for name in GAME_STATE_TIMERS:
+            gameState.__dict__.pop(name, None)
+        for name in ENGINE_TIMERS:
+            engine.__dict__.pop(name, None)
+
+    def finish(self):
+        self.elapsed = time.perf_counter() - self.startTime
+
+    def asDict(self) -> dict:
+        return {
+            "nodesPerPly": self.nodesPerPly,
+            "qNodesPerQply": self.qNodesPerQply,
+            "ttProbes": self.ttProbes,
+            "ttHits": self.ttHits,
+            "ttStores": self.ttStores,
+            "cutoffIndex": dict(sorted(self.cutoffIndex.items())),
+            "branchingFactor": round(self.branchingFactor(), 3),
+            "seconds": round(self.elapsed, 6),
+            "times": {category: round(seconds, 6) for category, seconds in self.times.items()},
+        }
+
+    def report(self) -> str:
+        cutoffs = sum(self.cutoffIndex.values())
+        firstMove = 100 * self.cutoffIndex.get(0, 0) / cutoffs if cutoffs else 0.0
+        accounted = sum(self.times.values())
+        timing = ", ".join(f"{category} {seconds:.3f}s" for category, seconds in self.times.most_common())
+        return "\n".join([
+            f"Nodes per ply: {self.nodesPerPly}",
+            f"Q-nodes per q-ply: {self.qNodesPerQply}",
+            f"TT probes {self.ttProbes}, hits {self.ttHits} ({100 * self.ttHits / max(1, self.ttProbes):.1f}%), "
+            f"stores {self.ttStores}",
+            f"Beta cutoffs {cutoffs}, on first move {firstMove:.1f}%, by move index "
+            f"{dict(sorted(self.cutoffIndex.items())[:8])}",
+            f"Branching factor {self.branchingFactor():.2f}",
+            f"Time {self.elapsed:.3f}s: {timing}, search {max(0.0, self.elapsed - accounted):.3f}s",
+        ])
+
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread at a fixed interval and counts the functions seen,
+    with little overhead on the sampled thread.
+    """
+
+    def __init__(self, threadId: int = None, interval: float = 0.002):
+        self.threadId = threadId if threadId is not None else threading.get_ident()
+        self.interval = interval
+        self.samples = 0
+        self.selfCounts = Counter() # innermost function
+        self.totalCounts = Counter() # any function on the stack
+        self.stopEvent = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopEvent.set()
+        self.thread.join()
+
+    def run(self):
+        while not self.stopEvent.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            if frame is None:
+                continue
+            self.samples += 1
+            self.selfCounts[self.label(frame)] += 1
+            seen = set()
+            while frame is not None:
+                label = self.label(frame)
+                if label not in seen:
+                    seen.add(label)
+                    self.totalCounts[label] += 1
+                frame = frame.f_back
+
+    @staticmethod
+    def label(frame) -> str:
+        code = frame.f_code
+        return f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})"
+
+    def report(self, limit: int = 15) -> str:
+        lines = [f"{self.samples} samples every {1000 * self.interval:.1f}ms", "  self%  total%  function"]
+        for label, count in self.selfCounts.most_common(limit):
+            lines.append(f"{100 * count / max(1, self.samples):6.1f}  {100 * self.totalCounts[label] / max(1, self.samples):6.1f}  {label}")
+        return "\n".join(lines)
+
+
+def runProfiled(kind: str, output, function, *args, **kwargs):
+    """
+    Run `function` under the cProfile or sampling profiler. The report is printed,
+    or written to `output` (a pstats dump for cProfile, text for the sampler).
+    """
+    if kind == "cprofile":
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(function, *args, **kwargs)
+        finally:
+            if output:
+                profiler.dump_stats(output)
+            else:
+                stream = io.StringIO()
+                pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(20)
+                print(stream.getvalue())
+    if kind == "sampling":
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            profiler.stop()
+            if output:
+                with open(output, "w") as f:
+                    f.write(profiler.report(50) + "\n")
+            else:
+                print(profiler.report())
+    raise ValueError(f"Unknown profiler {kind!r}, expected 'cprofile' or 'sampling'")
+
+
+def instrumented(search):
+    """
+    Decorator for an engine's findBestMove/iterativeSearch(gameState, ...). Collects SearchStats
+    and runs the profiler when the engine asks for them; nested instrumented calls (iterations
+    of an iterative search) share the outer stats.
+    """
+    @functools.wraps(search)
+    def wrapper(engine, gameState, *args, **kwargs):
+        if engine.stats is not None or not (engine.collectStats or engine.profiler):
+            return search(engine, gameState, *args, **kwargs)
+        stats = SearchStats(len(gameState.moveLog))
+        engine.stats = stats
+        if engine.collectStats:
+            # Timers would skew the profile, so they are only installed when stats are asked for
+            stats.install(engine, gameState)
+        try:
+            if engine.profiler:
+                return runProfiled(engine.profiler, engine.profileOutput, search, engine, gameState, *args, **kwargs)
+            return search(engine, gameState, *args, **kwargs)
+        finally:
+            stats.uninstall(engine, gameState)
+            stats.finish()
+            engine.stats = None
+            engine.lastStats = stats
+    return wrapper
@@ -0,0 +1,81 @@
+"""
+Runs an engine search in a background thread so the UI keeps rendering while the engine thinks.
+"""
+import threading
+import time
+from typing import Optional
+
+import ChessBackend
+
+
+class SearchWorker(threading.Thread):
+    def __init__(self, engine, gameState: ChessBackend.GameState, depth: int):
+        """
+        The search runs on a copy of `gameState`, never on the state the UI draws.
+        """
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.gameState = gameState.copy()
+        self.rootMoves = gameState.validMoves[:]
+        self.depth = depth
+        self.stopEvent = threading.Event() # cancel token shared with the engine
+        self.forced = False
+        self.aborted = False
+        self.done = False
+        self.result: Optional[ChessBackend.Move] = None
+        self.startTime = time.time()
+        self.elapsed = 0.0
+
+    def run(self):
+        self.startTime = time.time()
+        try:
+            # Continue the ponder search on a ponder hit; on a miss it is stopped.
+            self.result = self.engine.resolvePonder(self.gameState, self.stopEvent)
+            if self.result is None and not self.stopEvent.is_set():
+                self.result = self.engine.iterativeSearch(self.gameState, self.depth, self.stopEvent)
+        finally:
+            self.elapsed = time.time() - self.startTime
+            self.done = True
+
+    def forceMove(self):
+        """
+        Stop searching and play the best move found so far.
+        """
+        self.forced = True
+        self.stopEvent.set()
+
+    def abort(self):
+        """
+        Stop searching and discard the result.
+        """
+        self.aborted = True
+        self.stopEvent.set()
+        self.join()
+
+    def bestMove(self) -> Optional[ChessBackend.Move]:
+        """
+        Return the searched move as one of the root moves of the UI's game state,
+        or None if the search was aborted.
+        """
+        if self.aborted:
+            return None
+        result = self.result
+        if result is None:
+            # Forced before the first root move was searched: any legal move will do.
+            return self.rootMoves[0] if self.forced and self.rootMoves else None
+        for move in self.rootMoves:
+            if (move.startRow, move.startCol, move.endRow, move.endCol, move.pawnPromotion) == (
+                result.startRow, result.startCol, result.endRow, result.endCol, result.pawnPromotion):
+                return move
+        return None
+
+    def status(self) -> str:
+        """
+        Live progress line: iteration depth, nodes, nodes per second and current best move.
+        """
+        engine = self.engine
+        elapsed = (self.elapsed if self.done else time.time() - self.startTime) + 1e-9
+        nodes = engine.totalNodes if self.done else engine.totalNodes + engine.nodeCount()
+        best = engine.rootBestMove
+        bestText = best.getChessNotation() if best is not None else "-"
+        return f"d{engine.searchDepth} {nodes} nodes {nodes / elapsed:.0f} nps best {bestText}"
@@ -0,0 +1,422 @@
+"""
+Endgame tablebases for small material, generated locally by retrograde analysis on the backend move generator.
+
+Every material signature (e.g. "KQvK", "KPvK", "KBNvK") gets two files:
+    <key>.wdl  int8 per position: 1 win, 0 draw, -1 loss for the side to move (-128 for unused slots)
+    <key>.dtm  uint16 per position: plies to mate (0 for draws and for checkmated positions)
+Positions are stored with the stronger side as white; the white king is folded into the
+a1-d1-d4 triangle (pawnless) or onto files a-d (with pawns). Castling and en passant are
+not part of the tables, and the 75-move rule is ignored.
+
+    python -m Chess.Tablebase generate              # all 3-piece tables
+    python -m Chess.Tablebase generate KBNvK KRvKP  # 4-piece tables (slow, generated offline)
+    python -m Chess.Tablebase probe "8/8/8/4k3/8/8/8/KQ6 w - - 0 1"
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from typing import Optional
+
+import ChessBackend
+from PieceTables import PieceTables
+
+DEFAULT_TB_DIR = os.path.join(os.path.dirname(__file__), "tablebases")
+THREE_PIECE_TABLES = ["KQvK", "KRvK", "KPvK"]
+WIN, DRAW, LOSS = 1, 0, -1
+INVALID = -128
+UNKNOWN = 2 # only used while generating
+TB_WIN_SCORE = 10000 # score of a won position at mate distance 0; a win in n plies scores TB_WIN_SCORE - n
+PIECE_ORDER = "QRBNP"
+PIECE_CODES = {"K": 6, "Q": 5, "R": 4, "B": 3, "N": 2, "P": 1}
+NON_PIECES = str.maketrans("", "", "12345678/")
+
+# The eight board symmetries on (row, col); only the first two keep pawn directions.
+TRANSFORMS = [
+    lambda r, c: (r, c),
+    lambda r, c: (r, 7 - c),
+    lambda r, c: (7 - r, c),
+    lambda r, c: (7 - r, 7 - c),
+    lambda r, c: (c, r),
+    lambda r, c: (c, 7 - r),
+    lambda r, c: (7 - c, r),
+    lambda r, c: (7 - c, 7 - r),
+]
+# White king squares kept after folding: the a1-d1-d4 triangle without pawns, files a-d with pawns.
+PAWNLESS_KING_SLOTS = {(r, c): i for i, (r, c) in enumerate(
+    (r, c) for r in range(8) for c in range(8) if 7 - r <= c <= 3)}
+PAWN_KING_SLOTS = {(r, c): i for i, (r, c) in enumerate((r, c) for r in range(8) for c in range(4))}
+
+
+class MissingTable(Exception):
+    """
+    Raised when a position needs a table that has not been generated.
+    """
+
+    def __init__(self, key: str):
+        super().__init__(f"Tablebase {key} has not been generated")
+        self.key = key
+
+
+def pieceLetters(codes: list[int]) -> str:
+    return "".join(sorted((PieceTables.PIECES[abs(code)] for code in codes), key=PIECE_ORDER.index))
+
+
+def strength(letters: str) -> tuple:
+    return (sum(PieceTables.VALUES[PIECE_CODES[p]] for p in letters), len(letters),
+            tuple(-PIECE_ORDER.index(p) for p in letters))
+
+
+def isDeadMaterial(whiteLetters: str, blackLetters: str) -> bool:
+    # Bare kings, or a single minor piece: no mate is possible
+    letters = whiteLetters + blackLetters
+    return letters == "" or letters in ("B", "N")
+
+
+class Layout:
+    """
+    Index arithmetic for one material signature: piece order is white king, black king,
+    white pieces, black pieces; the index is stm, white king slot, then 6 bits per other piece.
+    """
+
+    def __init__(self, key: str):
+        white, black = key.split("v")
+        self.key = key
+        self.whiteLetters = white[1:]
+        self.blackLetters = black[1:]
+        self.codes = [6, -6] + [PIECE_CODES[p] for p in self.whiteLetters] + [-PIECE_CODES[p] for p in self.blackLetters]
+        self.hasPawns = "P" in key
+        self.kingSlots = PAWN_KING_SLOTS if self.hasPawns else PAWNLESS_KING_SLOTS
+        self.slotSquares = sorted(self.kingSlots, key=self.kingSlots.get)
+        self.transforms = TRANSFORMS[:2] if self.hasPawns else TRANSFORMS
+        self.others = len(self.codes) - 1
+        self.stride = 64 ** self.others
+        self.size = 2 * len(self.kingSlots) * self.stride
+
+    def index(self, squares: list[tuple[int, int]], stmBit: int) -> int:
+        """
+        Smallest index over the symmetries that bring the white king into its slots.
+        """
+        best = None
+        for transform in self.transforms:
+            wk = transform(*squares[0])
+            slot = self.kingSlots.get(wk)
+            if slot is None:
+                continue
+            index = stmBit * len(self.kingSlots) + slot
+            for square in squares[1:]:
+                r, c = transform(*square)
+                index = index * 64 + r * 8 + c
+            if best is None or index < best:
+                best = index
+        return best
+
+    def decode(self, index: int) -> tuple[list[tuple[int, int]], int]:
+        squares = []
+        for _ in range(self.others):
+            index, square = divmod(index, 64)
+            squares.append(divmod(square, 8))
+        stmBit, slot = divmod(index, len(self.kingSlots))
+        return [self.slotSquares[slot]] + squares[::-1], stmBit
+
+
+class Table:
+    def __init__(self, directory: str, key: str):
+        self.layout = Layout(key)
+        self.files = []
+        self.wdl = self.openMap(os.path.join(directory, key + ".wdl"))
+        self.dtm = self.openMap(os.path.join(directory, key + ".dtm"))
+
+    def openMap(self, path: str):
+        f = open(path, "rb")
+        self.files.append(f)
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        self.wdl.close()
+        self.dtm.close()
+        for f in self.files:
+            f.close()
+
+    def lookup(self, index: int) -> Optional[tuple[int, int]]:
+        wdl = struct.unpack_from("b", self.wdl, index)[0]
+        if wdl == INVALID:
+            return None
+        return wdl, struct.unpack_from("<H", self.dtm, 2 * index)[0]
+
+
+class Tablebases:
+    def __init__(self, directory: str = DEFAULT_TB_DIR):
+        self.directory = directory
+        self.tables = {} # key -> Table, None if the files are missing
+        self.maxPieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                if name.endswith(".wdl"):
+                    self.maxPieces = max(self.maxPieces, len(name) - len(".wdl") - 1)
+
+    def close(self):
+        for table in self.tables.values():
+            if table is not None:
+                table.close()
+        self.tables = {}
+
+    def table(self, key: str) -> Optional[Table]:
+        if key not in self.tables:
+            path = os.path.join(self.directory, key + ".wdl")
+            self.tables[key] = Table(self.directory, key) if os.path.exists(path) else None
+        return self.tables[key]
+
+    def probePieces(self, pieces: list[tuple[int, int, int]], player: int) -> tuple[int, int]:
+        """
+        (wdl, dtm) for the side to move given (code, row, col) pieces. Raises MissingTable
+        if the material has no table, and returns a draw for material that cannot mate.
+        """
+        whiteLetters = pieceLetters([code for code, _, _ in pieces if 0 < code < 6])
+        blackLetters = pieceLetters([code for code, _, _ in pieces if -6 < code < 0])
+        if isDeadMaterial(whiteLetters, blackLetters):
+            return DRAW, 0
+        if strength(blackLetters) > strength(whiteLetters):
+            # Swap colors so the stronger side is white
+            pieces = [(-code, 7 - r, c) for code, r, c in pieces]
+            player = -player
+            whiteLetters, blackLetters = blackLetters, whiteLetters
+        key = f"K{whiteLetters}vK{blackLetters}"
+        table = self.table(key)
+        if table is None:
+            raise MissingTable(key)
+        return table.lookup(table.layout.index(orderedSquares(table.layout, pieces), 0 if player == 1 else 1))
+
+    def probe(self, gameState: ChessBackend.GameState) -> Optional[tuple[int, int]]:
+        """
+        (wdl, dtm) from the side to move, or None if the position is not covered by the tables.
+        """
+        placement = gameState.boardHistory[-1].split(" ", 1)[0]
+        if len(placement.translate(NON_PIECES)) > self.maxPieces or gameState.info.winner is not None:
+            return None
+        castlingRights = gameState.info.castlingRights
+        if any(castlingRights[1]) or any(castlingRights[2]):
+            return None
+        if gameState.info.enPassantPossible and any(code & ChessBackend.EN_PASSANT_FLAG for code in gameState.moveCodes):
+            return None
+        pieces = [(code, sq >> 3, sq & 7) for sq, code in enumerate(gameState.board) if code]
+        try:
+            return self.probePieces(pieces, gameState.player)
+        except MissingTable:
+            return None
+
+    def score(self, gameState: ChessBackend.GameState) -> Optional[float]:
+        """
+        Search score from the side to move, or None if the position is not in the tables.
+        """
+        result = self.probe(gameState)
+        if result is None:
+            return None
+        wdl, dtm = result
+        if wdl == DRAW:
+            return 0
+        return wdl * (TB_WIN_SCORE - dtm)
+
+    def bestMove(self, gameState: ChessBackend.GameState) -> Optional[tuple[ChessBackend.Move, float]]:
+        """
+        Root probe: the move that wins fastest, keeps the draw, or loses slowest, with its score.
+        """
+        if self.probe(gameState) is None:
+            return None
+        best = None
+        bestRank = None
+        for move in gameState.validMoves:
+            gameState.makeMove(move)
+            if gameState.info.winner is not None:
+                child = (LOSS, 0) if gameState.info.winner == -gameState.player else (DRAW, 0)
+            else:
+                child = self.probe(gameState)
+            gameState.undoMove()
+            if child is None:
+                continue
+            wdl, dtm = -child[0], child[1] + 1
+            rank = (wdl, -dtm if wdl == WIN else dtm)
+            if bestRank is None or rank > bestRank:
+                bestRank = rank
+                best = (move, 0 if wdl == DRAW else wdl * (TB_WIN_SCORE - dtm))
+        return best
+
+
+def orderedSquares(layout: Layout, pieces: list[tuple[int, int, int]]) -> list[tuple[int, int]]:
+    # Match pieces to the layout order; pieces of the same kind are interchangeable
+    remaining = sorted(pieces)
+    squares = []
+    for code in layout.codes:
+        for i, (pieceCode, r, c) in enumerate(remaining):
+            if pieceCode == code:
+                squares.append((r, c))
+                del remaining[i]
+                break
+    return squares
+
+
+def materialKeys(key: str) -> list[str]:
+    white, black = key.split("v")
+    if not (white.startswith("K") and black.startswith("K")) or any(p not in PIECE_ORDER for p in white[1:] + black[1:]):
+        raise ValueError(f"Invalid material key {key!r}, expected e.g. KQvK or KRvKP")
+    whiteLetters = "".join(sorted(white[1:], key=PIECE_ORDER.index))
+    blackLetters = "".join(sorted(black[1:], key=PIECE_ORDER.index))
+    if strength(blackLetters) > strength(whiteLetters):
+        whiteLetters, blackLetters = blackLetters, whiteLetters
+    return f"K{whiteLetters}vK{blackLetters}"
+
+
+class Generator:
+    def __init__(self, directory: str = DEFAULT_TB_DIR, verbose: bool = True):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.verbose = verbose
+        self.tablebases = Tablebases(directory)
+
+    def log(self, message: str):
+        if self.verbose:
+            print(message, flush=True)
+
+    def external(self, pieces: list[tuple[int, int, int]], player: int) -> tuple[int, int]:
+        # Value of a position with different material, generating its table first if needed
+        while True:
+            try:
+                return self.tablebases.probePieces(pieces, player)
+            except MissingTable as missing:
+                self.generate(missing.key)
+
+    def generate(self, key: str, force: bool = False):
+        """
+        Generate the table for a material key and, recursively, the tables it converts into.
+        """
+        import numpy as np
+
+        key = materialKeys(key)
+        if not force and self.tablebases.table(key) is not None:
+            return
+        layout = Layout(key)
+        self.log(f"Generating {key}: {layout.size} slots")
+        startTime = time.time()
+        wdl = np.full(layout.size, INVALID, dtype=np.int8)
+        dtm = np.zeros(layout.size, dtype=np.int32)
+        externals = {} # (wdl, dtm) -> pseudo-node index appended after the positions
+        nodes = array("i")
+        offsets = array("i")
+        edges = array("i")
+        gs = ChessBackend.GameState.__new__(ChessBackend.GameState)
+        for index in range(layout.size):
+            squares, stmBit = layout.decode(index)
+            if len(set(squares)) != len(squares) or layout.index(squares, stmBit) != index:
+                continue
+            if any(abs(code) == 1 and r in (0, 7) for code, (r, c) in zip(layout.codes, squares)):
+                continue
+            (wr, wc), (br, bc) = squares[0], squares[1]
+            if max(abs(wr - br), abs(wc - bc)) <= 1:
+                continue
+            player = 1 if stmBit == 0 else -1
+            board = [0] * 64
+            for code, (r, c) in zip(layout.codes, squares):
+                board[r * 8 + c] = code
+            gs.loadBoard(board, player)
+            if gs.isAttacked(gs.info.kingLocations[-player], -player):
+                continue # the side not to move is in check
+            if gs.info.winner is not None:
+                wdl[index] = LOSS if gs.info.winner == -player else DRAW
+                continue
+            wdl[index] = UNKNOWN
+            nodes.append(index)
+            offsets.append(len(edges))
+            pieces = [(code, r, c) for code, (r, c) in zip(layout.codes, squares)]
+            for move in gs.validMoves:
+                if move.pieceCaptured or move.isEnPassantMove or move.pawnPromotion:
+                    captureSquare = (move.startRow, move.endCol) if move.isEnPassantMove else (move.endRow, move.endCol)
+                    child = [(code, r, c) for code, r, c in pieces
+                             if (r, c) != captureSquare and (r, c) != (move.startRow, move.startCol)]
+                    child.append((move.pawnPromotion or move.pieceMoved, move.endRow, move.endCol))
+                    value = self.external(child, -player)
+                    if value not in externals:
+                        externals[value] = layout.size + len(externals)
+                    edges.append(externals[value])
+                else:
+                    child = [(move.endRow, move.endCol) if square == (move.startRow, move.startCol) else square
+                             for square in squares]
+                    edges.append(layout.index(child, 1 - stmBit))
+        self.log(f"  {len(nodes)} positions to solve, {len(edges)} moves, {time.time() - startTime:.1f}s")
+
+        allWdl = np.concatenate([wdl, np.array([v[0] for v in externals], dtype=np.int8)])
+        allDtm = np.concatenate([dtm, np.array([v[1] for v in externals], dtype=np.int32)])
+        nodes = np.frombuffer(nodes, dtype=np.int32).astype(np.int64)
+        offsets = np.frombuffer(offsets, dtype=np.int32).astype(np.int64)
+        edges = np.frombuffer(edges, dtype=np.int32)
+        lastExternal = max((value[1] for value in externals), default=0)
+        d = 1
+        while len(nodes):
+            childWdl = allWdl[edges]
+            childDtm = allDtm[edges]
+            # Win in d plies: some move reaches a position lost in d - 1 plies
+            win = np.logical_or.reduceat((childWdl == LOSS) & (childDtm == d - 1), offsets)
+            # Loss in d plies: every move reaches a won position, the longest in d - 1 plies
+            allWin = np.logical_and.reduceat(childWdl == WIN, offsets)
+            lose = allWin & (np.maximum.reduceat(childDtm, offsets) == d - 1) & ~win
+            solved = win | lose
+            allWdl[nodes[win]] = WIN
+            allWdl[nodes[lose]] = LOSS
+            allDtm[nodes[solved]] = d
+            if not solved.any() and d > lastExternal + 1:
+                break
+            if solved.any():
+                keep = ~solved
+                counts = np.diff(np.append(offsets, len(edges)))
+                edges = edges[np.repeat(keep, counts)]
+                counts = counts[keep]
+                offsets = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.int64)
+                nodes = nodes[keep]
+            d += 1
+        wdl = allWdl[:layout.size]
+        dtm = allDtm[:layout.size]
+        dtm[wdl == UNKNOWN] = 0
+        wdl[wdl == UNKNOWN] = DRAW
+        # The .wdl file marks a table as present, so it is written last
+        dtm.astype("<u2").tofile(os.path.join(self.directory, key + ".dtm"))
+        wdl.astype(np.int8).tofile(os.path.join(self.directory, key + ".wdl.tmp"))
+        os.replace(os.path.join(self.directory, key + ".wdl.tmp"), os.path.join(self.directory, key + ".wdl"))
+        self.tablebases.close()
+        self.tablebases = Tablebases(self.directory)
+        self.log(f"  {key}: {int((wdl == WIN).sum())} wins, {int((wdl == DRAW).sum())} draws, "
+                 f"{int((wdl == LOSS).sum())} losses, longest mate {int(dtm.max())} plies, {time.time() - startTime:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dir", default=DEFAULT_TB_DIR)
+    commands = parser.add_subparsers(dest="command", required=True)
+    generate = commands.add_parser("generate", help="Generate tables (default: all 3-piece tables).")
+    generate.add_argument("keys", nargs="*", default=THREE_PIECE_TABLES)
+    generate.add_argument("--force", action="store_true", help="Regenerate existing tables.")
+    probe = commands.add_parser("probe", help="Probe a FEN.")
+    probe.add_argument("fen")
+    args = parser.parse_args()
+
+    if args.command == "generate":
+        generator = Generator(args.dir)
+        for key in args.keys:
+            generator.generate(key, args.force)
+    else:
+        tablebases = Tablebases(args.dir)
+        gs = ChessBackend.GameState.fromFen(args.fen)
+        result = tablebases.probe(gs)
+        if result is None:
+            print("Position not in the tablebases")
+            sys.exit(1)
+        wdl, dtm = result
+        print({WIN: "win", DRAW: "draw", LOSS: "loss"}[wdl] + (f" in {dtm} plies" if wdl != DRAW else ""))
+        best = tablebases.bestMove(gs)
+        if best is not None:
+            print(f"best move {best[0].getUciNotation()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# The modules import each other by their flat names (e.g. `import ChessBackend`), so make
+# that work when they are run as part of the package (`python -m Chess.uci`).
+_package_dir = os.path.dirname(os.path.abspath(__file__))
+if _package_dir not in sys.path:
+    sys.path.insert(0, _package_dir)
@@ -0,0 +1,191 @@
+"""
+Batch position analysis: the best lines with scores and PVs for every position of a PGN or FEN list,
+searched across a process pool and written as JSON lines as soon as each game is done.
+
+    python -m Chess.analysis --pgn games.pgn --multipv 3 --movetime 0.5 --workers 4 -o analysis.jsonl
+    python -m Chess.analysis --fen positions.txt --depth 4 --nodes 20000
+
+A game is analysed by one worker from its first to its last position, so the memo table filled for
+one position is reused by the next. A FEN list is analysed one position per job. Reading PGNs needs
+python-chess.
+"""
+import argparse
+import json
+import multiprocessing
+import sys
+import threading
+import time
+
+import ChessBackend
+import uci
+
+DEFAULT_DEPTH = 4
+
+# Engine and search limits of the current worker process.
+_engine = None
+_limits = None
+
+
+def initWorker(hashMB: int, qply, limits: dict):
+    global _engine, _limits
+    _engine = uci.createEngine("classic")
+    _engine.memoLimit = hashMB * 1024 * 1024 // uci.MEMO_ENTRY_BYTES
+    if qply is not None:
+        _engine.qplyLimit = qply
+    _limits = limits
+
+
+def pgnJobs(pgnPaths: list[str]):
+    """
+    One job per game: the start FEN and the mainline moves in UCI notation.
+    """
+    import chess.pgn # python-chess is only needed to read PGNs
+
+    gameId = 0
+    for pgnPath in pgnPaths:
+        with open(pgnPath) as pgnFile:
+            while True:
+                game = chess.pgn.read_game(pgnFile)
+                if game is None:
+                    break
+                yield {"game": gameId, "fen": game.board().fen(), "moves": [move.uci() for move in game.mainline_moves()]}
+                gameId += 1
+
+
+def fenJobs(fenPaths: list[str]):
+    """
+    One job per non-empty line of the FEN files.
+    """
+    positionId = 0
+    for fenPath in fenPaths:
+        with open(fenPath) as fenFile:
+            for line in fenFile:
+                fen = line.strip()
+                if fen and not fen.startswith("#"):
+                    yield {"position": positionId, "fen": fen, "moves": None}
+                    positionId += 1
+
+
+def analysePosition(engine, gs: ChessBackend.GameState, limits: dict) -> dict:
+    """
+    Analyse one position within the limits (depth, movetime in seconds, nodes, multipv).
+    """
+    stopEvent = threading.Event()
+    timer = None
+    if limits.get("movetime") is not None:
+        timer = threading.Timer(limits["movetime"], stopEvent.set)
+        timer.start()
+    startTime = time.time()
+    try:
+        lines = engine.analyse(gs, limits["depth"], limits["multipv"], stopEvent, limits.get("nodes"))
+    finally:
+        if timer is not None:
+            timer.cancel()
+    return {
+        "depth": engine.completedDepth,
+        "nodes": engine.totalNodes,
+        "ms": int((time.time() - startTime) * 1000),
+        "lines": [{
+            "move": line["move"].getUciNotation(),
+            "score": uci.formatScore(line["score"]),
+            "pv": [move.getUciNotation() for move in line["pv"]],
+        } for line in lines],
+    }
+
+
+def analyseJob(job: dict) -> list[dict]:
+    """
+    Analyse every position of a job in a worker process. For games each record also
+    names the move played from the position. A job that fails (a bad FEN, an illegal
+    move) ends with a record holding an "error" field instead of stopping the batch.
+    """
+    records = []
+    try:
+        analyseJobPositions(job, records)
+    except Exception as exc:
+        record = {key: job[key] for key in ("game", "position") if key in job}
+        record["fen"] = job["fen"]
+        record["error"] = f"{type(exc).__name__}: {exc}"
+        records.append(record)
+    return records
+
+
+def analyseJobPositions(job: dict, records: list[dict]):
+    engine = _engine
+    # Consecutive positions of a game share the tables; a new job starts empty.
+    engine.memo = {}
+    engine.bestMoves = {}
+    gs = ChessBackend.GameState.fromFen(job["fen"])
+    fields = job["fen"].split()
+    fullMove = int(fields[5]) if len(fields) > 5 else 1
+    moves = job["moves"] or []
+    for ply in range(len(moves) + 1):
+        if gs.info.winner is not None:
+            break
+        record = {key: job[key] for key in ("game", "position") if key in job}
+        record["ply"] = ply
+        record["fen"] = f"{gs.boardHistory[-1]} {gs.info.seventyFiveMoveRuleCounter} {fullMove}"
+        if job["moves"] is not None:
+            record["played"] = moves[ply] if ply < len(moves) else None
+        record.update(analysePosition(engine, gs, _limits))
+        records.append(record)
+        if ply == len(moves):
+            break
+        move = uci.findMove(gs, moves[ply])
+        if move is None:
+            records[-1]["error"] = f"illegal move {moves[ply]}"
+            break
+        if gs.player == -1:
+            fullMove += 1
+        gs.makeMove(move)
+
+
+def analyseBatch(jobs, limits: dict, workers: int = None, hashMB: int = 64, qply=None):
+    """
+    Analyse the jobs (see pgnJobs and fenJobs) in a process pool and yield each job's records
+    as soon as it completes, in completion order.
+    """
+    with multiprocessing.Pool(workers, initializer=initWorker, initargs=(hashMB, qply, limits)) as pool:
+        yield from pool.imap_unordered(analyseJob, jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pgn", nargs="+", default=[], help="PGN files; every position of every game is analysed.")
+    parser.add_argument("--fen", nargs="+", default=[], help="Files with one FEN per line.")
+    parser.add_argument("--multipv", type=int, default=1, help="Number of lines per position.")
+    parser.add_argument("--depth", type=int, default=None, help=f"Maximum depth (default {DEFAULT_DEPTH}, unlimited with --movetime).")
+    parser.add_argument("--movetime", type=float, default=None, help="Seconds per position.")
+    parser.add_argument("--nodes", type=int, default=None, help="Nodes per position.")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--hash", type=int, default=64, help="Memo table size per worker in MB.")
+    parser.add_argument("--qply", type=int, default=None, help="Quiescence search depth limit.")
+    parser.add_argument("-o", "--output", default=None, help="JSON lines output file (default stdout).")
+    args = parser.parse_args()
+    if not args.pgn and not args.fen:
+        parser.error("give --pgn and/or --fen")
+
+    depth = args.depth if args.depth is not None else (uci.MAX_DEPTH if args.movetime or args.nodes else DEFAULT_DEPTH)
+    limits = {"depth": depth, "movetime": args.movetime, "nodes": args.nodes, "multipv": max(1, args.multipv)}
+    jobs = []
+    if args.pgn:
+        jobs.extend(pgnJobs(args.pgn))
+    if args.fen:
+        jobs.extend(fenJobs(args.fen))
+    out = open(args.output, "w") if args.output else sys.stdout
+    startTime = time.time()
+    positions = 0
+    try:
+        for done, records in enumerate(analyseBatch(jobs, limits, args.workers, args.hash, args.qply), 1):
+            for record in records:
+                out.write(json.dumps(record) + "\n")
+            out.flush()
+            positions += len(records)
+            print(f"{done}/{len(jobs)} jobs, {positions} positions, {time.time() - startTime:.1f}s", file=sys.stderr)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+"""
+Deterministic search benchmark: searches a fixed set of positions to a fixed depth with findBestMove
+and reports the total node count (search + memo + q-search nodes) and nodes per second.
+The node total is a functional signature: it only changes when search behaviour changes.
+
+    python -m Chess.bench --depth 3 [--engine nn --model model.pth] [--json bench.json]
+    python -m Chess.bench --depth 3 --stats --profile cprofile
+    python -m Chess.bench --depth 3 --compare [--disable razoring] [--margins futility=1,3]
+
+--compare runs the bench a second time with the frontier pruning (reverse futility, futility,
+razoring) switched off and reports the node counts and how many best moves and scores changed.
+"""
+import argparse
+import json
+import platform
+import time
+
+import ChessBackend
+import SearchStats
+import ChessEngine
+import uci
+
+DEFAULT_DEPTH = 3
+# Frontier pruning switch (ChessEngine.FRONTIER_PRUNING) -> Engine attribute holding its margins for remaining depth 1 and 2
+MARGIN_ATTRIBUTES = {"reverseFutility": "reverseFutilityMargins", "futility": "futilityMargins", "razoring": "razorMargins"}
+
+BENCH_POSITIONS = [
+    "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 10",
+    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 11",
+    "4rrk1/pp1n3p/3q2pQ/2p1pb2/2PP4/2P3N1/P2B2PP/4RRK1 b - - 7 19",
+    "rq3rk1/ppp2ppp/1bnpb3/3N2B1/3NP3/7P/PPPQ1PP1/2KR3R w - - 7 14",
+    "r1bq1r1k/1pp1n1pp/1p1p4/4p2Q/4Pp2/1BNP4/PPP2PPP/3R1RK1 w - - 2 14",
+    "r3r1k1/2p2ppp/p1p1bn2/8/1q2P3/2NPQN2/PPP3PP/R4RK1 b - - 2 15",
+    "r1bbk1nr/pp3p1p/2n5/1N4p1/2Np1B2/8/PPP2PPP/2KR1B1R w kq - 0 13",
+    "r1bq1rk1/ppp1nppp/4n3/3p3Q/3P4/1BP1B3/PP1N2PP/R4RK1 w - - 1 16",
+    "4r1k1/r1q2ppp/ppp2n2/4P3/5Rb1/1N1BQ3/PPP3PP/R5K1 w - - 1 17",
+    "2rqkb1r/ppp2p2/2npb1p1/1N1Nn2p/2P1PP2/8/PP2B1PP/R1BQK2R b KQ - 0 11",
+    "r1bq1r1k/b1p1npp1/p2p3p/1p6/3PP3/1B2NN2/PP3PPP/R2Q1RK1 w - - 1 16",
+    "3r1rk1/p5pp/bpp1pp2/8/q1PP1P2/b3P3/P2NQRPP/1R2B1K1 b - - 6 22",
+    "r1q2rk1/2p1bppp/2Pp4/p6b/Q1PNp3/4B3/PP1R1PPP/2K4R w - - 2 18",
+    "4k2r/1pb2ppp/1p2p3/1R1p4/3P4/2r1PN2/P4PPP/1R4K1 b - - 3 22",
+    "3q2k1/pb3p1p/4pbp1/2r5/PpN2N2/1P2P2P/5PP1/Q2R2K1 b - - 4 26",
+    "6k1/6p1/6Pp/ppp5/3pn2P/1P3K2/1PP2P2/3N4 b - - 0 1",
+    "3b4/5kp1/1p1p1p1p/pP1PpP1P/P1P1P3/3KN3/8/8 w - - 0 1",
+    "2K5/p7/7P/5pR1/8/5k2/r7/8 w - - 0 1",
+    "8/6pk/1p6/8/PP3p1p/5P2/4KP1q/3Q4 w - - 0 1",
+    "7k/3p2pp/4q3/8/4Q3/5Kp1/P6b/8 w - - 0 1",
+    "8/2p5/8/2kPKp1p/2p4P/2P5/3P4/8 w - - 0 1",
+    "8/1p3pp1/7p/5P1P/2k3P1/8/2K2P2/8 w - - 0 1",
+    "8/pp2r1k1/2p1p3/3pP2p/1P1P1P1P/P5KR/8/8 w - - 0 1",
+    "8/3p4/p1bk3p/Pp6/1Kp1PpPp/2P2P1P/2P5/5B2 b - - 0 1",
+    "5k2/7R/4P2p/5K2/p1r2P1p/8/8/8 b - - 0 1",
+    "6k1/6p1/P6p/r1N5/5p2/7P/1b3PP1/4R1K1 w - - 0 1",
+    "1r3k2/4q3/2Pp3b/3Bp3/2Q2p2/1p1P2P1/1P2KP2/3N4 w - - 0 1",
+    "6k1/4pp1p/3p2p1/P1pPb3/R7/1r2P1PP/3B1P2/6K1 w - - 0 1",
+    "8/3p3B/5p2/5P2/p7/PP5b/k7/6K1 w - - 0 1",
+]
+
+
+def runBench(engine, depth: int, verbose: bool = False) -> dict:
+    """
+    Search every bench position from empty tables and return the per-position and total results.
+    """
+    results = []
+    totalNodes = 0
+    totalTime = 0.0
+    totalStats = None
+    for i, fen in enumerate(BENCH_POSITIONS):
+        gs = ChessBackend.GameState.fromFen(fen)
+        engine.memo = {}
+        engine.bestMoves = {}
+        startTime = time.perf_counter()
+        move = engine.findBestMove(gs, depth)
+        elapsed = time.perf_counter() - startTime
+        nodes = engine.nodeCount()
+        totalNodes += nodes
+        totalTime += elapsed
+        results.append({
+            "fen": fen,
+            "move": move.getUciNotation() if move is not None else None,
+            "nodes": nodes,
+            "score": engine.rootScore,
+            "seconds": round(elapsed, 6),
+        })
+        if engine.collectStats:
+            results[-1]["stats"] = engine.lastStats.asDict()
+            totalStats = mergeStats(totalStats, engine.lastStats)
+        if verbose:
+            print(f"{i + 1:3d}/{len(BENCH_POSITIONS)} {results[-1]['move'] or '-':>6} "
+                  f"{nodes:9d} nodes {nodes / (elapsed + 1e-9):9.0f} nps  {fen}")
+    report = {
+        "depth": depth,
+        "positions": len(BENCH_POSITIONS),
+        "nodes": totalNodes,
+        "seconds": round(totalTime, 6),
+        "nps": int(totalNodes / (totalTime + 1e-9)),
+        "results": results,
+    }
+    if totalStats is not None:
+        report["stats"] = totalStats
+    return report
+
+
+def comparePruning(report: dict, baseline: dict) -> list[str]:
+    """
+    Report lines comparing a bench run with one without frontier pruning.
+    """
+    pairs = list(zip(report["results"], baseline["results"]))
+    changedMoves = [i + 1 for i, (result, base) in enumerate(pairs) if result["move"] != base["move"]]
+    scoreChanges = [abs(result["score"] - base["score"]) for result, base in pairs]
+    saved = 1 - report["nodes"] / max(baseline["nodes"], 1)
+    return [
+        f"Without frontier pruning: {baseline['nodes']} nodes, {baseline['seconds']:.3f}s",
+        f"With frontier pruning: {report['nodes']} nodes ({saved:.1%} fewer), {report['seconds']:.3f}s",
+        f"Best move changed: {len(changedMoves)}/{len(pairs)}" + (f" (positions {changedMoves})" if changedMoves else ""),
+        f"Score changed: {sum(change > 1e-9 for change in scoreChanges)}/{len(pairs)}, "
+        f"largest change {max(scoreChanges, default=0):.2f} pawns",
+    ]
+
+
+def mergeStats(total, stats):
+    """
+    Add one search's SearchStats into the running total, another SearchStats.
+    """
+    if total is None:
+        total = SearchStats.SearchStats()
+    for name in ("nodesPerPly", "qNodesPerQply"):
+        counts = getattr(total, name)
+        for i, count in enumerate(getattr(stats, name)):
+            if i == len(counts):
+                counts.append(0)
+            counts[i] += count
+    total.ttProbes += stats.ttProbes
+    total.ttHits += stats.ttHits
+    total.ttStores += stats.ttStores
+    total.cutoffIndex.update(stats.cutoffIndex)
+    total.times.update(stats.times)
+    total.elapsed += stats.elapsed
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=("classic", "nn"), default="classic")
+    parser.add_argument("--model", default=None, help="Model state dict for the NN engine.")
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--json", default=None, help="Also write the results to this JSON file.")
+    parser.add_argument("--verbose", action="store_true", help="Print one line per position.")
+    parser.add_argument("--stats", action="store_true",
+                        help="Collect search statistics (nodes per ply, TT, cutoffs, time per category); slows the search.")
+    parser.add_argument("--profile", choices=("cprofile", "sampling"), default=None,
+                        help="Profile the whole bench run.")
+    parser.add_argument("--disable", action="append", default=[], choices=ChessEngine.FRONTIER_PRUNING,
+                        help="Switch off one frontier pruning technique (repeatable).")
+    parser.add_argument("--margins", action="append", default=[], metavar="NAME=D1,D2",
+                        help=f"Margins in pawns at remaining depth 1 and 2 for {', '.join(ChessEngine.FRONTIER_PRUNING)}.")
+    parser.add_argument("--compare", action="store_true",
+                        help="Also run without frontier pruning and compare node counts, best moves and scores.")
+    parser.add_argument("--profile-output", default=None,
+                        help="Write the profile here (pstats dump for cprofile) instead of printing it.")
+    args = parser.parse_args()
+
+    if args.engine != "classic" and (args.compare or args.disable or args.margins):
+        parser.error("--compare, --disable and --margins only apply to the classic engine, "
+                     "the NN search has no frontier pruning")
+    margins = {}
+    for margin in args.margins:
+        name, _, values = margin.partition("=")
+        attribute = uci.PRUNING_OPTIONS.get(name.lower())
+        if attribute is None:
+            parser.error(f"unknown margin {name!r}, expected one of {', '.join(ChessEngine.FRONTIER_PRUNING)}")
+        try:
+            depthMargins = [float(value) for value in values.split(",")]
+        except ValueError:
+            depthMargins = []
+        if len(depthMargins) != 2:
+            parser.error(f"--margins {margin!r}: expected {name}=D1,D2 with two margins in pawns")
+        margins[MARGIN_ATTRIBUTES[attribute]] = [0] + depthMargins
+
+    engine = uci.createEngine(args.engine, args.model)
+    engine.collectStats = args.stats
+    for attribute in args.disable:
+        setattr(engine, attribute, False)
+    for attribute, depthMargins in margins.items():
+        setattr(engine, attribute, depthMargins)
+    if args.profile:
+        report = SearchStats.runProfiled(args.profile, args.profile_output, runBench, engine, args.depth, args.verbose)
+    else:
+        report = runBench(engine, args.depth, args.verbose)
+    print(f"Positions: {report['positions']}")
+    print(f"Nodes searched: {report['nodes']}")
+    print(f"Total time (s): {report['seconds']:.3f}")
+    print(f"Nodes/second: {report['nps']}")
+    if args.compare:
+        baselineEngine = uci.createEngine(args.engine, args.model)
+        for attribute in ChessEngine.FRONTIER_PRUNING:
+            setattr(baselineEngine, attribute, False)
+        baseline = runBench(baselineEngine, args.depth)
+        for line in comparePruning(report, baseline):
+            print(line)
+        report["withoutPruning"] = {"nodes": baseline["nodes"], "seconds": baseline["seconds"],
+                                    "results": baseline["results"]}
+    if "stats" in report:
+        print(report["stats"].report())
+        report["stats"] = report["stats"].asDict()
+    if args.json:
+        report.update({
+            "engine": args.engine,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+        })
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
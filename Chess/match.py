@@ -0,0 +1,379 @@
+"""
+Headless self-play matches between two engine configurations, with a sequential probability ratio test.
+Each opening is played twice with colors swapped; games run concurrently in a process pool.
+
+    python -m Chess.match --engine1 "classic:depth=3,qply=6" --engine2 "classic:depth=3,qply=4" --games 200 --concurrency 4
+
+An engine spec is `kind[:option=value,...]` with kind classic, nn or mcts and options
+depth, movetime (seconds), nodes, qply, beam, fullwidth, policyweight, leaf, playouts and model,
+and futility, reversefutility and razoring (0 or 1) to switch the frontier pruning.
+"""
+import argparse
+import csv
+import datetime
+import math
+import multiprocessing
+import os
+import threading
+import time
+
+import ChessBackend
+import uci
+
+RESULTS_DIR = "results" # default output directory (git-ignored), relative to the working directory
+
+MAX_PLIES = 400 # games still running after this many plies are adjudicated as draws
+
+# A few balanced openings as UCI move sequences, used when no opening file is given.
+DEFAULT_OPENINGS = [
+    "e2e4 e7e5 g1f3 b8c6 f1b5",
+    "e2e4 e7e5 g1f3 b8c6 f1c4",
+    "e2e4 c7c5 g1f3 d7d6",
+    "e2e4 c7c5 b1c3 b8c6",
+    "e2e4 e7e6 d2d4 d7d5",
+    "e2e4 c7c6 d2d4 d7d5",
+    "d2d4 d7d5 c2c4 e7e6",
+    "d2d4 d7d5 c2c4 c7c6",
+    "d2d4 g8f6 c2c4 g7g6",
+    "d2d4 g8f6 c2c4 e7e6 g1f3",
+    "c2c4 e7e5 b1c3",
+    "g1f3 d7d5 g2g3",
+]
+
+# Engines of the current worker process, keyed by spec string.
+_engines = {}
+
+
+def parseSpec(spec: str) -> dict:
+    kind, _, options = spec.partition(":")
+    parsed = {"kind": kind.strip(), "depth": 3}
+    for option in filter(None, options.split(",")):
+        key, _, value = option.partition("=")
+        key = key.strip().lower()
+        value = value.strip()
+        if key in ("depth", "nodes", "qply", "beam", "fullwidth", "playouts") or key in uci.PRUNING_OPTIONS:
+            parsed[key] = int(value)
+        elif key in ("movetime", "policyweight"):
+            parsed[key] = float(value)
+        elif key in ("leaf", "model"):
+            parsed[key] = value
+        else:
+            raise ValueError(f"Unknown engine option {key!r} in {spec!r}")
+    return parsed
+
+
+def buildEngine(spec: str):
+    options = parseSpec(spec)
+    engine = uci.createEngine(options["kind"], options.get("model"))
+    if "qply" in options:
+        engine.qplyLimit = options["qply"]
+    for key, attribute in uci.PRUNING_OPTIONS.items():
+        if key in options:
+            setattr(engine, attribute, bool(options[key]))
+    if options["kind"] in ("nn", "mcts"):
+        engine.set_search_options(
+            beam_width=options.get("beam"), full_width_depth=options.get("fullwidth"),
+            policy_weight=options.get("policyweight"), leaf_evaluation=options.get("leaf"))
+    if options["kind"] == "mcts" and "playouts" in options:
+        engine.set_mcts_options(playouts=options["playouts"])
+    return engine, options
+
+
+def getEngine(spec: str):
+    if spec not in _engines:
+        _engines[spec] = buildEngine(spec)
+    return _engines[spec]
+
+
+def openingPosition(opening: str) -> tuple[ChessBackend.GameState, list[str]]:
+    """
+    An opening is either a FEN or a sequence of UCI moves from the start position.
+    Returns the position after the opening and the SAN of the opening moves.
+    """
+    if "/" in opening:
+        return ChessBackend.GameState.fromFen(opening), []
+    gs = ChessBackend.GameState()
+    sanMoves = []
+    for uciMove in opening.split():
+        move = uci.findMove(gs, uciMove)
+        if move is None:
+            raise ValueError(f"Illegal opening move {uciMove} in {opening!r}")
+        sanMoves.append(gs.getSanNotation(move))
+        gs.makeMove(move)
+    return gs, sanMoves
+
+
+def searchMove(engine, options: dict, gs: ChessBackend.GameState):
+    stopEvent = threading.Event()
+    timer = None
+    if "movetime" in options:
+        timer = threading.Timer(options["movetime"], stopEvent.set)
+        timer.start()
+    try:
+        depth = options["depth"] if "movetime" not in options else uci.MAX_DEPTH
+        move = engine.iterativeSearch(gs, depth, stopEvent, maxNodes=options.get("nodes"))
+    finally:
+        if timer is not None:
+            timer.cancel()
+    return uci.findMove(gs, move.getUciNotation()) if move is not None else None
+
+
+def playGame(job: dict) -> dict:
+    """
+    Play one game in a worker process and return its moves, result and timings.
+    """
+    players = {1: getEngine(job["white"]), -1: getEngine(job["black"])}
+    for engine, _ in players.values():
+        # Games are independent: start every game with empty tables.
+        engine.memo = {}
+        engine.bestMoves = {}
+    gs, sanMoves = openingPosition(job["opening"])
+    startFen = job["opening"] if "/" in job["opening"] else None
+    seconds = {1: 0.0, -1: 0.0}
+    nodes = {1: 0, -1: 0}
+    moveCount = {1: 0, -1: 0}
+    termination = "normal"
+    startTime = time.time()
+    while gs.info.winner is None:
+        if len(sanMoves) >= MAX_PLIES:
+            termination = "adjudication"
+            break
+        engine, options = players[gs.player]
+        moveStart = time.time()
+        move = searchMove(engine, options, gs)
+        seconds[gs.player] += time.time() - moveStart
+        nodes[gs.player] += engine.totalNodes
+        moveCount[gs.player] += 1
+        if move is None:
+            termination = "illegal move"
+            break
+        sanMoves.append(gs.getSanNotation(move))
+        gs.makeMove(move)
+    if termination == "illegal move":
+        winner = -gs.player
+    else:
+        winner = gs.info.winner if gs.info.winner is not None else 0
+    return {
+        **job,
+        "startFen": startFen,
+        "moves": sanMoves,
+        "winner": winner,
+        "termination": termination,
+        "seconds": time.time() - startTime,
+        "whiteSeconds": seconds[1],
+        "blackSeconds": seconds[-1],
+        "whiteMoves": moveCount[1],
+        "blackMoves": moveCount[-1],
+        "whiteNodes": nodes[1],
+        "blackNodes": nodes[-1],
+    }
+
+
+def scoreToElo(score: float) -> float:
+    score = min(max(score, 1e-6), 1 - 1e-6)
+    return -400 * math.log10(1 / score - 1)
+
+
+class SPRT:
+    """
+    Sequential probability ratio test of H0: elo = elo0 against H1: elo = elo1 for engine 1,
+    using the normal approximation of the per-game score (as in common engine testing frameworks).
+    """
+
+    def __init__(self, elo0: float = 0.0, elo1: float = 5.0, alpha: float = 0.05, beta: float = 0.05):
+        self.elo0 = elo0
+        self.elo1 = elo1
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.wins = self.draws = self.losses = 0
+
+    def add(self, score: float):
+        if score == 1:
+            self.wins += 1
+        elif score == 0:
+            self.losses += 1
+        else:
+            self.draws += 1
+
+    def games(self) -> int:
+        return self.wins + self.draws + self.losses
+
+    def meanAndVariance(self):
+        n = self.games()
+        mean = (self.wins + 0.5 * self.draws) / n
+        variance = (self.wins * (1 - mean) ** 2 + self.draws * (0.5 - mean) ** 2 + self.losses * mean ** 2) / n
+        return mean, variance
+
+    def llr(self) -> float:
+        if self.games() == 0:
+            return 0.0
+        mean, variance = self.meanAndVariance()
+        if variance == 0:
+            return 0.0
+        s0 = 1 / (1 + 10 ** (-self.elo0 / 400))
+        s1 = 1 / (1 + 10 ** (-self.elo1 / 400))
+        return self.games() * (s1 - s0) * (2 * mean - s0 - s1) / (2 * variance)
+
+    def decision(self):
+        llr = self.llr()
+        if llr >= self.upper:
+            return "H1"
+        if llr <= self.lower:
+            return "H0"
+        return None
+
+    def elo(self):
+        """
+        Elo estimate of engine 1 with a 95% confidence interval.
+        """
+        if self.games() == 0:
+            return 0.0, 0.0, 0.0
+        mean, variance = self.meanAndVariance()
+        margin = 1.96 * math.sqrt(variance / self.games())
+        return scoreToElo(mean), scoreToElo(mean - margin), scoreToElo(mean + margin)
+
+    def summary(self) -> str:
+        elo, low, high = self.elo()
+        return (f"W {self.wins} D {self.draws} L {self.losses} | Elo {elo:+.1f} [{low:+.1f}, {high:+.1f}] | "
+                f"LLR {self.llr():+.2f} ({self.lower:+.2f}, {self.upper:+.2f}) [{self.elo0}, {self.elo1}]")
+
+
+def pgnResult(winner: int) -> str:
+    return {1: "1-0", -1: "0-1", 0: "1/2-1/2"}[winner]
+
+
+def formatPgn(game: dict, names: dict) -> str:
+    result = pgnResult(game["winner"])
+    headers = [
+        ("Event", "Self-play match"),
+        ("Site", "local"),
+        ("Date", datetime.date.today().strftime("%Y.%m.%d")),
+        ("Round", str(game["index"] + 1)),
+        ("White", names[game["white"]]),
+        ("Black", names[game["black"]]),
+        ("Result", result),
+        ("Termination", game["termination"]),
+        ("PlyCount", str(len(game["moves"]))),
+    ]
+    if game["startFen"]:
+        headers += [("SetUp", "1"), ("FEN", game["startFen"])]
+    lines = [f'[{key} "{value}"]' for key, value in headers]
+    blackFirst = game["startFen"] is not None and game["startFen"].split()[1] == "b"
+    moveNumber = int(game["startFen"].split()[5]) if game["startFen"] and len(game["startFen"].split()) > 5 else 1
+    tokens = []
+    for i, san in enumerate(game["moves"]):
+        whiteToMove = (i % 2 == 0) != blackFirst
+        if whiteToMove:
+            tokens.append(f"{moveNumber}.")
+        elif i == 0:
+            tokens.append(f"{moveNumber}...")
+        tokens.append(san)
+        if not whiteToMove:
+            moveNumber += 1
+    tokens.append(result)
+    movetext = []
+    line = ""
+    for token in tokens:
+        if len(line) + len(token) + 1 > 79:
+            movetext.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    movetext.append(line)
+    return "\n".join(lines) + "\n\n" + "\n".join(movetext) + "\n\n"
+
+
+def loadOpenings(path) -> list[str]:
+    if path is None:
+        return DEFAULT_OPENINGS
+    with open(path) as f:
+        return [line.split(";")[0].strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def jobs(engine1: str, engine2: str, openings: list[str], games: int):
+    # Each opening is played twice in a row with colors swapped.
+    for index in range(games):
+        opening = openings[(index // 2) % len(openings)]
+        engine1White = index % 2 == 0
+        yield {
+            "index": index,
+            "opening": opening,
+            "white": engine1 if engine1White else engine2,
+            "black": engine2 if engine1White else engine1,
+            "engine1White": engine1White,
+        }
+
+
+TIMING_FIELDS = ["game", "white", "black", "result", "termination", "plies", "seconds",
+                 "white_ms_per_move", "black_ms_per_move", "white_nps", "black_nps"]
+
+
+def timingRow(game: dict, names: dict) -> dict:
+    return {
+        "game": game["index"] + 1,
+        "white": names[game["white"]],
+        "black": names[game["black"]],
+        "result": pgnResult(game["winner"]),
+        "termination": game["termination"],
+        "plies": len(game["moves"]),
+        "seconds": f"{game['seconds']:.3f}",
+        "white_ms_per_move": f"{1000 * game['whiteSeconds'] / max(1, game['whiteMoves']):.1f}",
+        "black_ms_per_move": f"{1000 * game['blackSeconds'] / max(1, game['blackMoves']):.1f}",
+        "white_nps": int(game["whiteNodes"] / (game["whiteSeconds"] + 1e-9)),
+        "black_nps": int(game["blackNodes"] / (game["blackSeconds"] + 1e-9)),
+    }
+
+
+def runMatch(args) -> SPRT:
+    names = {args.engine1: f"engine1 {args.engine1}", args.engine2: f"engine2 {args.engine2}"}
+    if args.engine1 == args.engine2:
+        names = {args.engine1: args.engine1}
+    for spec in (args.engine1, args.engine2):
+        parseSpec(spec) # fail early on bad specs
+    openings = loadOpenings(args.openings)
+    sprt = SPRT(args.elo0, args.elo1, args.alpha, args.beta)
+    for path in (args.pgn, args.timing_log):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(args.pgn, "w") as pgnFile, open(args.timing_log, "w", newline="") as timingFile:
+        timingLog = csv.DictWriter(timingFile, fieldnames=TIMING_FIELDS)
+        timingLog.writeheader()
+        pool = multiprocessing.Pool(args.concurrency)
+        try:
+            for game in pool.imap_unordered(playGame, jobs(args.engine1, args.engine2, openings, args.games)):
+                engine1Score = (game["winner"] + 1) / 2 if game["engine1White"] else (1 - game["winner"]) / 2
+                sprt.add(engine1Score)
+                pgnFile.write(formatPgn(game, names))
+                pgnFile.flush()
+                timingLog.writerow(timingRow(game, names))
+                timingFile.flush()
+                print(f"game {game['index'] + 1:4d} {pgnResult(game['winner']):>7} | {sprt.summary()}", flush=True)
+                decision = sprt.decision()
+                if decision is not None and not args.no_stop:
+                    print(f"SPRT accepted {decision} after {sprt.games()} games", flush=True)
+                    break
+        finally:
+            pool.terminate()
+            pool.join()
+    return sprt
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine1", required=True, help="Engine under test.")
+    parser.add_argument("--engine2", required=True, help="Baseline engine.")
+    parser.add_argument("--games", type=int, default=200, help="Maximum number of games.")
+    parser.add_argument("--concurrency", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--openings", default=None, help="File with one FEN or UCI move sequence per line.")
+    parser.add_argument("--elo0", type=float, default=0.0)
+    parser.add_argument("--elo1", type=float, default=5.0)
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    parser.add_argument("--no-stop", action="store_true", help="Play all games even after the SPRT decides.")
+    parser.add_argument("--pgn", default=os.path.join(RESULTS_DIR, "match.pgn"))
+    parser.add_argument("--timing-log", default=os.path.join(RESULTS_DIR, "match_timing.csv"))
+    sprt = runMatch(parser.parse_args())
+    print(sprt.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Benchmark for the optimized EngineNN inference backends.
+Compares per-position policy latency and move agreement against the fp32 eager model.
+"""
+import argparse
+import random
+import time
+
+import ChessBackend
+import ChessEngineMCTS
+import ChessEngineNN
+
+
+def samplePositions(count: int, seed: int = 0, maxPlies: int = 60) -> list[ChessBackend.GameState]:
+    """
+    Collect positions from seeded random playouts so every backend sees the same set.
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        gs = ChessBackend.GameState()
+        plies = rng.randint(0, maxPlies)
+        for _ in range(plies):
+            if gs.info.winner is not None:
+                break
+            gs.makeMove(rng.choice(gs.validMoves))
+        if gs.info.winner is None:
+            positions.append(gs)
+    return positions
+
+
+def policyMove(engine: ChessEngineNN.EngineNN, gs: ChessBackend.GameState) -> ChessBackend.Move:
+    return engine.rank_moves(gs, gs.validMoves)[0]
+
+
+def benchmarkEngine(engine: ChessEngineNN.EngineNN, positions: list[ChessBackend.GameState], warmup: int = 5):
+    """
+    Return (mean latency in ms, policy moves) for single-position inference.
+    """
+    for gs in positions[:warmup]:
+        engine.policyCache = {}
+        engine.policy_logits(gs)
+    latencies = []
+    moves = []
+    for gs in positions:
+        engine.policyCache = {}
+        startTime = time.perf_counter()
+        engine.policy_logits(gs)
+        latencies.append(time.perf_counter() - startTime)
+        moves.append(policyMove(engine, gs))
+    return 1000 * sum(latencies) / len(latencies), moves
+
+
+def sameMove(a: ChessBackend.Move, b: ChessBackend.Move) -> bool:
+    return (a.startRow, a.startCol, a.endRow, a.endCol, a.pawnPromotion) == (
+        b.startRow, b.startCol, b.endRow, b.endCol, b.pawnPromotion)
+
+
+def compareMCTS(modelPath, positions: list[ChessBackend.GameState], depth: int, threads: int):
+    """
+    Give EngineMCTS the same wall time per position that the beam search needed
+    at `depth`, and report throughput of both searches and their move agreement.
+    """
+    beam = ChessEngineNN.EngineNN(model_path=modelPath, device="cpu", num_threads=threads, warm_up=False)
+    mcts = ChessEngineMCTS.EngineMCTS(model_path=modelPath, device="cpu", num_threads=threads,
+                                      playouts=10**9, reuse_tree=False, warm_up=False)
+    # Load both models up front so the first timed search does not include it.
+    beam.load_model()
+    mcts.load_model()
+    beamTime = 0.0
+    beamNodes = 0
+    playouts = 0
+    agreements = 0
+    for gs in positions:
+        startTime = time.perf_counter()
+        beamMove = beam.findBestMove(gs, depth)
+        elapsed = time.perf_counter() - startTime
+        beamTime += elapsed
+        beamNodes += beam.nodesSearched + beam.nodesFromMemo + beam.nodesQSearched
+        mcts.set_mcts_options(time_limit=elapsed)
+        mctsMove = mcts.findBestMove(gs)
+        playouts += mcts.playouts
+        agreements += sameMove(beamMove, mctsMove)
+    print(f"beam search depth {depth}: {beamTime / len(positions):.3f} s/position, "
+          f"{beamNodes / (beamTime + 1e-9):.1f} nodes/s")
+    print(f"mcts at equal wall time: {playouts / (beamTime + 1e-9):.1f} playouts/s, "
+          f"{playouts / len(positions):.1f} playouts/position, "
+          f"move agreement {100 * agreements / len(positions):5.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model", default=None, help="Path to the model state dict.")
+    parser.add_argument("--positions", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--search-depth", type=int, default=0,
+                        help="Also compare findBestMove results at this depth (0 disables).")
+    parser.add_argument("--compare-mcts", type=int, default=0, metavar="DEPTH",
+                        help="Compare EngineMCTS against the beam search at this depth at equal wall time.")
+    args = parser.parse_args()
+
+    positions = samplePositions(args.positions, args.seed)
+    if args.compare_mcts > 0:
+        compareMCTS(args.model, positions, args.compare_mcts, args.threads)
+        return
+    variants = [
+        ("fp32 eager", dict(inference_backend="eager")),
+        ("int8 eager", dict(inference_backend="eager", quantize=True)),
+        ("fp32 torchscript", dict(inference_backend="torchscript")),
+        ("int8 torchscript", dict(inference_backend="torchscript", quantize=True)),
+        ("fp32 onnx", dict(inference_backend="onnx")),
+        ("int8 onnx", dict(inference_backend="onnx", quantize=True)),
+    ]
+    reference = None
+    referenceSearch = None
+    for name, options in variants:
+        try:
+            engine = ChessEngineNN.EngineNN(model_path=args.model, device="cpu", num_threads=args.threads,
+                                            warm_up=False, **options)
+            engine.load_model()
+        except ImportError as exc:
+            print(f"{name:>18}: skipped ({exc})")
+            continue
+        if not engine.nnEnabled:
+            print("No model weights found, nothing to benchmark.")
+            return
+        latency, moves = benchmarkEngine(engine, positions)
+        line = f"{name:>18}: {latency:7.3f} ms/position"
+        if reference is None:
+            reference = (latency, moves)
+        else:
+            agreement = sum(sameMove(a, b) for a, b in zip(reference[1], moves)) / len(moves)
+            line += f", speedup {reference[0] / latency:5.2f}x, policy agreement {100 * agreement:5.1f}%"
+        if args.search_depth > 0:
+            searchMoves = [engine.findBestMove(gs, args.search_depth) for gs in positions]
+            if referenceSearch is None:
+                referenceSearch = searchMoves
+            else:
+                agreement = sum(sameMove(a, b) for a, b in zip(referenceSearch, searchMoves)) / len(searchMoves)
+                line += f", search agreement {100 * agreement:5.1f}%"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import ChessBackend
 import time
+from ChessBackend import CHECK_FLAG, DISCOVERED_FLAG, EN_PASSANT_FLAG, CASTLING_FLAG, PROMOTION_SHIFT, CAPTURED_SHIFT, PIECE_MASK
 
 def perft(gs: ChessBackend.GameState, depth: int) -> int:
     """
@@ -15,28 +16,28 @@ def perft(gs: ChessBackend.GameState, depth: int) -> int:
         total_castles = 0
         total_promotions = 0
         total_double_checks = 0
-        moves_ = gs.validMoves.copy()
+        moves_ = gs.moveCodes
         for mv in moves_:
-            if mv.pieceCaptured != 0:
+            if mv >> CAPTURED_SHIFT:
                 total_caps += 1
-            if mv.isCheck:
+            if mv & CHECK_FLAG:
                 total_checks += 1
-            if mv.discoveredCheck != None:
+            if mv & DISCOVERED_FLAG:
                 total_discovered_checks += 1
                 total_checks += 1
-            if mv.isEnPassantMove:
+            if mv & EN_PASSANT_FLAG:
                 total_enPassant += 1
-            if mv.isCastlingMove:
+            if mv & CASTLING_FLAG:
                 total_castles += 1
-            if mv.pawnPromotion != 0:
+            if mv >> PROMOTION_SHIFT & PIECE_MASK:
                 total_promotions += 1
-            if mv.isCheck and mv.discoveredCheck != None:
+            if mv & CHECK_FLAG and mv & DISCOVERED_FLAG:
                 total_double_checks += 1
                 total_checks -= 1  # avoid double counting
-            gs.makeMove(mv)
+            gs.makeMoveCode(mv)
             if gs.info.winner is not None and gs.info.winner != 0:
                 total_mates += 1
-            gs.undoMove(reCalculateMoves=False)
+            gs.undoMove()
         return len(moves_), total_caps, total_checks, total_mates, total_discovered_checks, total_enPassant, total_castles, total_promotions, total_double_checks
     total_caps = 0
     total_checks = 0
@@ -47,9 +48,9 @@ def perft(gs: ChessBackend.GameState, depth: int) -> int:
     total_promotions = 0
     total_double_checks = 0
     total_nodes = 0
-    moves = gs.validMoves.copy()
+    moves = gs.moveCodes
     for mv in moves:
-        gs.makeMove(mv)
+        gs.makeMoveCode(mv)
         n, c, ch, m, dc, ep, ca, pr, dch = perft(gs, depth - 1)
         total_nodes += n
         total_caps += c 
@@ -60,7 +61,7 @@ def perft(gs: ChessBackend.GameState, depth: int) -> int:
         total_castles += ca
         total_promotions += pr
         total_double_checks += dch
-        gs.undoMove(reCalculateMoves=False)
+        gs.undoMove()
     return total_nodes, total_caps, total_checks, total_mates, total_discovered_checks, total_enPassant, total_castles, total_promotions, total_double_checks
 
 if __name__ == "__main__":
@@ -0,0 +1,319 @@
+"""
+Local multi-game engine server. Clients send one JSON request per line over TCP or a UNIX socket:
+    {"id": 1, "fen": "startpos", "moves": ["e2e4"], "limits": {"depth": 4, "movetime": 1000, "nodes": 50000}, "deadline_ms": 2000}
+and get one JSON line back per request, in completion order:
+    {"id": 1, "bestmove": "e7e5", "score": 0.2, "depth": 4, "nodes": 12345, "nps": 8000, "time_ms": 1530}
+Requests are dispatched to a pool of engine processes, each keeping its own memo table.
+Send {"type": "metrics"} (or GET /metrics on --metrics-port) for Prometheus-style text metrics.
+"""
+import argparse
+import asyncio
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import ChessBackend
+import ChessEngine
+import uci
+
+DEFAULT_DEPTH = 4
+DEADLINE_GRACE = 0.25 # seconds a worker may overrun a deadline before the request fails
+LATENCY_WINDOW = 1000 # number of recent requests kept for latency percentiles
+
+# Engine of the current worker process, created by initWorker.
+_engine = None
+
+
+def initWorker(engineKind: str, modelPath, hashMB: int):
+    global _engine
+    _engine = uci.createEngine(engineKind, modelPath)
+    _engine.memoLimit = hashMB * 1024 * 1024 // uci.MEMO_ENTRY_BYTES
+
+
+def searchTask(fen: str, moves: list, depth: int, movetime, nodes) -> dict:
+    """
+    Run one search in a worker process. `movetime` is in seconds.
+    """
+    gs = ChessBackend.GameState() if fen in (None, "", "startpos") else ChessBackend.GameState.fromFen(fen)
+    for uciMove in moves:
+        move = uci.findMove(gs, uciMove)
+        if move is None:
+            return {"error": f"illegal move {uciMove}"}
+        gs.makeMove(move)
+    stopEvent = threading.Event()
+    timer = None
+    if movetime is not None:
+        timer = threading.Timer(movetime, stopEvent.set)
+        timer.start()
+    startTime = time.time()
+    try:
+        bestMove = _engine.iterativeSearch(gs, depth, stopEvent, maxNodes=nodes)
+    finally:
+        if timer is not None:
+            timer.cancel()
+    elapsed = time.time() - startTime
+    score = _engine.rootScore
+    return {
+        "bestmove": bestMove.getUciNotation() if bestMove is not None else None,
+        "score": score if abs(score) <= ChessEngine.MATE_THRESHOLD else ("mate" if score > 0 else "-mate"),
+        "depth": _engine.completedDepth,
+        "nodes": _engine.totalNodes,
+        "nps": int(_engine.totalNodes / (elapsed + 1e-9)),
+        "search_ms": int(elapsed * 1000),
+        "worker": os.getpid(),
+    }
+
+
+def checkRequest(request) -> dict:
+    """
+    Validate a search request before it is queued and return it. Raises ValueError with a message
+    for the client if the request is malformed.
+    """
+    if not isinstance(request, dict):
+        raise ValueError("request must be a JSON object")
+    if not isinstance(request.get("fen"), str):
+        raise ValueError('fen must be a FEN string or "startpos"')
+    moves = request.get("moves", [])
+    if not isinstance(moves, list) or not all(isinstance(move, str) for move in moves):
+        raise ValueError("moves must be a list of UCI strings")
+    limits = request.get("limits", {})
+    if not isinstance(limits, dict):
+        raise ValueError("limits must be an object")
+    for name, value in [*((f"limits.{key}", limits.get(key)) for key in ("depth", "movetime", "nodes")),
+                        ("deadline_ms", request.get("deadline_ms"))]:
+        if value is not None and (isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0):
+            raise ValueError(f"{name} must be a non-negative number")
+    return request
+
+
+class Metrics:
+    def __init__(self):
+        self.requests = {} # status -> count
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.nodes = 0
+        self.searchSeconds = 0.0
+        self.lastNps = 0
+
+    def record(self, status: str, latency=None, result=None):
+        self.requests[status] = self.requests.get(status, 0) + 1
+        if latency is not None:
+            self.latencies.append(latency)
+        if result is not None and "nodes" in result:
+            self.nodes += result["nodes"]
+            self.searchSeconds += result["search_ms"] / 1000
+            self.lastNps = result["nps"]
+
+    def percentile(self, q: float) -> float:
+        if not self.latencies:
+            return 0.0
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def render(self, queueDepth: int, inFlight: int, workers: int) -> str:
+        lines = [
+            "# TYPE chess_queue_depth gauge",
+            f"chess_queue_depth {queueDepth}",
+            "# TYPE chess_in_flight gauge",
+            f"chess_in_flight {inFlight}",
+            "# TYPE chess_workers gauge",
+            f"chess_workers {workers}",
+            "# TYPE chess_requests_total counter",
+        ]
+        for status, count in sorted(self.requests.items()):
+            lines.append(f'chess_requests_total{{status="{status}"}} {count}')
+        lines.append("# TYPE chess_request_latency_seconds summary")
+        for q in (0.5, 0.9, 0.99):
+            lines.append(f'chess_request_latency_seconds{{quantile="{q}"}} {self.percentile(q):.6f}')
+        lines.append(f"chess_request_latency_seconds_count {len(self.latencies)}")
+        lines += [
+            "# TYPE chess_nodes_total counter",
+            f"chess_nodes_total {self.nodes}",
+            "# TYPE chess_nps gauge",
+            f"chess_nps {int(self.nodes / self.searchSeconds) if self.searchSeconds else 0}",
+            "# TYPE chess_last_nps gauge",
+            f"chess_last_nps {self.lastNps}",
+        ]
+        return "\n".join(lines) + "\n"
+
+
+class EngineServer:
+    def __init__(self, workers: int = 2, queueSize: int = 64, engineKind: str = "classic", modelPath=None,
+                 hashMB: int = 64):
+        self.workers = max(1, workers)
+        self.queue = asyncio.Queue(maxsize=max(1, queueSize))
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=initWorker, initargs=(engineKind, modelPath, hashMB))
+        self.metrics = Metrics()
+        self.inFlight = 0
+        self.dispatchers = []
+
+    def start(self):
+        self.dispatchers = [asyncio.create_task(self.dispatch()) for _ in range(self.workers)]
+
+    async def close(self):
+        for task in self.dispatchers:
+            task.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def renderMetrics(self) -> str:
+        return self.metrics.render(self.queue.qsize(), self.inFlight, self.workers)
+
+    async def dispatch(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            request, received, deadline, future = await self.queue.get()
+            try:
+                result = await self.run(loop, request, received, deadline)
+            except Exception as exc:
+                result = {"error": f"{type(exc).__name__}: {exc}"}
+            if not future.done():
+                future.set_result(result)
+            self.queue.task_done()
+
+    async def run(self, loop, request: dict, received: float, deadline) -> dict:
+        limits = request.get("limits", {})
+        depth = int(limits.get("depth", uci.MAX_DEPTH if ("movetime" in limits or deadline) else DEFAULT_DEPTH))
+        movetime = limits.get("movetime")
+        movetime = movetime / 1000 if movetime is not None else None
+        timeout = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return {"error": "deadline exceeded in queue"}
+            movetime = remaining if movetime is None else min(movetime, remaining)
+            timeout = remaining + DEADLINE_GRACE
+        self.inFlight += 1
+        try:
+            future = loop.run_in_executor(self.executor, searchTask, request.get("fen"), request.get("moves", []),
+                                          depth, movetime, limits.get("nodes"))
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return {"error": "deadline exceeded"}
+        finally:
+            self.inFlight -= 1
+
+    async def submit(self, request: dict) -> dict:
+        received = time.monotonic()
+        deadlineMs = request.get("deadline_ms")
+        deadline = received + deadlineMs / 1000 if deadlineMs is not None else None
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self.queue.put_nowait((request, received, deadline, future))
+        except asyncio.QueueFull:
+            # Backpressure: reject instead of queueing without bound.
+            self.metrics.record("rejected")
+            return {"error": "server busy", "retry": True}
+        result = await future
+        latency = time.monotonic() - received
+        self.metrics.record("error" if "error" in result else "ok", latency, result)
+        result["time_ms"] = int(latency * 1000)
+        return result
+
+    async def handleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        writeLock = asyncio.Lock()
+        tasks = set()
+
+        async def answer(request):
+            # Every request gets a reply line, otherwise the client would wait for it forever.
+            try:
+                if isinstance(request, dict) and request.get("type") == "metrics":
+                    response = {"metrics": self.renderMetrics()}
+                else:
+                    response = await self.submit(checkRequest(request))
+            except ValueError as exc:
+                self.metrics.record("invalid")
+                response = {"error": f"invalid request: {exc}"}
+            except Exception as exc:
+                self.metrics.record("error")
+                response = {"error": f"{type(exc).__name__}: {exc}"}
+            if isinstance(request, dict) and "id" in request:
+                response["id"] = request["id"]
+            async with writeLock:
+                writer.write((json.dumps(response) + "\n").encode())
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError as exc:
+                    async with writeLock:
+                        writer.write((json.dumps({"error": f"invalid json: {exc}"}) + "\n").encode())
+                        await writer.drain()
+                    continue
+                task = asyncio.create_task(answer(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            writer.close()
+
+    async def handleMetricsHttp(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        # Minimal HTTP endpoint so a Prometheus scraper can read the metrics.
+        await reader.readline()
+        while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+            pass
+        body = self.renderMetrics().encode()
+        writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                     + f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+        await writer.drain()
+        writer.close()
+
+
+async def request(payloads: list[dict], host: str = "127.0.0.1", port: int = 8765, unixPath=None) -> list[dict]:
+    """
+    Send requests over one connection and return the responses in completion order.
+    """
+    if unixPath is not None:
+        reader, writer = await asyncio.open_unix_connection(unixPath)
+    else:
+        reader, writer = await asyncio.open_connection(host, port)
+    for payload in payloads:
+        writer.write((json.dumps(payload) + "\n").encode())
+    await writer.drain()
+    responses = [json.loads(await reader.readline()) for _ in payloads]
+    writer.close()
+    return responses
+
+
+async def serve(args):
+    server = EngineServer(args.workers, args.queue_size, args.engine, args.model, args.hash)
+    server.start()
+    if args.unix:
+        listener = await asyncio.start_unix_server(server.handleClient, path=args.unix)
+        print(f"Serving on {args.unix} with {server.workers} workers", flush=True)
+    else:
+        listener = await asyncio.start_server(server.handleClient, args.host, args.port)
+        print(f"Serving on {args.host}:{listener.sockets[0].getsockname()[1]} with {server.workers} workers", flush=True)
+    if args.metrics_port:
+        await asyncio.start_server(server.handleMetricsHttp, args.host, args.metrics_port)
+    try:
+        async with listener:
+            await listener.serve_forever()
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", default=None, help="Listen on this UNIX socket path instead of TCP.")
+    parser.add_argument("--metrics-port", type=int, default=0, help="Also serve GET /metrics over HTTP on this port.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--queue-size", type=int, default=64)
+    parser.add_argument("--engine", choices=("classic", "nn", "mcts"), default="classic")
+    parser.add_argument("--model", default=None)
+    parser.add_argument("--hash", type=int, default=64, help="Memo table size per worker in MB.")
+    asyncio.run(serve(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
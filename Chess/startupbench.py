@@ -0,0 +1,109 @@
+"""
+Startup benchmark: wall time of fresh interpreters that import the engine modules, construct
+the engines and answer a UCI handshake. Each case runs in its own subprocess, so nothing is
+cached between runs; the time of an empty interpreter is listed for reference.
+
+    python -m Chess.startupbench --runs 5 [--model model.pth] [--limit 1.0]
+    python -m Chess.startupbench --importtime ChessEngineNN
+
+With --limit the exit status is 1 if an entry point (an import, engine construction or
+the uci handshake, not counting the NN model load) takes longer than the limit in seconds.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+CHESS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (python code, is an entry point)
+IMPORT_CASES = {
+    "python": ("pass", False),
+    "import ChessBackend": ("import ChessBackend", True),
+    "import ChessEngine": ("import ChessEngine", True),
+    "import ChessEngineNN": ("import ChessEngineNN", True),
+    "import ChessEngineMCTS": ("import ChessEngineMCTS", True),
+    "import uci": ("import uci", True),
+    "Engine()": ("import ChessEngine; ChessEngine.Engine()", True),
+    "EngineNN()": ("import ChessEngineNN; ChessEngineNN.EngineNN(model_path={model!r})", True),
+    "EngineNN() + model": ("import ChessEngineNN; ChessEngineNN.EngineNN(model_path={model!r}).load_model()", False),
+}
+# name -> (uci arguments, commands sent, is an entry point)
+UCI_CASES = {
+    "uci classic": (["--engine", "classic"], "uci\nisready\nquit\n", True),
+    "uci nn": (["--engine", "nn"], "uci\nquit\n", True),
+    "uci nn + isready": (["--engine", "nn"], "uci\nisready\nquit\n", False),
+}
+
+
+def timeProcess(args: list[str], stdin: str = None) -> float:
+    startTime = time.perf_counter()
+    subprocess.run(args, input=stdin, cwd=CHESS_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                   text=True, check=True)
+    return time.perf_counter() - startTime
+
+
+def runCases(runs: int, model: str = None) -> dict[str, list[float]]:
+    """
+    Time every case `runs` times. The uci cases quit after "uciok" or "readyok"; isready
+    waits for the NN engine's model.
+    """
+    results = {}
+    for name, (code, _) in IMPORT_CASES.items():
+        code = code.format(model=model)
+        results[name] = [timeProcess([sys.executable, "-c", code]) for _ in range(runs)]
+    for name, (args, commands, _) in UCI_CASES.items():
+        if model is not None and "nn" in args:
+            args = args + ["--model", model]
+        command = [sys.executable, "uci.py"] + args
+        results[name] = [timeProcess(command, commands) for _ in range(runs)]
+    return results
+
+
+def importTimes(module: str, limit: int = 15) -> list[tuple[int, str]]:
+    """
+    The slowest imports (cumulative microseconds) when importing `module`, from python -X importtime.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=CHESS_DIR,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
+    times = []
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times.append((int(cumulative), name.rstrip()))
+    return sorted(times, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Runs per case; the median and minimum are reported.")
+    parser.add_argument("--model", default=None, help="Model state dict for the NN cases (default: the engine's).")
+    parser.add_argument("--limit", type=float, default=None, help="Fail if an entry point takes longer (seconds).")
+    parser.add_argument("--importtime", default=None, metavar="MODULE",
+                        help="Only list the slowest imports pulled in by MODULE.")
+    args = parser.parse_args()
+
+    if args.importtime:
+        for cumulative, name in importTimes(args.importtime):
+            print(f"{cumulative / 1000:9.1f} ms  {name}")
+        return
+
+    results = runCases(max(1, args.runs), args.model)
+    slow = []
+    print(f"{'case':>24}  {'median':>8}  {'min':>8}")
+    for name, times in results.items():
+        median = statistics.median(times)
+        print(f"{name:>24}  {median:7.3f}s  {min(times):7.3f}s")
+        entryPoint = UCI_CASES[name][2] if name in UCI_CASES else IMPORT_CASES[name][1]
+        if args.limit is not None and entryPoint and median > args.limit:
+            slow.append(name)
+    if slow:
+        print(f"Slower than {args.limit:.2f}s: {', '.join(slow)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
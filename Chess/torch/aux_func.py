@@ -57,19 +57,36 @@ def move_to_index(move):
     return move.from_square * 64 + move.to_square
 
 
+RESULT_SCORES = {"1-0": 1.0, "0-1": -1.0, "1/2-1/2": 0.0}
+
+
+def game_result(game):
+    # Final score from White's perspective, or None for unfinished games ("*").
+    return RESULT_SCORES.get(game.headers.get("Result", "*"))
+
+
 def create_input_for_nn(games):
     X = []
     y = []
     legal_masks = []
+    values = []
     for game in tqdm(games):
         board = game.board()
+        result = game_result(game)
         for move in game.mainline_moves():
             X.append(board_to_matrix(board))
             legal_masks.append(legal_mask(board))
             y.append(move_to_index(move))
+            # Value target is the game result from the side to move; NaN marks
+            # positions from unfinished games so the value loss can skip them.
+            if result is None:
+                values.append(np.nan)
+            else:
+                values.append(result if board.turn else -result)
             board.push(move)
     return (
         np.array(X, dtype=np.float32),
         np.array(y, dtype=np.int64),
         np.array(legal_masks, dtype=bool),
+        np.array(values, dtype=np.float32),
     )
@@ -3,10 +3,11 @@ from torch.utils.data import Dataset
 
 class ChessDataset(Dataset):
 
-    def __init__(self, X, y, legal_masks):
+    def __init__(self, X, y, legal_masks, values):
         self.X = X
         self.y = y
         self.legal_masks = legal_masks
+        self.values = values
 
     def __len__(self):
         return len(self.X)
@@ -16,4 +17,5 @@ class ChessDataset(Dataset):
             self.X[idx],
             self.y[idx],
             self.legal_masks[idx],
+            self.values[idx],
         )
@@ -11,13 +11,19 @@ class ChessModel(nn.Module):
         self.flatten = nn.Flatten()
         self.fc1 = nn.Linear(8 * 8 * 128, 256)
         self.move_head = nn.Linear(256, 64 * 64)
+        # Value head: game outcome from the side to move, in [-1, 1].
+        self.value_fc = nn.Linear(256, 64)
+        self.value_head = nn.Linear(64, 1)
         self.relu = nn.ReLU()
+        self.tanh = nn.Tanh()
 
         # Initialize weights.
         nn.init.kaiming_uniform_(self.conv1.weight, nonlinearity="relu")
         nn.init.kaiming_uniform_(self.conv2.weight, nonlinearity="relu")
         nn.init.xavier_uniform_(self.fc1.weight)
         nn.init.xavier_uniform_(self.move_head.weight)
+        nn.init.xavier_uniform_(self.value_fc.weight)
+        nn.init.xavier_uniform_(self.value_head.weight)
 
     @staticmethod
     def apply_legal_mask(logits, legal_mask):
@@ -26,13 +32,27 @@ class ChessModel(nn.Module):
         legal_mask = legal_mask.to(device=logits.device, dtype=torch.bool).reshape(logits.size(0), -1)
         return logits.masked_fill(~legal_mask, -1e9)
 
-    def forward(self, x, legal_mask=None):
+    def encode(self, x):
         x = self.relu(self.conv1(x))
         x = self.relu(self.conv2(x))
         x = self.flatten(x)
-        x = self.relu(self.fc1(x))
+        return self.relu(self.fc1(x))
+
+    def value_from_features(self, features):
+        value = self.relu(self.value_fc(features))
+        return self.tanh(self.value_head(value)).squeeze(-1)
 
-        move_logits = self.move_head(x)
+    def forward(self, x, legal_mask=None):
+        features = self.encode(x)
+        move_logits = self.move_head(features)
         move_logits = self.apply_legal_mask(move_logits, legal_mask)
 
         return move_logits
+
+    def value(self, x):
+        return self.value_from_features(self.encode(x))
+
+    def policy_and_value(self, x, legal_mask=None):
+        features = self.encode(x)
+        move_logits = self.apply_legal_mask(self.move_head(features), legal_mask)
+        return move_logits, self.value_from_features(features)
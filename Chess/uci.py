@@ -0,0 +1,378 @@
+"""
+Headless UCI protocol front end for the classic and neural-network engines.
+Run with `python -m Chess.uci` (classic engine) or `python -m Chess.uci --engine nn`.
+"""
+import argparse
+import sys
+import threading
+import time
+
+import ChessBackend
+import ChessEngine
+import OpeningBook
+import Tablebase
+
+ENGINE_NAME = "Chess-Engine"
+ENGINE_AUTHOR = "yw958"
+MAX_DEPTH = 64
+MOVE_OVERHEAD = 0.05 # seconds kept in reserve for communication with the GUI
+MEMO_ENTRY_BYTES = 160 # rough size of one memo entry, used to turn Hash (MB) into an entry limit
+
+
+def createEngine(kind: str, modelPath=None):
+    """
+    Build the requested engine. The NN engines are imported lazily so the classic
+    engine starts without loading torch.
+    """
+    if kind == "classic":
+        return ChessEngine.Engine()
+    if kind == "nn":
+        import ChessEngineNN
+        return ChessEngineNN.EngineNN(model_path=modelPath)
+    if kind == "mcts":
+        import ChessEngineMCTS
+        return ChessEngineMCTS.EngineMCTS(model_path=modelPath)
+    raise ValueError(f"Unknown engine {kind!r}")
+
+
+# lower-case option name -> Engine attribute of a frontier pruning switch
+PRUNING_OPTIONS = {attribute.lower(): attribute for attribute in ChessEngine.FRONTIER_PRUNING}
+
+
+def findMove(gs: ChessBackend.GameState, uciMove: str):
+    for move in gs.validMoves:
+        if move.getUciNotation() == uciMove:
+            return move
+    return None
+
+
+def formatScore(score: float) -> str:
+    if score in (float("inf"), float("-inf")):
+        # No finite score was set (the engines score a root without moves with noMovesScore)
+        return "mate 0" if score < 0 else "mate 1"
+    if abs(score) > ChessEngine.MATE_THRESHOLD:
+        # Mate found by the search; the distance is counted from the root, "mate 0" when mated already
+        plies = int(ChessEngine.MATE_SCORE - abs(score))
+        return f"mate {(plies + 1) // 2}" if score > 0 else f"mate -{plies // 2}" if plies > 1 else "mate 0"
+    if abs(score) > ChessEngine.TB_WIN_THRESHOLD:
+        # Tablebase win or loss; the search adds the plies from the root to the probed position
+        plies = Tablebase.TB_WIN_SCORE - abs(score)
+        return f"mate {(int(plies) + 1) // 2}" if score > 0 else f"mate -{int(plies) // 2}"
+    return f"cp {int(round(score * 100))}"
+
+
+class UCIFrontEnd:
+    def __init__(self, engine, kind: str = "classic", out=sys.stdout):
+        self.engine = engine
+        self.kind = kind
+        self.out = out
+        self.outLock = threading.Lock()
+        self.gs = ChessBackend.GameState()
+        self.searchThread = None
+        self.stopEvent = None
+        self.timer = None
+        self.waitForStop = None # set while searching in infinite or ponder mode
+        self.ponderBudget = None # move time to start on ponderhit
+        self.threads = 1
+        self.bookFile = OpeningBook.DEFAULT_BOOK_PATH
+        self.ownBook = False
+        self.multiPV = 1
+
+    def send(self, line: str):
+        with self.outLock:
+            self.out.write(line + "\n")
+            self.out.flush()
+
+    def loop(self, stream=sys.stdin):
+        for line in stream:
+            if not self.handle(line.strip()):
+                break
+        self.stopSearch()
+
+    def handle(self, line: str) -> bool:
+        """
+        Process one command; returns False on quit.
+        """
+        if not line:
+            return True
+        command, _, args = line.partition(" ")
+        if command == "uci":
+            self.sendIdentity()
+        elif command == "isready":
+            self.waitUntilReady()
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.stopSearch()
+            self.engine.memo = {}
+            self.engine.bestMoves = {}
+            self.gs = ChessBackend.GameState()
+        elif command == "setoption":
+            self.setOption(args)
+        elif command == "position":
+            self.stopSearch()
+            self.setPosition(args.split())
+        elif command == "go":
+            self.stopSearch()
+            self.go(args.split())
+        elif command == "stop":
+            self.stopSearch()
+        elif command == "ponderhit":
+            self.ponderHit()
+        elif command == "d":
+            self.send(f"info string {self.gs.boardHistory[-1]}")
+        elif command == "quit":
+            return False
+        return True
+
+    def waitUntilReady(self):
+        """
+        The NN engines load their model in a background thread; isready waits for it.
+        """
+        if hasattr(self.engine, "load_model"):
+            try:
+                self.engine.load_model()
+            except Exception as exc:
+                self.send(f"info string model not loaded: {exc}")
+
+    def sendIdentity(self):
+        self.send(f"id name {ENGINE_NAME} ({self.kind})")
+        self.send(f"id author {ENGINE_AUTHOR}")
+        self.send("option name Hash type spin default 16 min 1 max 4096")
+        self.send("option name Threads type spin default 1 min 1 max 64")
+        self.send(f"option name QPly type spin default {self.engine.qplyLimit} min 1 max 32")
+        if self.kind == "classic":
+            for attribute in ChessEngine.FRONTIER_PRUNING:
+                default = str(getattr(self.engine, attribute)).lower()
+                self.send(f"option name {attribute[0].upper() + attribute[1:]} type check default {default}")
+        self.send("option name Ponder type check default false")
+        self.send("option name OwnBook type check default false")
+        self.send(f"option name BookFile type string default {self.bookFile}")
+        self.send("option name TablebasePath type string default <empty>")
+        self.send("option name SearchStats type check default false")
+        self.send("option name MultiPV type spin default 1 min 1 max 64")
+        if self.kind in ("nn", "mcts"):
+            self.send(f"option name BeamWidth type spin default {self.engine.beamWidth} min 1 max 64")
+            self.send(f"option name FullWidthDepth type spin default {self.engine.fullWidthDepth} min 0 max 16")
+            self.send(f"option name PolicyWeight type string default {self.engine.policyWeight}")
+            self.send(f"option name LeafEvaluation type combo default {self.engine.leafEvaluation} var qsearch var value")
+        if self.kind == "mcts":
+            self.send(f"option name Playouts type spin default {self.engine.playoutLimit} min 1 max 10000000")
+        self.send("uciok")
+
+    def setOption(self, args: str):
+        # "name <id> [value <x>]"; option names may contain spaces
+        nameValue = args.split(" value ", 1)
+        name = nameValue[0].replace("name", "", 1).strip().lower()
+        value = nameValue[1].strip() if len(nameValue) > 1 else ""
+        engine = self.engine
+        try:
+            if name == "hash":
+                engine.memoLimit = int(value) * 1024 * 1024 // MEMO_ENTRY_BYTES
+            elif name == "threads":
+                self.threads = max(1, int(value))
+                if self.kind in ("nn", "mcts"):
+                    engine.set_num_threads(self.threads)
+                # The classic search is single-threaded; the value is accepted for GUI compatibility.
+            elif name == "qply":
+                engine.qplyLimit = max(1, int(value))
+                engine.memo = {}
+            elif name in PRUNING_OPTIONS and self.kind == "classic":
+                setattr(engine, PRUNING_OPTIONS[name], value.lower() == "true")
+                engine.memo = {}
+            elif name == "ponder":
+                pass # pondering is driven by the GUI with "go ponder"
+            elif name == "ownbook":
+                self.ownBook = value.lower() == "true"
+                self.loadBook()
+            elif name == "bookfile":
+                self.bookFile = value
+                self.loadBook()
+            elif name == "tablebasepath":
+                if value and value != "<empty>" and not self.engine.loadTablebases(value):
+                    self.send(f"info string no tablebases in {value}")
+                elif not value or value == "<empty>":
+                    self.engine.loadTablebases(None)
+            elif name == "searchstats":
+                self.engine.collectStats = value.lower() == "true"
+            elif name == "multipv":
+                self.multiPV = max(1, int(value))
+            elif name == "beamwidth" and self.kind in ("nn", "mcts"):
+                engine.set_search_options(beam_width=int(value))
+            elif name == "fullwidthdepth" and self.kind in ("nn", "mcts"):
+                engine.set_search_options(full_width_depth=int(value))
+            elif name == "policyweight" and self.kind in ("nn", "mcts"):
+                engine.set_search_options(policy_weight=float(value))
+            elif name == "leafevaluation" and self.kind in ("nn", "mcts"):
+                engine.set_search_options(leaf_evaluation=value)
+            elif name == "playouts" and self.kind == "mcts":
+                engine.set_mcts_options(playouts=int(value))
+            else:
+                self.send(f"info string unknown option {name}")
+        except ValueError as exc:
+            self.send(f"info string invalid value for {name}: {exc}")
+
+    def loadBook(self):
+        if not self.ownBook:
+            self.engine.loadBook(None)
+        elif not self.engine.loadBook(self.bookFile):
+            self.send(f"info string book {self.bookFile} not found")
+
+    def setPosition(self, tokens: list[str]):
+        if not tokens:
+            return
+        if tokens[0] == "startpos":
+            gs = ChessBackend.GameState()
+            rest = tokens[1:]
+        elif tokens[0] == "fen":
+            fenTokens = []
+            rest = tokens[1:]
+            while rest and rest[0] != "moves":
+                fenTokens.append(rest.pop(0))
+            try:
+                gs = ChessBackend.GameState.fromFen(" ".join(fenTokens))
+            except (ValueError, IndexError) as exc:
+                self.send(f"info string invalid fen: {exc}")
+                return
+        else:
+            return
+        if rest and rest[0] == "moves":
+            for uciMove in rest[1:]:
+                move = findMove(gs, uciMove)
+                if move is None:
+                    self.send(f"info string illegal move {uciMove}")
+                    break
+                gs.makeMove(move)
+        self.gs = gs
+
+    def moveBudget(self, limits: dict) -> float:
+        """
+        Seconds to spend on this move from the clock limits, or None without a time limit.
+        """
+        if "movetime" in limits:
+            return max(0.01, limits["movetime"] / 1000 - MOVE_OVERHEAD)
+        timeKey, incKey = ("wtime", "winc") if self.gs.player == 1 else ("btime", "binc")
+        if timeKey not in limits:
+            return None
+        remaining = limits[timeKey] / 1000
+        increment = limits.get(incKey, 0) / 1000
+        movesToGo = limits.get("movestogo", 30)
+        budget = remaining / max(1, movesToGo) + 0.75 * increment
+        return max(0.01, min(budget, remaining / 2) - MOVE_OVERHEAD)
+
+    def go(self, tokens: list[str]):
+        limits = {}
+        flags = set()
+        i = 0
+        while i < len(tokens):
+            token = tokens[i]
+            if token in ("infinite", "ponder"):
+                flags.add(token)
+                i += 1
+            elif token in ("depth", "nodes", "movetime", "wtime", "btime", "winc", "binc", "movestogo") and i + 1 < len(tokens):
+                try:
+                    limits[token] = int(tokens[i + 1])
+                except ValueError:
+                    self.send(f"info string invalid value for {token}: {tokens[i + 1]}")
+                i += 2
+            else:
+                i += 1
+        depth = limits.get("depth", MAX_DEPTH)
+        budget = None if "infinite" in flags else self.moveBudget(limits)
+        self.stopEvent = threading.Event()
+        self.waitForStop = threading.Event() if flags else None
+        if "ponder" in flags:
+            # The clock only starts on ponderhit.
+            self.ponderBudget = budget
+        elif budget is not None:
+            self.startTimer(budget)
+        self.searchThread = threading.Thread(
+            target=self.search,
+            args=(self.gs.copy(), depth, limits.get("nodes"), self.stopEvent, self.waitForStop),
+            daemon=True,
+        )
+        self.searchThread.start()
+
+    def startTimer(self, seconds: float):
+        self.timer = threading.Timer(seconds, self.stopEvent.set)
+        self.timer.daemon = True
+        self.timer.start()
+
+    def ponderHit(self):
+        if self.searchThread is None or self.waitForStop is None:
+            return
+        if self.ponderBudget is not None:
+            self.startTimer(self.ponderBudget)
+        self.ponderBudget = None
+        # Searching on our own time now: report the move as soon as the search ends.
+        self.waitForStop.set()
+
+    def search(self, gs: ChessBackend.GameState, depth: int, maxNodes, stopEvent, waitForStop):
+        startTime = time.time()
+
+        def onProgress(engine, move, elapsed):
+            nodes = engine.totalNodes
+            pv = engine.principalVariation(gs) if move is not None else []
+            if move is not None and (not pv or pv[0] != move):
+                pv = [move]
+            self.send(
+                f"info depth {engine.completedDepth} score {formatScore(engine.rootScore)} "
+                f"nodes {nodes} nps {int(nodes / (elapsed + 1e-9))} time {int(elapsed * 1000)} "
+                f"pv {' '.join(m.getUciNotation() for m in pv)}"
+            )
+
+        def onLines(engine, lines, elapsed):
+            nodes = engine.totalNodes
+            for rank, line in enumerate(lines, 1):
+                self.send(
+                    f"info depth {line['depth']} multipv {rank} score {formatScore(line['score'])} "
+                    f"nodes {nodes} nps {int(nodes / (elapsed + 1e-9))} time {int(elapsed * 1000)} "
+                    f"pv {' '.join(m.getUciNotation() for m in line['pv'])}"
+                )
+
+        if self.multiPV > 1 and self.kind == "classic":
+            lines = self.engine.analyse(gs, depth, self.multiPV, stopEvent, maxNodes, onLines)
+            bestMove = lines[0]["move"] if lines else None
+            pv = lines[0]["pv"] if lines else []
+        else:
+            bestMove = self.engine.iterativeSearch(gs, depth, stopEvent, onProgress, maxNodes)
+            pv = self.engine.principalVariation(gs) if bestMove is not None else []
+        if waitForStop is not None:
+            # In infinite and ponder mode bestmove may only be sent after stop or ponderhit.
+            while not waitForStop.is_set() and not stopEvent.is_set():
+                waitForStop.wait(0.05)
+        elapsed = time.time() - startTime
+        self.send(f"info nodes {self.engine.totalNodes} nps {int(self.engine.totalNodes / (elapsed + 1e-9))} "
+                  f"time {int(elapsed * 1000)}")
+        if self.engine.collectStats and self.engine.lastStats is not None:
+            for line in self.engine.lastStats.report().splitlines():
+                self.send(f"info string {line}")
+        if bestMove is None:
+            self.send("bestmove 0000")
+        elif len(pv) > 1 and pv[0] == bestMove:
+            self.send(f"bestmove {bestMove.getUciNotation()} ponder {pv[1].getUciNotation()}")
+        else:
+            self.send(f"bestmove {bestMove.getUciNotation()}")
+
+    def stopSearch(self):
+        if self.searchThread is None:
+            return
+        self.stopEvent.set()
+        self.searchThread.join()
+        if self.timer is not None:
+            self.timer.cancel()
+        self.searchThread = None
+        self.timer = None
+        self.waitForStop = None
+        self.ponderBudget = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--engine", choices=("classic", "nn", "mcts"), default="classic")
+    parser.add_argument("--model", default=None, help="Model state dict for the NN engines.")
+    args = parser.parse_args()
+    UCIFrontEnd(createEngine(args.engine, args.model), args.engine).loop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The modules under Chess/ import each other by their flat names (e.g. `import ChessBackend`).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Chess"))
@@ -0,0 +1,17 @@
+import ChessBackend
+import uci
+
+
+def test_snapshot_restore_keeps_repetitions():
+    gs = ChessBackend.GameState()
+    for uciMove in ("g1f3", "g8f6", "f3g1", "f6g8"):
+        gs.makeMove(uci.findMove(gs, uciMove))
+    assert gs.isRepetition()
+
+    restored = ChessBackend.GameState.restore(gs.snapshot())
+    assert restored.board == gs.board
+    assert restored.isRepetition()
+    assert restored.boardCounter[restored.boardHistory[-1]] == 2
+    assert sorted(move.getUciNotation() for move in restored.validMoves) == \
+        sorted(move.getUciNotation() for move in gs.validMoves)
+    assert restored.snapshot() == gs.snapshot()
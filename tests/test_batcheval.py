@@ -0,0 +1,9 @@
+import BatchEval
+from bench import BENCH_POSITIONS
+
+
+def test_batch_eval_matches_scalar_eval_on_bench_positions():
+    compared, skipped, mismatches = BatchEval.validate(BENCH_POSITIONS)
+    assert compared + skipped == len(BENCH_POSITIONS)
+    assert compared > 0
+    assert mismatches == []
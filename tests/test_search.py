@@ -0,0 +1,58 @@
+import numpy as np
+
+import ChessBackend
+import ChessEngine
+import ChessEngineNN
+import uci
+
+
+def search(engine: ChessEngine.Engine, gameState: ChessBackend.GameState, depth: int) -> float:
+    engine.rootPly = len(gameState.moveLog)
+    color = 1 if gameState.player == 1 else -1
+    return engine.negamax(gameState, depth, -ChessEngine.MATE_SCORE, ChessEngine.MATE_SCORE, color)
+
+
+def test_repetition_draw_is_not_reused_from_the_memo():
+    # Black to move after Qc1 Kg8 Qb1: Kh8 repeats the start position, every other move keeps a queen down
+    gs = ChessBackend.GameState.fromFen("7k/8/8/8/8/8/8/1Q4K1 w - - 0 1")
+    for uciMove in ("b1c1", "h8g8", "c1b1"):
+        gs.makeMove(uci.findMove(gs, uciMove))
+    engine = ChessEngine.Engine()
+    assert search(engine, gs, 1) == 0
+
+    # The same position without the history behind it is lost for black
+    fresh = ChessBackend.GameState.fromFen("6k1/8/8/8/8/8/8/1Q4K1 b - - 3 2")
+    assert fresh.boardHistory[-1] == gs.boardHistory[-1]
+    assert search(engine, fresh, 1) < -ChessEngine.PAWN
+
+
+def test_frontier_pruning_keeps_tactical_best_moves():
+    # A knight capture that wins material (a bench position) and a back rank mate
+    for fen, expected in (("rq3rk1/ppp2ppp/1bnpb3/3N2B1/3NP3/7P/PPPQ1PP1/2KR3R w - - 7 14", "d4c6"),
+                          ("6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1", "d1d8")):
+        moves = []
+        for pruning in (True, False):
+            engine = ChessEngine.Engine()
+            for attribute in ChessEngine.FRONTIER_PRUNING:
+                setattr(engine, attribute, pruning)
+            moves.append(engine.findBestMove(ChessBackend.GameState.fromFen(fen), 3).getUciNotation())
+        assert moves == [expected, expected]
+
+
+def test_value_leaves_score_repetitions_as_draws():
+    engine = ChessEngineNN.EngineNN(model_path="missing.pth", leaf_evaluation="value", warm_up=False)
+    engine.valueEnabled = True
+    # Every child is worth a queen to white, the side to move there
+    engine.run_value_model = lambda positions: np.full(len(positions), 1.0, dtype=np.float32)
+
+    def frontier(gameState):
+        engine.rootPly = len(gameState.moveLog)
+        return engine.hybrid_negamax(gameState, 1, -ChessEngine.MATE_SCORE, ChessEngine.MATE_SCORE, -1, 1)
+
+    gs = ChessBackend.GameState.fromFen("7k/8/8/8/8/8/8/1Q4K1 w - - 0 1")
+    for uciMove in ("b1c1", "h8g8", "c1b1"):
+        gs.makeMove(uci.findMove(gs, uciMove))
+    assert frontier(gs) == 0 # Kh8 repeats the start position
+
+    fresh = ChessBackend.GameState.fromFen("6k1/8/8/8/8/8/8/1Q4K1 b - - 3 2")
+    assert frontier(fresh) == -engine.valueScale
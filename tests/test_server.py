@@ -0,0 +1,34 @@
+import asyncio
+
+import server
+
+
+async def roundTrip(payloads: list) -> list[dict]:
+    engineServer = server.EngineServer(workers=1)
+    engineServer.start()
+    listener = await asyncio.start_server(engineServer.handleClient, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        return await asyncio.wait_for(server.request(payloads, port=port), 60)
+    finally:
+        listener.close()
+        await engineServer.close()
+
+
+def test_malformed_requests_get_an_error_reply():
+    payloads = [
+        ["not", "an", "object"],
+        {"id": 1, "moves": ["e2e4"]},
+        {"id": 2, "fen": "startpos", "moves": "e2e4"},
+        {"id": 3, "fen": "startpos", "deadline_ms": "soon"},
+        {"id": 4, "fen": "startpos", "limits": {"depth": "deep"}},
+        {"id": 5, "fen": "startpos", "limits": {"depth": 1}},
+    ]
+    responses = asyncio.run(roundTrip(payloads))
+    assert len(responses) == len(payloads)
+    errors = [response for response in responses if "error" in response]
+    assert len(errors) == 5
+    assert all(response["error"].startswith("invalid request:") for response in errors)
+    assert sorted(response["id"] for response in errors if "id" in response) == [1, 2, 3, 4]
+    answered = [response for response in responses if "bestmove" in response]
+    assert [response["id"] for response in answered] == [5]
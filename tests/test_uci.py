@@ -0,0 +1,32 @@
+import io
+
+import uci
+
+
+def goDepth(fen: str) -> list[str]:
+    out = io.StringIO()
+    frontEnd = uci.UCIFrontEnd(uci.createEngine("classic", None), out=out)
+    frontEnd.handle(f"position fen {fen}")
+    frontEnd.handle("go depth 3")
+    frontEnd.searchThread.join(30)
+    return out.getvalue().splitlines()
+
+
+def test_mated_root_reports_mate_and_bestmove():
+    lines = goDepth("rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3")
+    assert any(" score mate 0 " in line for line in lines)
+    assert lines[-1] == "bestmove 0000"
+
+
+def test_stalemated_root_reports_draw_and_bestmove():
+    lines = goDepth("7k/5Q2/6K1/8/8/8/8/8 b - - 0 1")
+    assert any(" score cp 0 " in line for line in lines)
+    assert lines[-1] == "bestmove 0000"
+
+
+def test_format_score():
+    assert uci.formatScore(float("-inf")) == "mate 0"
+    assert uci.formatScore(-uci.ChessEngine.MATE_SCORE) == "mate 0"
+    assert uci.formatScore(uci.ChessEngine.MATE_SCORE - 3) == "mate 2"
+    assert uci.formatScore(-(uci.ChessEngine.MATE_SCORE - 2)) == "mate -1"
+    assert uci.formatScore(0.5) == "cp 50"